@@ -0,0 +1,66 @@
+import pytest
+from django.contrib.auth import get_user_model
+
+from core.testing import assert_constant_queries
+from posts.models import Comment, Follow, Post
+
+
+def add_authors_posts(count, group=None):
+    User = get_user_model()
+    start = User.objects.count()
+    User.objects.bulk_create(
+        User(username=f'author{start + index}') for index in range(count)
+    )
+    authors = User.objects.filter(username__startswith='author').order_by('-pk')[:count]
+    Post.objects.bulk_create(
+        Post(author=author, group=group, text='Тестовый пост') for author in authors
+    )
+    return authors
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db(transaction=True)
+    def test_index_queries_do_not_grow(self, client, group):
+        assert_constant_queries(
+            lambda: client.get('/'),
+            lambda size: add_authors_posts(size - Post.objects.count(), group),
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_group_queries_do_not_grow(self, client, group):
+        assert_constant_queries(
+            lambda: client.get(f'/group/{group.slug}/'),
+            lambda size: add_authors_posts(size - Post.objects.count(), group),
+        )
+
+    @pytest.mark.django_db(transaction=True)
+    def test_profile_queries_do_not_grow(self, client, user, group):
+        def grow(size):
+            Post.objects.bulk_create(
+                Post(author=user, group=group, text='Тестовый пост')
+                for _ in range(size - Post.objects.count())
+            )
+
+        assert_constant_queries(lambda: client.get(f'/profile/{user.username}/'), grow)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_post_detail_queries_do_not_grow(self, user_client, user):
+        post = Post.objects.create(author=user, text='Тестовый пост')
+
+        def grow(size):
+            count = size - Comment.objects.count()
+            for author in add_authors_posts(count):
+                Comment.objects.create(post=post, author=author, text='Комментарий')
+
+        assert_constant_queries(lambda: user_client.get(f'/posts/{post.pk}/'), grow)
+
+    @pytest.mark.django_db(transaction=True)
+    def test_follow_index_queries_do_not_grow(self, user_client, user, group):
+        def grow(size):
+            count = size - Follow.objects.filter(user=user).count()
+            Follow.objects.bulk_create(
+                Follow(user=user, author=author) for author in add_authors_posts(count, group)
+            )
+
+        assert_constant_queries(lambda: user_client.get('/follow/'), grow)
@@ -0,0 +1,27 @@
+from django.contrib.admin.utils import model_format_dict
+
+
+class BackgroundDeleteMixin:
+    """Удаление из админки без сбора связанных объектов.
+
+    Стандартные действие и страница подтверждения загружают в память
+    все связанные строки; здесь объект только помечается, а связанное
+    удаляет фоновая задача.
+    """
+
+    def get_actions(self, request):
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def get_deleted_objects(self, objs, request):
+        objs = list(objs)
+        opts = self.model._meta
+        deleted_objects = [
+            f'{opts.verbose_name}: {obj} (связанные записи удалятся в фоне)'
+            for obj in objs
+        ]
+        model_count = {model_format_dict(opts)['verbose_name_plural']: len(
+            objs
+        )}
+        return deleted_objects, model_count, set(), []
@@ -3,3 +3,14 @@ from django.apps import AppConfig
 
 class CoreConfig(AppConfig):
     name = 'core'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import holes, rendering, slow_queries
+
+        holes.register(
+            'header', holes.template_renderer('includes/header.html')
+        )
+        rendering.install()
+        connection_created.connect(slow_queries.install)
@@ -0,0 +1,78 @@
+import hashlib
+from functools import wraps
+
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.cache import cache_page as django_cache_page
+
+from . import holes, surrogate
+
+
+def cache_page(timeout, *, cache=None, key_prefix=None):
+    """cache_page, запоминающий префикс ключа у представления:
+    по нему метрики считают попадания в кеш."""
+    def decorator(view):
+        wrapped = django_cache_page(
+            timeout, cache=cache, key_prefix=key_prefix
+        )(view)
+        wrapped.cache_prefix = key_prefix
+        return wrapped
+    return decorator
+
+
+def shell_key(request, key_prefix):
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'shell:{key_prefix}:{url}'
+
+
+def cache_shell(timeout, *, cache=None, key_prefix=None):
+    """Кеш оболочки страницы, общий для всех пользователей.
+
+    Представление рендерится один раз с метками вместо тегов
+    ``{% hole %}``; каждый запрос берёт оболочку из кеша и рисует
+    только дырки — шапку, кнопки лайков, CSRF-токены. Так кеш
+    работает и для вошедших пользователей.
+
+    Если представление вывело CSRF-токен вне дырки, оболочка личная
+    и в кеш не попадает.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            store = caches[cache or 'default']
+            key = shell_key(request, key_prefix)
+            cached = store.get(key)
+            # Тот же флаг оставляет FetchFromCacheMiddleware: по нему
+            # MetricsMiddleware считает попадания.
+            request._cache_update_cache = cached is None
+            if cached is None:
+                request.shell_rendering = True
+                response = view(request, *args, **kwargs)
+                request.shell_rendering = False
+                if response.streaming:
+                    return response
+                personal = request.META.get('CSRF_COOKIE_USED')
+                if response.status_code != 200 or personal:
+                    response.content = holes.fill(
+                        response.content.decode(response.charset), request
+                    )
+                    return response
+                cached = (
+                    response.content.decode(response.charset),
+                    response['Content-Type'],
+                    surrogate.keys(request),
+                )
+                store.set(key, cached, timeout)
+            shell, content_type, keys = cached
+            surrogate.tag(request, *keys)
+            response = HttpResponse(
+                holes.fill(shell, request), content_type=content_type
+            )
+            patch_vary_headers(response, ('Cookie',))
+            return response
+        wrapped.cache_prefix = key_prefix
+        return wrapped
+    return decorator
@@ -0,0 +1,117 @@
+import gzip
+import io
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
+# Эти форматы уже сжаты, повторное сжатие только тратит CPU.
+COMPRESSED_EXTENSIONS = frozenset({
+    '.br', '.gif', '.gz', '.ico', '.jpeg', '.jpg', '.mp4', '.png',
+    '.webm', '.webp', '.woff', '.woff2', '.zip',
+})
+
+ENCODING_SUFFIXES = {
+    'br': '.br',
+    'gzip': '.gz',
+}
+
+
+def available_encodings():
+    """Кодировки, доступные в текущем окружении, в порядке предпочтения."""
+    if brotli is not None:
+        return ('br', 'gzip')
+    return ('gzip',)
+
+
+def compress(data, encoding):
+    """Сжимает байты максимальным уровнем выбранного алгоритма."""
+    if encoding == 'br':
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    buffer = io.BytesIO()
+    with gzip.GzipFile(
+        fileobj=buffer, mode='wb', compresslevel=GZIP_LEVEL, mtime=0
+    ) as gzip_file:
+        gzip_file.write(data)
+    return buffer.getvalue()
+
+
+class GzipCompressor:
+    """Потоковый gzip: каждый блок сжимается и сразу отдаётся."""
+
+    def __init__(self, level):
+        self.compressobj = zlib.compressobj(level, zlib.DEFLATED, 16 + 15)
+
+    def compress(self, data):
+        return self.compressobj.compress(data) + self.compressobj.flush(
+            zlib.Z_SYNC_FLUSH
+        )
+
+    def finish(self):
+        return self.compressobj.flush(zlib.Z_FINISH)
+
+
+class BrotliCompressor:
+    """Потоковый brotli с той же парой методов, что и у gzip."""
+
+    def __init__(self, level):
+        self.compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self.compressor.process(data) + self.compressor.flush()
+
+    def finish(self):
+        return self.compressor.finish()
+
+
+def compressor(encoding, level):
+    """Возвращает потоковый компрессор для выбранной кодировки."""
+    if encoding == 'br':
+        return BrotliCompressor(level)
+    return GzipCompressor(level)
+
+
+def compress_stream(chunks, encoding, level):
+    """Сжимает последовательность блоков, не собирая её в памяти."""
+    stream = compressor(encoding, level)
+    for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+def parse_accept_encoding(header):
+    """Возвращает словарь «кодировка -> q» из заголовка Accept-Encoding."""
+    weights = {}
+    for item in header.split(','):
+        encoding, _, params = item.strip().partition(';')
+        encoding = encoding.strip().lower()
+        if not encoding:
+            continue
+        quality = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[encoding] = quality
+    return weights
+
+
+def negotiate(header, encodings):
+    """Выбирает лучшую из ``encodings`` кодировку, которую примет клиент."""
+    weights = parse_accept_encoding(header or '')
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = weights.get(encoding, weights.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
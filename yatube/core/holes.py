@@ -0,0 +1,59 @@
+import base64
+import json
+import re
+from collections import defaultdict
+
+from django.template.loader import render_to_string
+
+registry = {}
+marker_re = re.compile(r'<!--hole:(?P<name>[\w-]+):(?P<params>[\w=-]*)-->')
+
+
+def register(name, renderer):
+    """Регистрирует дырку страницы.
+
+    ``renderer(request, params)`` получает параметры всех дырок этого
+    имени на странице и возвращает HTML для каждой — так данные для
+    всех постов страницы можно прочитать одним запросом.
+    """
+    registry[name] = renderer
+
+
+def template_renderer(template_name):
+    """Дырка, которая рендерит шаблон с контекстом запроса."""
+    def renderer(request, params):
+        return [
+            render_to_string(template_name, values, request)
+            for values in params
+        ]
+    return renderer
+
+
+def marker(name, params):
+    """Метка дырки в кешированной оболочке.
+
+    Параметры закодированы в base64, а пользовательский текст
+    в шаблонах экранируется, поэтому подделать метку нельзя.
+    """
+    encoded = base64.urlsafe_b64encode(
+        json.dumps(params, sort_keys=True).encode()
+    ).decode()
+    return f'<!--hole:{name}:{encoded}-->'
+
+
+def fill(shell, request):
+    """Подставляет в оболочку дырки, отрисованные для этого запроса."""
+    found = defaultdict(list)
+    for match in marker_re.finditer(shell):
+        found[match.group('name')].append(match.group('params'))
+    rendered = {}
+    for name, encoded in found.items():
+        params = [
+            json.loads(base64.urlsafe_b64decode(item)) for item in encoded
+        ]
+        for item, html in zip(encoded, registry[name](request, params)):
+            rendered[name, item] = html
+    return marker_re.sub(
+        lambda match: rendered[match.group('name'), match.group('params')],
+        shell,
+    )
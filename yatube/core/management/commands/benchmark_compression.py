@@ -0,0 +1,75 @@
+import timeit
+
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.compression import available_encodings, compress_stream
+from posts.models import Group, User
+
+LEVELS = {
+    'br': (1, 5, 11),
+    'gzip': (1, 6, 9),
+}
+
+
+class Command(BaseCommand):
+    help = 'Сравнивает время сжатия страниц и сэкономленные байты.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'paths', nargs='*',
+            help='Адреса страниц; по умолчанию главная, самая большая '
+                 'группа и самый активный автор.',
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=20,
+            help='Сколько раз сжимать каждую страницу для замера.',
+        )
+
+    def default_paths(self):
+        paths = [reverse('posts:index')]
+        group = Group.objects.annotate(
+            posts_count=Count('posts')
+        ).order_by('-posts_count').first()
+        if group is not None:
+            paths.append(reverse('posts:group_list', args=(group.slug,)))
+        author = User.objects.annotate(
+            posts_count=Count('posts')
+        ).order_by('-posts_count').first()
+        if author is not None:
+            paths.append(reverse('posts:profile', args=(author.username,)))
+        return paths
+
+    def handle(self, *args, **options):
+        client = Client()
+        repeat = options['repeat']
+        self.stdout.write(
+            f'{"page":<32}{"encoding":<10}{"level":>6}{"bytes":>10}'
+            f'{"saved":>8}{"ms":>9}{"MB/s":>9}'
+        )
+        for path in options['paths'] or self.default_paths():
+            response = client.get(path)
+            if response.streaming:
+                content = b''.join(response.streaming_content)
+            else:
+                content = response.content
+            self.stdout.write(
+                f'{path:<32}{"identity":<10}{"-":>6}{len(content):>10}'
+                f'{"0%":>8}{"-":>9}{"-":>9}'
+            )
+            for encoding in available_encodings():
+                for level in LEVELS[encoding]:
+                    def run():
+                        return b''.join(
+                            compress_stream([content], encoding, level)
+                        )
+                    size = len(run())
+                    seconds = timeit.timeit(run, number=repeat) / repeat
+                    saved = 100 - size * 100 // max(len(content), 1)
+                    speed = len(content) / seconds / 2 ** 20
+                    self.stdout.write(
+                        f'{"":<32}{encoding:<10}{level:>6}{size:>10}'
+                        f'{saved:>7}%{seconds * 1000:>9.3f}{speed:>9.1f}'
+                    )
@@ -0,0 +1,79 @@
+import json
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+class QueryGroup:
+    def __init__(self, entry):
+        self.sql = entry['sql']
+        self.plan = None
+        self.count = 0
+        self.total = 0.0
+        self.slowest = 0.0
+        self.sites = Counter()
+
+    def add(self, entry):
+        self.count += 1
+        self.total += entry['duration_ms']
+        self.slowest = max(self.slowest, entry['duration_ms'])
+        self.sites[(entry['view'], entry['line'])] += 1
+        if self.plan is None and entry.get('plan'):
+            self.plan = entry['plan']
+
+
+class Command(BaseCommand):
+    help = 'Сводка журнала медленных запросов по отпечаткам SQL.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--log', default=settings.SLOW_QUERY_LOG,
+            help='Путь к журналу медленных запросов.',
+        )
+        parser.add_argument(
+            '--limit', type=int, default=10,
+            help='Сколько отпечатков показать.',
+        )
+        parser.add_argument(
+            '--sort', choices=('total', 'count', 'max'), default='total',
+            help='Порядок: общее время, число запросов или самый долгий.',
+        )
+
+    def read(self, path):
+        groups = {}
+        try:
+            with open(path, encoding='utf-8') as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    key = entry['fingerprint']
+                    if key not in groups:
+                        groups[key] = QueryGroup(entry)
+                    groups[key].add(entry)
+        except FileNotFoundError:
+            raise CommandError(f'Журнал {path} не найден')
+        return groups
+
+    def handle(self, *args, **options):
+        groups = self.read(options['log'])
+        order = {
+            'total': lambda item: item[1].total,
+            'count': lambda item: item[1].count,
+            'max': lambda item: item[1].slowest,
+        }[options['sort']]
+        top = sorted(groups.items(), key=order, reverse=True)
+        for key, group in top[:options['limit']]:
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{key}: {group.count} раз, всего {group.total:.1f} мс, '
+                f'в среднем {group.total / group.count:.1f} мс, '
+                f'максимум {group.slowest:.1f} мс'
+            ))
+            self.stdout.write(f'  {group.sql}')
+            for (view, line), count in group.sites.most_common(3):
+                self.stdout.write(f'  {count} × {line} (из {view})')
+            for row in group.plan or ():
+                self.stdout.write(f'  план: {row}')
+        self.stdout.write(f'Отпечатков: {len(groups)}')
@@ -0,0 +1,47 @@
+import re
+
+BLOCK_SIZE = 64 * 1024
+
+range_re = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header, size):
+    """Разбирает заголовок Range и возвращает (start, end) включительно.
+
+    Поддерживается только один диапазон: на несколько диапазонов
+    и нераспознанный заголовок возвращается None, и файл отдаётся целиком.
+    """
+    match = range_re.match(header.strip())
+    if match is None:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # bytes=-500: последние 500 байт.
+        length = int(end)
+        if length == 0:
+            raise RangeNotSatisfiable
+        return max(size - length, 0), size - 1
+    start = int(start)
+    end = int(end) if end else size - 1
+    if start >= size or end < start:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+def iter_range(file, start, end, block_size=BLOCK_SIZE):
+    """Читает файл блоками от start до end включительно."""
+    with file:
+        file.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = file.read(min(block_size, remaining))
+            if not block:
+                return
+            remaining -= len(block)
+            yield block
@@ -0,0 +1,334 @@
+import atexit
+import fcntl
+import glob
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+
+registry_lock = threading.Lock()
+registry = []
+last_flush = 0.0
+process = None
+RETIRED_FILE = 'retired.json'
+
+
+class Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.values = {}
+        registry.append(self)
+
+    def key(self, labels):
+        return tuple(str(labels[label]) for label in self.labels)
+
+
+class Counter(Metric):
+    """Счётчик, который только растёт."""
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with registry_lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    @staticmethod
+    def merge(total, value):
+        return (total or 0) + value
+
+    def samples(self, values):
+        for key, value in sorted(values.items()):
+            yield self.name, dict(zip(self.labels, key)), value
+
+
+class Histogram(Metric):
+    """Гистограмма: число наблюдений по корзинам, сумма и количество."""
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(), buckets=()):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        index = len(self.buckets)
+        for position, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = position
+                break
+        with registry_lock:
+            counts, total = self.values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0)
+            )
+            counts = list(counts)
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+    @staticmethod
+    def merge(total, value):
+        if total is None:
+            return list(value[0]), value[1]
+        counts = [left + right for left, right in zip(total[0], value[0])]
+        return counts, total[1] + value[1]
+
+    def samples(self, values):
+        for key, (counts, total) in sorted(values.items()):
+            labels = dict(zip(self.labels, key))
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                yield self.name + '_bucket', dict(
+                    labels, le=format_number(bound)
+                ), cumulative
+            yield self.name + '_sum', labels, total
+            yield self.name + '_count', labels, cumulative
+
+
+REQUEST_LATENCY = Histogram(
+    'yatube_request_duration_seconds',
+    'Время обработки запроса.',
+    labels=('view', 'status'),
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+CACHE_PAGE_REQUESTS = Counter(
+    'yatube_cache_page_requests_total',
+    'Обращения к страницам под cache_page по префиксу ключа.',
+    labels=('prefix', 'result'),
+)
+DB_QUERIES = Counter(
+    'yatube_db_queries_total',
+    'SQL-запросы по представлениям.',
+    labels=('view',),
+)
+DB_QUERIES_PER_REQUEST = Histogram(
+    'yatube_db_queries_per_request',
+    'Число SQL-запросов на запрос.',
+    labels=('view',),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100),
+)
+THUMBNAILS_GENERATED = Counter(
+    'yatube_thumbnails_generated_total',
+    'Нарезанные превью (без попаданий в хранилище ключей).',
+)
+UPLOAD_BYTES = Histogram(
+    'yatube_upload_bytes',
+    'Размер загруженных картинок.',
+    labels=('source',),
+    buckets=(
+        10 * 1024, 100 * 1024, 512 * 1024, 1024 * 1024,
+        5 * 1024 * 1024, 10 * 1024 * 1024, 50 * 1024 * 1024,
+    ),
+)
+
+
+def format_number(value):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, float) and not value.is_integer():
+        return repr(value)
+    return str(int(value))
+
+
+def escape(value):
+    return (
+        str(value).replace('\\', '\\\\').replace('\n', '\\n')
+        .replace('"', '\\"')
+    )
+
+
+def dump():
+    """Значения этого процесса в виде, пригодном для JSON."""
+    with registry_lock:
+        return {
+            metric.name: [
+                [list(key), value] for key, value in metric.values.items()
+            ]
+            for metric in registry
+        }
+
+
+def process_id():
+    """pid и случайный хвост: новый процесс с тем же pid не затрёт
+    файл прежнего. После fork id выдаётся заново."""
+    global process
+    pid = os.getpid()
+    if process is None or process[0] != pid:
+        process = (pid, f'{pid}-{uuid.uuid4().hex}')
+    return process[1]
+
+
+def process_file(name=None):
+    return os.path.join(
+        settings.METRICS_DIR, f'metrics-{name or process_id()}.json'
+    )
+
+
+def file_pid(path):
+    try:
+        return int(os.path.basename(path).split('-')[1])
+    except ValueError:
+        return None
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def write_json(path, data):
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(descriptor, 'w') as target:
+        json.dump(data, target)
+    os.replace(temporary, path)
+
+
+def read_json(path):
+    try:
+        with open(path) as source:
+            return json.load(source)
+    except (OSError, ValueError):
+        return None
+
+
+@contextmanager
+def retired_lock():
+    """Блокировка каталога, пока файлы процессов переносятся в итог."""
+    path = os.path.join(settings.METRICS_DIR, 'retired.lock')
+    with open(path, 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def retire(paths):
+    """Прибавляет значения завершившихся процессов к общему итогу
+    и удаляет их файлы. Вызывается под retired_lock."""
+    retired = os.path.join(settings.METRICS_DIR, RETIRED_FILE)
+    snapshots = [read_json(path) for path in [retired] + list(paths)]
+    write_json(retired, as_snapshot(merge(
+        snapshot for snapshot in snapshots if snapshot is not None
+    )))
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def flush():
+    """Атомарно записывает значения процесса в общий каталог."""
+    global last_flush
+    if not settings.METRICS_DIR:
+        return
+    os.makedirs(settings.METRICS_DIR, exist_ok=True)
+    write_json(process_file(), dump())
+    last_flush = time.monotonic()
+
+
+def retire_self():
+    """При выходе процесса его значения уходят в общий итог."""
+    if not settings.configured or not settings.METRICS_DIR:
+        return
+    flush()
+    with retired_lock():
+        retire([process_file()])
+
+
+def maybe_flush():
+    if time.monotonic() - last_flush >= settings.METRICS_FLUSH_INTERVAL:
+        flush()
+
+
+def merge(snapshots):
+    merged = {metric.name: {} for metric in registry}
+    by_name = {metric.name: metric for metric in registry}
+    for snapshot in snapshots:
+        for name, values in snapshot.items():
+            metric = by_name.get(name)
+            if metric is None:
+                continue
+            for key, value in values:
+                key = tuple(key)
+                merged[name][key] = metric.merge(
+                    merged[name].get(key), value
+                )
+    return merged
+
+
+def as_snapshot(merged):
+    return {
+        name: [[list(key), value] for key, value in values.items()]
+        for name, values in merged.items()
+    }
+
+
+def collect():
+    """Складывает значения всех процессов.
+
+    Свой процесс берётся из памяти, остальные — из их файлов.
+    Файлы завершившихся воркеров переносятся в общий итог
+    ``retired.json``, чтобы счётчики не падали и файлы не копились.
+    """
+    snapshots = [dump()]
+    if settings.METRICS_DIR:
+        os.makedirs(settings.METRICS_DIR, exist_ok=True)
+        own = process_file()
+        with retired_lock():
+            dead = []
+            for path in glob.glob(process_file('*-*')):
+                pid = file_pid(path)
+                if path == own or pid is None:
+                    continue
+                if not is_alive(pid):
+                    dead.append(path)
+                    continue
+                snapshots.append(read_json(path))
+            if dead:
+                retire(dead)
+            snapshots.append(read_json(
+                os.path.join(settings.METRICS_DIR, RETIRED_FILE)
+            ))
+    return merge(snapshot for snapshot in snapshots if snapshot is not None)
+
+
+def render():
+    """Текстовый формат экспозиции Prometheus."""
+    merged = collect()
+    lines = []
+    for metric in registry:
+        lines.append(f'# HELP {metric.name} {metric.documentation}')
+        lines.append(f'# TYPE {metric.name} {metric.kind}')
+        for name, labels, value in metric.samples(merged[metric.name]):
+            if labels:
+                pairs = ','.join(
+                    f'{label}="{escape(text)}"'
+                    for label, text in labels.items()
+                )
+                name = f'{name}{{{pairs}}}'
+            lines.append(f'{name} {format_number(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+def reset():
+    with registry_lock:
+        for metric in registry:
+            metric.values.clear()
+
+
+atexit.register(retire_self)
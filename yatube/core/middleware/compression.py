@@ -0,0 +1,64 @@
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from ..compression import available_encodings, compress_stream, negotiate
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/javascript',
+    'application/json',
+    'application/xml',
+    'image/svg+xml',
+)
+MIN_LENGTH = 200
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    """Сжимает обычные и потоковые ответы gzip или brotli.
+
+    Кодировка выбирается по Accept-Encoding; уже сжатые форматы
+    (картинки, архивы), ответы с Content-Encoding и всё, кроме 200,
+    не трогаются: сжатый 206 разошёлся бы со своим Content-Range.
+    """
+
+    def process_response(self, request, response):
+        if response.status_code != 200 or response.has_header(
+            'Content-Range'
+        ):
+            return response
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.streaming and len(response.content) < MIN_LENGTH:
+            return response
+        content_type = response.get('Content-Type', '')
+        if not content_type.startswith(COMPRESSIBLE_TYPES):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = negotiate(
+            request.META.get('HTTP_ACCEPT_ENCODING'), available_encodings()
+        )
+        if encoding is None:
+            return response
+        level = settings.COMPRESSION_LEVELS[encoding]
+
+        if response.streaming:
+            response.streaming_content = compress_stream(
+                response.streaming_content, encoding, level
+            )
+            del response['Content-Length']
+        else:
+            compressed = b''.join(
+                compress_stream([response.content], encoding, level)
+            )
+            if len(compressed) >= len(response.content):
+                return response
+            response.content = compressed
+            response['Content-Length'] = str(len(compressed))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
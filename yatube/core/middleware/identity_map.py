@@ -0,0 +1,16 @@
+from .. import orm_cache
+
+
+class IdentityMapMiddleware:
+    """Заводит на время запроса карту уже загруженных строк:
+    одна и та же группа или пользователь не читаются дважды."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        orm_cache.local.identity_map = orm_cache.IdentityMap()
+        try:
+            return self.get_response(request)
+        finally:
+            orm_cache.local.identity_map = None
@@ -0,0 +1,56 @@
+import time
+from contextlib import ExitStack
+
+from django.db import connections
+
+from .. import metrics
+from .profiling import view_name
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Собирает время ответа, SQL-запросы и попадания в cache_page.
+
+    Ставится первой, чтобы время включало остальные middleware.
+    Попадание в кеш видно по флагу, который FetchFromCacheMiddleware
+    оставляет в request._cache_update_cache: True — промах.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(counter))
+            response = self.get_response(request)
+        name = view_name(request)
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            view=name, status=response.status_code,
+        )
+        metrics.DB_QUERIES.inc(counter.count, view=name)
+        metrics.DB_QUERIES_PER_REQUEST.observe(counter.count, view=name)
+        self.count_cache(request, name)
+        metrics.maybe_flush()
+        return response
+
+    def count_cache(self, request, name):
+        updated = getattr(request, '_cache_update_cache', None)
+        if updated is None or request.method not in ('GET', 'HEAD'):
+            return
+        match = request.resolver_match
+        prefix = getattr(match.func, 'cache_prefix', None) or name
+        metrics.CACHE_PAGE_REQUESTS.inc(
+            prefix=prefix, result='miss' if updated else 'hit'
+        )
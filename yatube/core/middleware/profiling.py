@@ -0,0 +1,116 @@
+import cProfile
+import os
+import pstats
+import random
+import threading
+import time
+
+from django.conf import settings
+
+# В процессе может работать только один профилировщик: второй
+# cProfile в соседнем потоке либо падает, либо портит статистику.
+profiler_lock = threading.Lock()
+stats_lock = threading.Lock()
+view_stats = {}
+
+
+class ViewStats:
+    """Накопленная статистика cProfile одного представления."""
+
+    def __init__(self):
+        self.requests = 0
+        self.seconds = 0.0
+        self.stats = None
+
+    def add(self, profiler, seconds):
+        self.requests += 1
+        self.seconds += seconds
+        if self.stats is None:
+            self.stats = pstats.Stats(profiler)
+        else:
+            self.stats.add(profiler)
+
+    def top(self, limit, sort='cumulative'):
+        """Самые дорогие функции: (функция, вызовы, собственное
+        время, время с вложенными) на один запрос.
+
+        sort_stats меняет общий Stats, поэтому, как и add(), работает
+        под stats_lock.
+        """
+        rows = []
+        with stats_lock:
+            self.stats.sort_stats(sort)
+            for func in self.stats.fcn_list[:limit]:
+                _, calls, total, cumulative, _ = self.stats.stats[func]
+                rows.append((
+                    pstats.func_std_string(func),
+                    calls / self.requests,
+                    total / self.requests,
+                    cumulative / self.requests,
+                ))
+        return rows
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+def snapshot():
+    with stats_lock:
+        return dict(view_stats)
+
+
+def reset():
+    with stats_lock:
+        view_stats.clear()
+
+
+class ProfilingMiddleware:
+    """Профилирует выборку запросов через cProfile.
+
+    Профилируется доля PROFILING_SAMPLE_RATE запросов и запросы
+    сотрудников с заголовком PROFILING_HEADER. Статистика копится
+    по имени представления и видна на странице /profiling/;
+    с PROFILING_DIR каждый профиль ещё и сохраняется в .prof файл.
+    Ставится после AuthenticationMiddleware, чтобы видеть is_staff.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def should_profile(self, request):
+        if request.META.get(settings.PROFILING_HEADER):
+            user = getattr(request, 'user', None)
+            if user is not None and user.is_staff:
+                return True
+        rate = settings.PROFILING_SAMPLE_RATE
+        return rate > 0 and random.random() < rate
+
+    def __call__(self, request):
+        if not self.should_profile(request):
+            return self.get_response(request)
+        if not profiler_lock.acquire(blocking=False):
+            return self.get_response(request)
+        try:
+            profiler = cProfile.Profile()
+            started = time.perf_counter()
+            response = profiler.runcall(self.get_response, request)
+            seconds = time.perf_counter() - started
+        finally:
+            profiler_lock.release()
+        name = view_name(request)
+        with stats_lock:
+            view_stats.setdefault(name, ViewStats()).add(profiler, seconds)
+        if settings.PROFILING_DIR:
+            self.dump(profiler, name)
+        return response
+
+    def dump(self, profiler, name):
+        os.makedirs(settings.PROFILING_DIR, exist_ok=True)
+        filename = '{}-{}-{}.prof'.format(
+            name.replace(':', '.'), int(time.time() * 1000), os.getpid()
+        )
+        profiler.dump_stats(os.path.join(settings.PROFILING_DIR, filename))
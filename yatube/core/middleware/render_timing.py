@@ -0,0 +1,65 @@
+import logging
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from .. import rendering
+
+HEADER_ENTRIES = 10
+
+logger = logging.getLogger(__name__)
+
+
+def server_timing(collector):
+    """Заголовок Server-Timing: SQL и самые долгие шаблоны запроса.
+
+    Имя метрики должно быть токеном, поэтому имя шаблона уходит
+    в desc, а метрики нумеруются.
+    """
+    entries = [f'sql;desc="SQL: {collector.queries}"']
+    timings = sorted(
+        collector.timings.items(),
+        key=lambda item: item[1].own,
+        reverse=True,
+    )
+    for index, (name, timing) in enumerate(timings[:HEADER_ENTRIES]):
+        entries.append(
+            f'tpl{index};desc="{name} x{timing.calls}, '
+            f'SQL: {timing.queries}";dur={timing.own * 1000:.2f}'
+        )
+    return ', '.join(entries)
+
+
+class RenderTimingMiddleware:
+    """Замеряет рендер шаблонов, include и тега thumbnail.
+
+    Включается настройкой RENDER_TIMING. Итог запроса уходит
+    в заголовок Server-Timing (виден в DevTools браузера) и в лог,
+    а общая статистика — на страницу /profiling/.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.RENDER_TIMING:
+            return self.get_response(request)
+        collector = rendering.RenderCollector()
+        rendering.local.collector = collector
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(
+                        connection.execute_wrapper(collector.count_query)
+                    )
+                response = self.get_response(request)
+        finally:
+            rendering.local.collector = None
+        rendering.record(collector)
+        if collector.timings:
+            response['Server-Timing'] = server_timing(collector)
+            logger.debug(
+                '%s: %s', request.path, response['Server-Timing']
+            )
+        return response
@@ -0,0 +1,18 @@
+from .. import slow_queries
+
+
+class SlowQueryViewMiddleware:
+    """Запоминает представление запроса для журнала медленных запросов:
+    по стеку его не найти за обёртками вроде кеша и WSGI-слоя."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            slow_queries.local.view = None
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        slow_queries.local.view = request.resolver_match.view_name
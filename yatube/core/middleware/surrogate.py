@@ -0,0 +1,51 @@
+from django.conf import settings
+from django.utils.cache import patch_cache_control
+
+from .. import surrogate
+
+
+def is_shared(request):
+    """Ответ одинаков для всех: аноним без сессии, сообщений и CSRF.
+
+    Иначе в странице может оказаться чужой токен CSRF, лайки или
+    сообщения, и прокси не должен отдавать её другим.
+    """
+    if not request.user.is_anonymous:
+        return False
+    if settings.SESSION_COOKIE_NAME in request.COOKIES:
+        return False
+    session = getattr(request, 'session', None)
+    if session is not None and session.modified:
+        return False
+    messages = getattr(request, '_messages', None)
+    if messages is not None and (messages.used or messages.added_new):
+        return False
+    return not request.META.get('CSRF_COOKIE_USED')
+
+
+class SurrogateKeyMiddleware:
+    """Пишет ключи, собранные представлением, в заголовок Surrogate-Key.
+
+    С SURROGATE_MAX_AGE прокси получает ещё и Surrogate-Control:
+    ответ можно держать долго, ведь изменения очищают его по ключам.
+    Личные страницы помечаются Cache-Control: private.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        keys = surrogate.keys(request)
+        if not keys or request.method not in ('GET', 'HEAD'):
+            return response
+        response[settings.SURROGATE_KEY_HEADER] = ' '.join(keys)
+        if not settings.SURROGATE_MAX_AGE or response.status_code != 200:
+            return response
+        if is_shared(request):
+            response['Surrogate-Control'] = (
+                f'max-age={settings.SURROGATE_MAX_AGE}'
+            )
+        else:
+            patch_cache_control(response, private=True)
+        return response
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя файла')),
+                ('size', models.BigIntegerField(default=0, verbose_name='Размер')),
+                ('references', models.PositiveIntegerField(default=1, verbose_name='Число ссылок')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Дата создания')),
+            ],
+        ),
+    ]
@@ -9,3 +9,24 @@ class CreatedModel(models.Model):
 
     class Meta:
         abstract = True
+
+
+class StoredFile(models.Model):
+    """Файл в хранилище по содержимому и число ссылок на него."""
+    name = models.CharField(
+        verbose_name='Имя файла',
+        max_length=255,
+        primary_key=True,
+    )
+    size = models.BigIntegerField(verbose_name='Размер', default=0)
+    references = models.PositiveIntegerField(
+        verbose_name='Число ссылок',
+        default=1,
+    )
+    created = models.DateTimeField(
+        verbose_name='Дата создания',
+        auto_now_add=True,
+    )
+
+    def __str__(self):
+        return self.name
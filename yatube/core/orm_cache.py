@@ -0,0 +1,126 @@
+import threading
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models.signals import post_delete, post_save
+from django.http import Http404
+
+local = threading.local()
+registry = {}
+columns = {}
+MISSING = 'missing'
+
+
+def get_cache():
+    return caches[settings.ORM_CACHE_ALIAS]
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def generation_key(model):
+    return f'orm:{label(model)}:generation'
+
+
+def invalidate(model):
+    """Делает недействительными все ключи модели.
+
+    Так не нужно знать старые значения полей: запись, сохранённая
+    под прежним slug, просто больше не найдётся. Изменения через
+    ``update()`` сигналов не шлют — после них нужно звать вручную.
+    """
+    cache = get_cache()
+    key = generation_key(model)
+    if not cache.add(key, 1, None):
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, 1, None)
+    identity_map = current_map()
+    if identity_map is not None:
+        identity_map.clear()
+
+
+def bump_generation(sender, update_fields=None, **kwargs):
+    # Сохранение только некешируемых полей (last_login при входе)
+    # ничего не меняет в кеше.
+    if update_fields and not set(update_fields) & set(columns[sender]):
+        return
+    invalidate(sender)
+
+
+def register(model, fields, only=()):
+    """Включает кеширование модели по полям ``fields`` (и pk).
+
+    С ``only`` в кеш попадают только эти столбцы: остальные (хеш
+    пароля, служебные даты) не лежат в кеше, а при обращении
+    к ним догружаются из базы.
+    """
+    registry[model] = ('pk',) + tuple(fields)
+    columns[model] = registry[model] + tuple(only) if only else tuple(
+        field.name for field in model._meta.concrete_fields
+    )
+    post_save.connect(bump_generation, sender=model, weak=False)
+    post_delete.connect(bump_generation, sender=model, weak=False)
+
+
+def current_map():
+    return getattr(local, 'identity_map', None)
+
+
+class IdentityMap:
+    """Строки, уже загруженные в этом запросе, по (модель, поле, значение)."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def get(self, model, field, value):
+        return self.rows.get((model, field, str(value)))
+
+    def add(self, instance):
+        model = type(instance)
+        for field in registry[model]:
+            value = getattr(instance, field)
+            self.rows[(model, field, str(value))] = instance
+
+    def clear(self):
+        self.rows.clear()
+
+
+def get(model, **lookup):
+    """Строка по одному полю: из карты запроса, из кеша или из базы.
+
+    Отсутствие строки тоже кешируется — создание новой записи
+    всё равно меняет поколение модели.
+    """
+    (field, value), = lookup.items()
+    if field not in registry[model]:
+        raise ValueError(f'{label(model)} не кешируется по полю {field}')
+    identity_map = current_map()
+    if identity_map is not None:
+        instance = identity_map.get(model, field, value)
+        if instance is not None:
+            return instance
+    cache = get_cache()
+    generation = cache.get(generation_key(model), 0)
+    key = f'orm:{label(model)}:{field}:{value}:{generation}'
+    instance = cache.get(key)
+    if instance is None:
+        queryset = model._default_manager.filter(**lookup)
+        if model in columns:
+            queryset = queryset.only(*columns[model])
+        instance = queryset.first() or MISSING
+        cache.set(key, instance, settings.ORM_CACHE_TIMEOUT)
+    if instance == MISSING:
+        return None
+    if identity_map is not None:
+        identity_map.add(instance)
+    return instance
+
+
+def get_or_404(model, **lookup):
+    instance = get(model, **lookup)
+    if instance is None:
+        raise Http404(f'{model._meta.object_name} не найден')
+    return instance
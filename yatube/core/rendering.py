@@ -0,0 +1,137 @@
+import threading
+import time
+
+from django.template.base import Template
+from sorl.thumbnail.templatetags.thumbnail import ThumbnailNodeBase
+
+local = threading.local()
+totals_lock = threading.Lock()
+totals = {}
+requests_seen = 0
+
+
+class Timing:
+    """Время и число вызовов шаблона или тега.
+
+    ``total`` включает вложенные шаблоны, ``own`` — только собственную
+    работу; ``queries`` — SQL-запросы, сделанные внутри, не считая
+    вложенных шаблонов. Блоки дочернего шаблона рендерятся внутри
+    родителя из extends, поэтому их время достаётся родителю.
+    """
+    __slots__ = ('calls', 'total', 'own', 'queries')
+
+    def __init__(self):
+        self.calls = 0
+        self.total = 0.0
+        self.own = 0.0
+        self.queries = 0
+
+    def merge(self, other):
+        self.calls += other.calls
+        self.total += other.total
+        self.own += other.own
+        self.queries += other.queries
+
+
+class Frame:
+    __slots__ = ('name', 'started', 'children', 'queries')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.children = 0.0
+        self.queries = 0
+
+
+class RenderCollector:
+    """Стек рендеринга одного запроса."""
+
+    def __init__(self):
+        self.timings = {}
+        self.stack = []
+        self.queries = 0
+
+    def enter(self, name):
+        self.stack.append(Frame(name))
+
+    def exit(self):
+        frame = self.stack.pop()
+        elapsed = time.perf_counter() - frame.started
+        if self.stack:
+            self.stack[-1].children += elapsed
+        timing = self.timings.setdefault(frame.name, Timing())
+        timing.calls += 1
+        timing.total += elapsed
+        timing.own += elapsed - frame.children
+        timing.queries += frame.queries
+
+    def count_query(self, execute, sql, params, many, context):
+        self.queries += 1
+        if self.stack:
+            self.stack[-1].queries += 1
+        return execute(sql, params, many, context)
+
+
+def current():
+    return getattr(local, 'collector', None)
+
+
+def measure(name, func, *args):
+    collector = current()
+    if collector is None:
+        return func(*args)
+    collector.enter(name)
+    try:
+        return func(*args)
+    finally:
+        collector.exit()
+
+
+def record(collector):
+    """Добавляет замеры запроса к общей статистике процесса."""
+    global requests_seen
+    with totals_lock:
+        requests_seen += 1
+        for name, timing in collector.timings.items():
+            totals.setdefault(name, Timing()).merge(timing)
+
+
+def snapshot():
+    with totals_lock:
+        copies = {}
+        for name, timing in totals.items():
+            copies[name] = Timing()
+            copies[name].merge(timing)
+        return requests_seen, copies
+
+
+def reset():
+    global requests_seen
+    with totals_lock:
+        totals.clear()
+        requests_seen = 0
+
+
+def instrument(cls, attribute, name):
+    original = getattr(cls, attribute)
+    if getattr(original, 'instrumented', False):
+        return
+
+    def wrapper(self, context):
+        return measure(name(self), original, self, context)
+
+    wrapper.instrumented = True
+    setattr(cls, attribute, wrapper)
+
+
+def install():
+    """Оборачивает рендер шаблонов и тега thumbnail замером времени.
+
+    Template._render вызывается и для страницы, и для include,
+    и для родителя в extends. Без активного сборщика обёртка
+    сразу зовёт оригинал. Повторный вызов ничего не меняет.
+    """
+    instrument(
+        Template, '_render', lambda template: template.name or '<строка>'
+    )
+    instrument(ThumbnailNodeBase, 'render', lambda node: '{% thumbnail %}')
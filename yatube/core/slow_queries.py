@@ -0,0 +1,136 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import traceback
+
+from django.conf import settings
+from django.utils import timezone
+
+write_lock = threading.Lock()
+explained_lock = threading.Lock()
+explained = set()
+local = threading.local()
+
+string_re = re.compile(r"'(?:[^']|'')*'")
+number_re = re.compile(r'\b\d+(?:\.\d+)?\b')
+placeholder_re = re.compile(r'%s|\?')
+in_list_re = re.compile(r'\bIN\s*\((?:\s*\?\s*,?)+\)', re.IGNORECASE)
+space_re = re.compile(r'\s+')
+
+SKIPPED_FRAMES = (
+    os.path.join('core', 'slow_queries.py'),
+    os.path.join('core', 'orm_cache.py'),
+    os.path.join('core', 'cache.py'),
+    os.path.join('core', 'wsgi.py'),
+    os.path.join('core', 'middleware', ''),
+    'manage.py',
+)
+
+
+def normalize(sql):
+    """SQL без литералов и с одним ? на весь IN (...)."""
+    sql = string_re.sub('?', sql)
+    sql = number_re.sub('?', sql)
+    sql = placeholder_re.sub('?', sql)
+    sql = in_list_re.sub('IN (...)', sql)
+    return space_re.sub(' ', sql).strip()
+
+
+def fingerprint(sql):
+    return hashlib.sha1(normalize(sql).encode()).hexdigest()[:12]
+
+
+def call_site():
+    """Представление (из SlowQueryViewMiddleware) или внешний кадр
+    проекта — команда; и строка, откуда ушёл запрос."""
+    frames = [
+        frame for frame in traceback.extract_stack()
+        if frame.filename.startswith(settings.BASE_DIR)
+        and 'site-packages' not in frame.filename
+        and not any(part in frame.filename for part in SKIPPED_FRAMES)
+    ]
+    view = getattr(local, 'view', None)
+    if not frames:
+        return view, None
+
+    def describe(frame):
+        path = os.path.relpath(frame.filename, settings.BASE_DIR)
+        return f'{path}:{frame.lineno} in {frame.name}'
+
+    return view or describe(frames[0]), describe(frames[-1])
+
+
+def explain(connection, sql, params):
+    """План запроса; для SQLite — EXPLAIN QUERY PLAN."""
+    prefix = (
+        'EXPLAIN QUERY PLAN' if connection.vendor == 'sqlite' else 'EXPLAIN'
+    )
+    local.explaining = True
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(map(str, row)) for row in cursor.fetchall()]
+    except Exception as error:
+        return [f'EXPLAIN не удался: {error}']
+    finally:
+        local.explaining = False
+
+
+def first_time(key):
+    with explained_lock:
+        if key in explained:
+            return False
+        explained.add(key)
+        return True
+
+
+def write(entry):
+    line = json.dumps(entry, ensure_ascii=False) + '\n'
+    with write_lock:
+        with open(settings.SLOW_QUERY_LOG, 'a', encoding='utf-8') as log:
+            log.write(line)
+
+
+def slow_query_logger(execute, sql, params, many, context):
+    """Обёртка execute: пишет запросы дольше порога в JSON-лог.
+
+    План EXPLAIN снимается один раз на отпечаток в процессе:
+    повторные записи того же запроса несут только время и место.
+    """
+    threshold = settings.SLOW_QUERY_THRESHOLD_MS
+    if threshold is None or getattr(local, 'explaining', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        duration = (time.perf_counter() - started) * 1000
+        if duration >= threshold:
+            log_query(context['connection'], sql, params, many, duration)
+
+
+def log_query(connection, sql, params, many, duration):
+    key = fingerprint(sql)
+    view, line = call_site()
+    entry = {
+        'time': timezone.now().isoformat(),
+        'fingerprint': key,
+        'duration_ms': round(duration, 3),
+        'view': view,
+        'line': line,
+        'sql': normalize(sql),
+        'database': connection.alias,
+    }
+    select = sql.lstrip().upper().startswith('SELECT')
+    if select and not many and first_time((connection.alias, key)):
+        entry['plan'] = explain(connection, sql, params)
+    write(entry)
+
+
+def install(connection, **kwargs):
+    """Подключает логгер к новому соединению (сигнал connection_created)."""
+    if slow_query_logger not in connection.execute_wrappers:
+        connection.execute_wrappers.append(slow_query_logger)
@@ -0,0 +1,148 @@
+import hashlib
+import os
+import re
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile, File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+from .compression import (
+    COMPRESSED_EXTENSIONS, ENCODING_SUFFIXES, available_encodings, compress
+)
+from .models import StoredFile
+
+content_name_re = re.compile(r'(^|/)([0-9a-f]{2}/){2}[0-9a-f]{64}(\.\w+)?$')
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем в имени и заранее сжатыми копиями (.gz, .br).
+
+    Сжатые копии создаются один раз при ``collectstatic``, поэтому
+    во время запроса сервер только выбирает готовый файл.
+    """
+    manifest_strict = False
+    min_compress_size = 256
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # До первого collectstatic ни манифеста, ни файлов ещё нет.
+            return name
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set(self.hashed_files) | set(self.hashed_files.values())
+        for name in sorted(names):
+            for compressed_name in self.compress_file(name):
+                yield name, compressed_name, True
+
+    def compress_file(self, name):
+        if os.path.splitext(name)[1].lower() in COMPRESSED_EXTENSIONS:
+            return
+        if not self.exists(name):
+            return
+        with self.open(name) as original:
+            data = original.read()
+        if len(data) < self.min_compress_size:
+            return
+        for encoding in available_encodings():
+            compressed = compress(data, encoding)
+            # Нет смысла хранить копию, которая почти не меньше оригинала.
+            if len(compressed) >= len(data) * 0.95:
+                continue
+            compressed_name = name + ENCODING_SUFFIXES[encoding]
+            if self.exists(compressed_name):
+                self.delete(compressed_name)
+            self._save(compressed_name, ContentFile(compressed))
+            yield compressed_name
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Медиафайлы с именем по SHA-256 содержимого.
+
+    Файлы раскладываются по вложенным каталогам из первых символов
+    хеша (posts/ab/cd/abcd….gif), чтобы ни в одном каталоге не копились
+    десятки тысяч записей. Одинаковые загрузки хранятся один раз,
+    а число ссылок на файл ведётся в ``StoredFile``.
+    """
+    shard_depth = 2
+    shard_width = 2
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        hexdigest = digest.hexdigest()
+        shards = [
+            hexdigest[index:index + self.shard_width]
+            for index in range(
+                0, self.shard_depth * self.shard_width, self.shard_width
+            )
+        ]
+        extension = os.path.splitext(name)[1].lower()
+        return '/'.join([
+            os.path.dirname(name), *shards, hexdigest + extension
+        ]).lstrip('/')
+
+    def is_content_name(self, name):
+        return content_name_re.search(name) is not None
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content)
+        if not self.exists(name):
+            # При гонке двух одинаковых загрузок вторая копия ляжет
+            # под случайным именем и будет удалена сборщиком мусора.
+            self._save(name, content)
+        self.reference(name, content.size)
+        return name
+
+    def reference(self, name, size=0):
+        """Добавляет ссылку на уже сохранённый файл.
+
+        mtime файла обновляется: сборщик мусора не трогает свежие файлы,
+        а пост, ради которого взята ссылка, может ещё не сохраниться.
+        """
+        try:
+            os.utime(self.path(name))
+        except FileNotFoundError:
+            pass
+        with transaction.atomic():
+            updated = StoredFile.objects.filter(name=name).update(
+                references=F('references') + 1
+            )
+            if not updated:
+                StoredFile.objects.create(name=name, size=size)
+
+    def delete(self, name):
+        """Убирает одну ссылку; сам файл удаляется вместе с последней."""
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(
+                name=name
+            ).first()
+            if stored is not None and stored.references > 1:
+                stored.references = F('references') - 1
+                stored.save(update_fields=['references'])
+                return
+            if stored is not None:
+                stored.delete()
+        super().delete(name)
+
+    def purge(self, name):
+        """Удаляет файл независимо от числа ссылок."""
+        StoredFile.objects.filter(name=name).delete()
+        super().delete(name)
+
+
+content_storage = ContentAddressedStorage()
@@ -0,0 +1,58 @@
+import requests
+from django.conf import settings
+from django.db import transaction
+
+from jobs.queue import task
+
+
+def tag(request, *keys):
+    """Добавляет ответу суррогатные ключи для очистки кеша CDN."""
+    if not hasattr(request, 'surrogate_keys'):
+        request.surrogate_keys = set()
+    request.surrogate_keys.update(key for key in keys if key)
+
+
+def keys(request):
+    return sorted(getattr(request, 'surrogate_keys', ()))
+
+
+def chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+@task
+def purge(keys):
+    """Просит прокси выбросить ответы с этими ключами.
+
+    Ключи уходят пачками в заголовке SURROGATE_KEY_HEADER запросом
+    SURROGATE_PURGE_METHOD на SURROGATE_PURGE_URL. Ошибка прокси
+    роняет задачу, и очередь повторит её позже.
+    """
+    if not settings.SURROGATE_PURGE_URL:
+        return 0
+    headers = {}
+    if settings.SURROGATE_PURGE_TOKEN:
+        headers['Authorization'] = f'Bearer {settings.SURROGATE_PURGE_TOKEN}'
+    keys = sorted(set(keys))
+    for batch in chunks(keys, settings.SURROGATE_PURGE_BATCH):
+        response = requests.request(
+            settings.SURROGATE_PURGE_METHOD,
+            settings.SURROGATE_PURGE_URL,
+            headers=dict(headers, **{
+                settings.SURROGATE_KEY_HEADER: ' '.join(batch)
+            }),
+            timeout=settings.SURROGATE_PURGE_TIMEOUT,
+        )
+        response.raise_for_status()
+    return len(keys)
+
+
+def schedule(keys):
+    """Ставит очистку после коммита: раньше прокси успел бы снова
+    закешировать старую версию."""
+    if not settings.SURROGATE_PURGE_URL:
+        return
+    keys = sorted(set(key for key in keys if key))
+    if keys:
+        transaction.on_commit(lambda: purge.delay(keys))
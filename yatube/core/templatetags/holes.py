@@ -0,0 +1,50 @@
+from django import template
+
+from .. import holes
+
+register = template.Library()
+
+
+class HoleNode(template.Node):
+    def __init__(self, name, params, nodelist):
+        self.name = name
+        self.params = params
+        self.nodelist = nodelist
+
+    def render(self, context):
+        request = context.get('request')
+        if not getattr(request, 'shell_rendering', False):
+            return self.nodelist.render(context)
+        params = {
+            key: value.resolve(context) for key, value in self.params.items()
+        }
+        return holes.marker(self.name, params)
+
+
+@register.tag
+def hole(parser, token):
+    """Часть страницы, которая своя у каждого пользователя.
+
+    ``{% hole 'like' post_id=post.pk %}...{% endhole %}``: обычно
+    выводится содержимое блока, а в оболочке для cache_shell — метка,
+    на место которой каждый запрос ставит свой HTML.
+    """
+    bits = token.split_contents()
+    if len(bits) < 2:
+        raise template.TemplateSyntaxError(
+            f'{bits[0]} ожидает имя дырки'
+        )
+    name = bits[1].strip('\'"')
+    if name not in holes.registry:
+        raise template.TemplateSyntaxError(f'Неизвестная дырка {name}')
+    params = {}
+    for bit in bits[2:]:
+        key, sep, value = bit.partition('=')
+        if not sep:
+            raise template.TemplateSyntaxError(
+                f'{bits[0]}: параметры передаются как имя=значение'
+            )
+        params[key] = parser.compile_filter(value)
+    nodelist = parser.parse(('endhole',))
+    parser.delete_first_token()
+    return HoleNode(name, params, nodelist)
@@ -0,0 +1,76 @@
+from collections import Counter
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from .slow_queries import normalize
+
+DEFAULT_SIZES = (1, 100)
+SHOWN_QUERIES = 5
+
+
+def capture_queries(make_request):
+    """Выполняет запрос на пустом кеше и возвращает его SQL-запросы."""
+    cache.clear()
+    with CaptureQueriesContext(connection) as context:
+        make_request()
+    return [query['sql'] for query in context.captured_queries]
+
+
+def extra_queries(before, after):
+    """Запросы, которых стало больше, без учёта значений параметров."""
+    counts = Counter(normalize(sql) for sql in before)
+    extra = []
+    for sql in after:
+        key = normalize(sql)
+        if counts[key]:
+            counts[key] -= 1
+        else:
+            extra.append(sql)
+    return extra
+
+
+def assert_constant_queries(make_request, grow, sizes=DEFAULT_SIZES,
+                            budget=None):
+    """Проверяет, что число запросов не растёт вместе с данными.
+
+    ``grow(size)`` доводит число постов, комментариев или подписок
+    до ``size``; после каждого шага ``make_request()`` выполняется
+    на пустом кеше. Разное число запросов — признак N+1: в ошибке
+    перечислены лишние запросы. ``budget`` ограничивает их число
+    сверху. Работает и в TestCase, и в тестах pytest.
+    """
+    baseline = None
+    for size in sizes:
+        grow(size)
+        queries = capture_queries(make_request)
+        if budget is not None and len(queries) > budget:
+            raise AssertionError(
+                f'{len(queries)} запросов при {size}, бюджет {budget}:\n'
+                + '\n'.join(queries)
+            )
+        if baseline is None:
+            baseline = size, queries
+            continue
+        base_size, base_queries = baseline
+        if len(queries) != len(base_queries):
+            extra = extra_queries(base_queries, queries)
+            raise AssertionError(
+                f'Число запросов растёт с данными: {len(base_queries)} '
+                f'при {base_size}, {len(queries)} при {size}. '
+                f'Лишние запросы ({len(extra)}):\n'
+                + '\n'.join(extra[:SHOWN_QUERIES])
+            )
+    return len(baseline[1])
+
+
+class QueryBudgetMixin:
+    """Проверка бюджета запросов для django.test.TestCase."""
+
+    def assertConstantQueries(self, make_request, grow,
+                              sizes=DEFAULT_SIZES, budget=None):
+        try:
+            return assert_constant_queries(make_request, grow, sizes, budget)
+        except AssertionError as error:
+            raise self.failureException(str(error)) from None
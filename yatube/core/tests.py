@@ -1,6 +1,28 @@
+import gzip
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
 from http import HTTPStatus
+from io import BytesIO, StringIO
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from . import metrics, rendering, slow_queries
+from .compression import negotiate
+from .middleware import profiling
+from .middleware.compression import CompressionMiddleware
+from .wsgi import SnapshotApp, StaticFilesApp
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +30,719 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+def call_wsgi(app, path, **environ):
+    """Вызывает WSGI-приложение и возвращает статус, заголовки и тело."""
+    result = {}
+
+    def start_response(status, headers):
+        result['status'] = status
+        result['headers'] = dict(headers)
+
+    environ.setdefault('REQUEST_METHOD', 'GET')
+    environ['PATH_INFO'] = path
+    body = b''.join(app(environ, start_response))
+    return result['status'], result['headers'], body
+
+
+class StaticFilesTests(TestCase):
+    """Сборка и отдача сжатой статики с хешем в имени."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.source = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        os.makedirs(os.path.join(cls.source, 'css'))
+        with open(os.path.join(cls.source, 'css', 'site.css'), 'w') as css:
+            css.write('body { color: red; }\n' * 100)
+        with override_settings(
+            STATICFILES_DIRS=[cls.source], STATIC_ROOT=cls.root
+        ):
+            call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.source, ignore_errors=True)
+        shutil.rmtree(cls.root, ignore_errors=True)
+
+    def setUp(self):
+        def django_app(environ, start_response):
+            start_response('404 Not Found', [])
+            return [b'django']
+
+        self.app = StaticFilesApp(
+            django_app, root=self.root, prefix='/static/'
+        )
+        self.hashed_url = next(
+            url for url, static_file in self.app.files.items()
+            if static_file.immutable and url.startswith('/static/css/site.')
+        )
+
+    def test_collectstatic_writes_gzip_copies(self):
+        """collectstatic создаёт .gz рядом с оригиналом и копией с хешем."""
+        path = os.path.join(self.root, 'css', 'site.css')
+        self.assertTrue(os.path.isfile(path + '.gz'))
+        with open(path, 'rb') as original, gzip.open(path + '.gz') as copy:
+            self.assertEqual(original.read(), copy.read())
+
+    def test_hashed_file_is_immutable(self):
+        """Файл с хешем отдаётся с бессрочным кешированием."""
+        status, headers, _ = call_wsgi(self.app, self.hashed_url)
+        self.assertEqual(status, '200 OK')
+        self.assertIn('immutable', headers['Cache-Control'])
+
+    def test_plain_name_is_not_immutable(self):
+        """Файл без хеша кешируется ненадолго."""
+        status, headers, _ = call_wsgi(self.app, '/static/css/site.css')
+        self.assertEqual(status, '200 OK')
+        self.assertNotIn('immutable', headers['Cache-Control'])
+
+    def test_gzip_variant_is_negotiated(self):
+        """Клиенту с gzip отдаётся заранее сжатая копия."""
+        status, headers, body = call_wsgi(
+            self.app, self.hashed_url, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+        self.assertEqual(headers['Vary'], 'Accept-Encoding')
+        self.assertIn(b'color: red', gzip.decompress(body))
+
+    def test_etag_returns_not_modified(self):
+        """Совпавший ETag даёт 304 без тела."""
+        _, headers, _ = call_wsgi(self.app, self.hashed_url)
+        status, _, body = call_wsgi(
+            self.app, self.hashed_url, HTTP_IF_NONE_MATCH=headers['ETag']
+        )
+        self.assertEqual(status, '304 Not Modified')
+        self.assertEqual(body, b'')
+
+    def test_etag_differs_per_encoding(self):
+        """У сжатой копии свой ETag; список и W/ в If-None-Match понятны."""
+        _, plain, _ = call_wsgi(self.app, self.hashed_url)
+        _, gzipped, _ = call_wsgi(
+            self.app, self.hashed_url, HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertNotEqual(plain['ETag'], gzipped['ETag'])
+        status, _, _ = call_wsgi(
+            self.app, self.hashed_url, HTTP_IF_NONE_MATCH=gzipped['ETag']
+        )
+        self.assertEqual(status, '200 OK')
+        for header in (
+            f'"other", {gzipped["ETag"]}',
+            f'W/{gzipped["ETag"]}',
+            '*',
+        ):
+            with self.subTest(header=header):
+                status, headers, _ = call_wsgi(
+                    self.app, self.hashed_url,
+                    HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=header,
+                )
+                self.assertEqual(status, '304 Not Modified')
+                self.assertEqual(headers['ETag'], gzipped['ETag'])
+
+    def test_unknown_path_goes_to_django(self):
+        """Всё, что не является собранной статикой, уходит в Django."""
+        _, _, body = call_wsgi(self.app, '/static/missing.css')
+        self.assertEqual(body, b'django')
+
+    def test_negotiate_respects_quality(self):
+        """Кодировка с q=0 не выбирается."""
+        self.assertEqual(negotiate('br;q=0, gzip', ('br', 'gzip')), 'gzip')
+        self.assertIsNone(negotiate('identity', ('br', 'gzip')))
+
+
+class SnapshotAppTests(TestCase):
+    """Отдача HTML-снимков анонимам до Django."""
+    def setUp(self):
+        self.root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, self.root, ignore_errors=True)
+        os.makedirs(os.path.join(self.root, 'group', 'cats'))
+        page = os.path.join(self.root, 'group', 'cats', 'index.html')
+        with open(page, 'w', encoding='utf-8') as snapshot:
+            snapshot.write('<p>Снимок</p>')
+        with open(page + '.gz', 'wb') as snapshot:
+            snapshot.write(gzip.compress('<p>Снимок</p>'.encode()))
+        with open(os.path.join(self.root, 'secret.txt'), 'w') as secret:
+            secret.write('secret')
+
+        def django_app(environ, start_response):
+            start_response('200 OK', [])
+            return [b'django']
+
+        self.app = SnapshotApp(django_app, root=self.root)
+
+    def test_anonymous_get_is_served_from_snapshot(self):
+        """Аноним получает снимок, браузер сверяет его по ETag."""
+        status, headers, body = call_wsgi(self.app, '/group/cats/')
+        self.assertEqual(status, '200 OK')
+        self.assertEqual(body.decode(), '<p>Снимок</p>')
+        self.assertEqual(headers['Content-Type'], 'text/html; charset=utf-8')
+        self.assertEqual(headers['Cache-Control'], 'no-cache')
+        status, _, _ = call_wsgi(
+            self.app, '/group/cats/', HTTP_IF_NONE_MATCH=headers['ETag']
+        )
+        self.assertEqual(status, '304 Not Modified')
+        _, headers, _ = call_wsgi(
+            self.app, '/group/cats/', HTTP_ACCEPT_ENCODING='gzip'
+        )
+        self.assertEqual(headers['Content-Encoding'], 'gzip')
+
+    def test_other_requests_go_to_django(self):
+        """Сессия, параметры, POST и чужие пути идут в Django."""
+        for path, environ in (
+            ('/group/cats/', {
+                'HTTP_COOKIE': f'{settings.SESSION_COOKIE_NAME}=abc'
+            }),
+            ('/group/cats/', {'HTTP_COOKIE': 'messages=abc'}),
+            ('/group/cats/', {'QUERY_STRING': 'page=2'}),
+            ('/group/cats/', {'REQUEST_METHOD': 'POST'}),
+            ('/group/dogs/', {}),
+            ('/secret.txt', {}),
+            ('/../', {}),
+            ('/group/x/../cats/', {}),
+        ):
+            with self.subTest(path=path, environ=environ):
+                _, _, body = call_wsgi(self.app, path, **environ)
+                self.assertEqual(body, b'django')
+
+
+class CompressionMiddlewareTests(TestCase):
+    """Сжатие HTML-ответов на лету."""
+    def setUp(self):
+        self.factory = RequestFactory()
+        self.middleware = CompressionMiddleware()
+        self.html = b'<p>post</p>' * 500
+
+    def process(self, response, accept='gzip'):
+        request = self.factory.get('/', HTTP_ACCEPT_ENCODING=accept)
+        return self.middleware.process_response(request, response)
+
+    def test_index_page_is_compressed(self):
+        """Главная страница отдаётся в gzip, если клиент его принимает."""
+        cache.clear()
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        cache.clear()
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn(b'</html>', gzip.decompress(response.content))
+
+    def test_streaming_response_is_compressed(self):
+        """Потоковый ответ сжимается блоками без Content-Length."""
+        response = self.process(
+            StreamingHttpResponse(iter([self.html, self.html]))
+        )
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+        body = gzip.decompress(b''.join(response.streaming_content))
+        self.assertEqual(body, self.html * 2)
+
+    def test_compressed_media_is_skipped(self):
+        """Картинки повторно не сжимаются."""
+        response = self.process(
+            HttpResponse(self.html, content_type='image/png')
+        )
+        self.assertFalse(response.has_header('Content-Encoding'))
+
+    def test_partial_response_is_skipped(self):
+        """Часть файла (206) уходит как есть, иначе сломается диапазон."""
+        response = HttpResponse(
+            self.html, content_type='image/svg+xml',
+            status=HTTPStatus.PARTIAL_CONTENT,
+        )
+        response['Content-Range'] = f'bytes 0-{len(self.html) - 1}/99999'
+        response = self.process(response)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response.content, self.html)
+
+    def test_without_accept_encoding_response_is_plain(self):
+        """Без Accept-Encoding ответ уходит как есть, но с Vary."""
+        response = self.process(HttpResponse(self.html), accept='')
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(response.content, self.html)
+
+    def test_benchmark_command_reports_sizes(self):
+        """Бенчмарк печатает размер исходной и сжатой страницы."""
+        out = StringIO()
+        call_command('benchmark_compression', '/', repeat=1, stdout=out)
+        cache.clear()
+        self.assertIn('identity', out.getvalue())
+        self.assertIn('gzip', out.getvalue())
+
+
+@override_settings(MEDIA_ROOT=tempfile.mkdtemp(dir=settings.BASE_DIR))
+class MediaViewTests(TestCase):
+    """Отдача медиа с Range, валидаторами и sendfile."""
+    content = bytes(range(256)) * 4
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(settings.MEDIA_ROOT, 'posts'))
+        path = os.path.join(settings.MEDIA_ROOT, 'posts', 'pic.png')
+        with open(path, 'wb') as picture:
+            picture.write(cls.content)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_full_file(self):
+        """Без Range файл отдаётся целиком с валидаторами."""
+        response = self.client.get('/media/posts/pic.png')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('max-age', response['Cache-Control'])
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_byte_range(self):
+        """Range отдаёт только запрошенные байты со статусом 206."""
+        response = self.client.get(
+            '/media/posts/pic.png', HTTP_RANGE='bytes=10-19'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.PARTIAL_CONTENT)
+        self.assertEqual(response['Content-Range'], 'bytes 10-19/1024')
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[10:20]
+        )
+
+    def test_suffix_range(self):
+        """bytes=-N отдаёт последние N байт."""
+        response = self.client.get(
+            '/media/posts/pic.png', HTTP_RANGE='bytes=-4'
+        )
+        self.assertEqual(
+            b''.join(response.streaming_content), self.content[-4:]
+        )
+
+    def test_unsatisfiable_range(self):
+        """Диапазон за концом файла даёт 416."""
+        response = self.client.get(
+            '/media/posts/pic.png', HTTP_RANGE='bytes=5000-'
+        )
+        self.assertEqual(
+            response.status_code, HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+        )
+        self.assertEqual(response['Content-Range'], 'bytes */1024')
+
+    def test_stale_if_range_returns_full_file(self):
+        """Если If-Range не совпал, Range игнорируется."""
+        response = self.client.get(
+            '/media/posts/pic.png',
+            HTTP_RANGE='bytes=0-9', HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+    def test_etag_returns_not_modified(self):
+        """Совпавший ETag даёт 304."""
+        etag = self.client.get('/media/posts/pic.png')['ETag']
+        response = self.client.get(
+            '/media/posts/pic.png', HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_MODIFIED)
+
+    def test_missing_file(self):
+        """Несуществующий файл — 404."""
+        response = self.client.get('/media/posts/none.png')
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_path_outside_media_root(self):
+        """Выйти за пределы MEDIA_ROOT нельзя."""
+        response = self.client.get('/media/../settings.py')
+        self.assertNotEqual(response.status_code, HTTPStatus.OK)
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect')
+    def test_accel_redirect(self):
+        """В режиме nginx воркер отдаёт только заголовок."""
+        response = self.client.get('/media/posts/pic.png')
+        self.assertEqual(
+            response['X-Accel-Redirect'], '/protected-media/posts/pic.png'
+        )
+        self.assertEqual(response.content, b'')
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile(self):
+        """В режиме X-Sendfile передаётся полный путь к файлу."""
+        response = self.client.get('/media/posts/pic.png')
+        self.assertEqual(
+            response['X-Sendfile'],
+            os.path.join(settings.MEDIA_ROOT, 'posts', 'pic.png')
+        )
+
+
+class ProfilingMiddlewareTests(TestCase):
+    """Выборочное профилирование запросов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User = get_user_model()
+        cls.staff = User.objects.create_user('staff', is_staff=True)
+        cls.user = User.objects.create_user('user')
+
+    def setUp(self):
+        cache.clear()
+        profiling.reset()
+
+    def tearDown(self):
+        profiling.reset()
+
+    def test_sampled_requests_are_aggregated_per_view(self):
+        """Профили копятся по имени представления."""
+        with self.settings(PROFILING_SAMPLE_RATE=1):
+            self.client.get(reverse('posts:index'))
+            self.client.get(reverse('about:author'))
+            self.client.get(reverse('about:author'))
+        stats = profiling.snapshot()
+        self.assertEqual(set(stats), {'posts:index', 'about:author'})
+        self.assertEqual(stats['about:author'].requests, 2)
+        self.assertTrue(stats['posts:index'].top(5))
+
+    def test_top_waits_for_stats_lock(self):
+        """Сортировка общей статистики ждёт, пока идёт add()."""
+        with self.settings(PROFILING_SAMPLE_RATE=1):
+            self.client.get(reverse('about:author'))
+        stats = profiling.snapshot()['about:author']
+        rows = []
+        reader = threading.Thread(target=lambda: rows.extend(stats.top(5)))
+        with profiling.stats_lock:
+            reader.start()
+            reader.join(0.1)
+            self.assertTrue(reader.is_alive())
+        reader.join()
+        self.assertTrue(rows)
+
+    def test_sampling_disabled_by_default(self):
+        """По умолчанию запросы не профилируются."""
+        self.client.get(reverse('posts:index'))
+        self.assertEqual(profiling.snapshot(), {})
+
+    def test_header_works_only_for_staff(self):
+        """Заголовок X-Profile включает профиль только сотруднику."""
+        self.client.force_login(self.user)
+        self.client.get(reverse('about:author'), HTTP_X_PROFILE='1')
+        self.assertEqual(profiling.snapshot(), {})
+        self.client.force_login(self.staff)
+        self.client.get(reverse('about:author'), HTTP_X_PROFILE='1')
+        self.assertIn('about:author', profiling.snapshot())
+
+    def test_report_page(self):
+        """Отчёт виден только сотрудникам и показывает функции."""
+        with self.settings(PROFILING_SAMPLE_RATE=1):
+            self.client.get(reverse('about:author'))
+        self.client.force_login(self.user)
+        response = self.client.get(reverse('profiling'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.client.force_login(self.staff)
+        response = self.client.get(reverse('profiling'))
+        self.assertContains(response, 'about:author')
+        self.assertContains(response, 'get_response')
+        self.client.post(reverse('profiling'))
+        self.assertEqual(profiling.snapshot(), {})
+
+    def test_profiles_are_dumped(self):
+        """С PROFILING_DIR каждый профиль сохраняется в .prof файл."""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, True)
+        with self.settings(PROFILING_SAMPLE_RATE=1, PROFILING_DIR=directory):
+            self.client.get(reverse('about:author'))
+        names = os.listdir(directory)
+        self.assertEqual(len(names), 1)
+        self.assertTrue(names[0].startswith('about.author-'))
+        self.assertTrue(names[0].endswith('.prof'))
+
+
+class RenderTimingTests(TestCase):
+    """Замер рендера шаблонов, include и тега thumbnail."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from posts.models import Post
+
+        cls.author = get_user_model().objects.create_user('author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        # Тестовый раннер подменяет Template._render своей обёрткой.
+        rendering.install()
+
+    def setUp(self):
+        cache.clear()
+        rendering.reset()
+
+    def tearDown(self):
+        rendering.reset()
+
+    def test_templates_and_tags_are_timed(self):
+        """Каждый шаблон и тег попадает в замеры со своим SQL."""
+        with self.settings(RENDER_TIMING=True):
+            response = self.client.get(
+                reverse('posts:post_detail', args=(self.post.pk,))
+            )
+        self.assertIn('sql;desc="SQL: ', response['Server-Timing'])
+        self.assertIn('posts/post_detail.html x1', response['Server-Timing'])
+        requests, timings = rendering.snapshot()
+        self.assertEqual(requests, 1)
+        for name in (
+            'posts/post_detail.html', 'base.html',
+            'includes/header.html', 'includes/comment.html',
+            '{% thumbnail %}',
+        ):
+            self.assertIn(name, timings)
+        page = timings['posts/post_detail.html']
+        self.assertLessEqual(page.own, page.total)
+        self.assertGreater(
+            sum(timing.queries for timing in timings.values()), 0
+        )
+
+    def test_disabled_by_default(self):
+        """Без RENDER_TIMING замеров нет."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertFalse(response.has_header('Server-Timing'))
+        self.assertEqual(rendering.snapshot(), (0, {}))
+
+    def test_report_shows_templates(self):
+        """Страница отчёта показывает среднее время шаблонов."""
+        with self.settings(RENDER_TIMING=True):
+            self.client.get(reverse('posts:index'))
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('profiling'))
+        self.assertContains(response, 'posts/index.html')
+
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+class MetricsTests(TestCase):
+    """Эндпоинт метрик и их сбор."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.media_root = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        cls.author = get_user_model().objects.create_user('author')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        metrics.reset()
+
+    def tearDown(self):
+        metrics.reset()
+
+    def scrape(self):
+        with self.settings(METRICS_TOKEN='secret'):
+            response = self.client.get(
+                reverse('metrics'), HTTP_AUTHORIZATION='Bearer secret'
+            )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.content.decode()
+
+    def test_latency_cache_and_queries(self):
+        """Время ответа, SQL и попадания в cache_page по префиксу."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_request_duration_seconds_count'
+            '{view="posts:index",status="200"} 2', text
+        )
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket'
+            '{view="posts:index",status="200",le="+Inf"} 2', text
+        )
+        self.assertIn(
+            'yatube_cache_page_requests_total'
+            '{prefix="index_page",result="miss"} 1', text
+        )
+        self.assertIn(
+            'yatube_cache_page_requests_total'
+            '{prefix="index_page",result="hit"} 1', text
+        )
+        self.assertIn('yatube_db_queries_total{view="posts:index"}', text)
+
+    def test_thumbnails_and_uploads_are_counted(self):
+        """Нарезка превью и размер загрузок попадают в метрики."""
+        from posts.models import Post
+        from posts.tasks import make_thumbnails
+
+        self.client.force_login(self.author)
+        with self.settings(MEDIA_ROOT=self.media_root):
+            self.client.post(reverse('posts:post_create'), {
+                'text': 'С картинкой',
+                'image': SimpleUploadedFile(
+                    'small.gif', SMALL_GIF, content_type='image/gif'
+                ),
+            })
+            post = Post.objects.get(text='С картинкой')
+            make_thumbnails(post.pk)
+            make_thumbnails(post.pk)
+        text = self.scrape()
+        self.assertIn('yatube_thumbnails_generated_total 1', text)
+        self.assertIn(
+            f'yatube_upload_bytes_sum{{source="form"}} {len(SMALL_GIF)}', text
+        )
+
+    def test_values_of_other_processes_are_summed(self):
+        """Значения других воркеров читаются из общего каталога."""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, True)
+        metrics.THUMBNAILS_GENERATED.inc(2)
+        other = os.path.join(directory, f'metrics-{os.getppid()}-a.json')
+        with open(other, 'w') as source:
+            source.write('{"yatube_thumbnails_generated_total": [[[], 3]]}')
+        with self.settings(METRICS_DIR=directory):
+            text = self.scrape()
+            self.assertTrue(os.path.exists(metrics.process_file()))
+        self.assertIn('yatube_thumbnails_generated_total 5', text)
+
+    def test_dead_processes_are_retired(self):
+        """Файл завершившегося воркера переходит в общий итог."""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, True)
+        child = subprocess.Popen(['true'])
+        child.wait()
+        dead = os.path.join(directory, f'metrics-{child.pid}-a.json')
+        for path, value in (
+            (dead, 3), (os.path.join(directory, 'retired.json'), 4)
+        ):
+            with open(path, 'w') as source:
+                source.write(json.dumps(
+                    {'yatube_thumbnails_generated_total': [[[], value]]}
+                ))
+        with self.settings(METRICS_DIR=directory):
+            self.assertIn('yatube_thumbnails_generated_total 7', self.scrape())
+            self.assertFalse(os.path.exists(dead))
+            self.assertIn('yatube_thumbnails_generated_total 7', self.scrape())
+            self.assertNotEqual(
+                metrics.process_file(),
+                os.path.join(directory, f'metrics-{os.getpid()}.json'),
+            )
+
+    def test_exiting_process_retires_itself(self):
+        """При выходе процесс переносит свои значения в итог."""
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, True)
+        metrics.THUMBNAILS_GENERATED.inc(2)
+        with self.settings(METRICS_DIR=directory):
+            metrics.retire_self()
+            self.assertFalse(os.path.exists(metrics.process_file()))
+            with open(os.path.join(directory, 'retired.json')) as source:
+                retired = json.load(source)
+        self.assertEqual(
+            retired['yatube_thumbnails_generated_total'], [[[], 2]]
+        )
+
+    def test_endpoint_is_not_public(self):
+        """Без токена метрики видны только сотрудникам, даже с 127.0.0.1."""
+        url = reverse('metrics')
+        for environ in (
+            {'REMOTE_ADDR': '127.0.0.1'},
+            {'HTTP_AUTHORIZATION': 'Bearer wrong'},
+        ):
+            with self.subTest(environ=environ):
+                with self.settings(METRICS_TOKEN='secret'):
+                    response = self.client.get(url, **environ)
+                self.assertEqual(
+                    response.status_code, HTTPStatus.NOT_FOUND
+                )
+        with self.settings(METRICS_ALLOWED_IPS=['10.0.0.1']):
+            response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        staff = get_user_model().objects.create_user('staff', is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(url, REMOTE_ADDR='10.0.0.1')
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+
+
+class SlowQueryLogTests(TestCase):
+    """Журнал медленных запросов с планами."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = get_user_model().objects.create_user('author')
+
+    def setUp(self):
+        cache.clear()
+        slow_queries.explained.clear()
+        directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+        self.addCleanup(shutil.rmtree, directory, True)
+        self.log = os.path.join(directory, 'slow.jsonl')
+
+    def entries(self):
+        with open(self.log) as log:
+            return [json.loads(line) for line in log]
+
+    def test_normalize_strips_literals(self):
+        """Отпечаток не зависит от значений и длины IN (...)."""
+        self.assertEqual(
+            slow_queries.fingerprint(
+                "SELECT * FROM t WHERE a = 1 AND b = 'x' AND c IN (%s, %s)"
+            ),
+            slow_queries.fingerprint(
+                "SELECT * FROM t WHERE a = 25 AND b = 'y' AND c IN (%s)"
+            ),
+        )
+
+    def test_slow_queries_are_logged_with_plan_once(self):
+        """Запрос выше порога пишется с местом вызова, план — один раз."""
+        url = reverse('posts:profile', args=(self.author.username,))
+        with self.settings(
+            SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG=self.log
+        ):
+            self.client.get(url)
+            cache.clear()
+            self.client.get(url)
+        entries = self.entries()
+        user_queries = [
+            entry for entry in entries if 'FROM "auth_user"' in entry['sql']
+        ]
+        self.assertEqual(len(user_queries), 2)
+        first, second = user_queries
+        self.assertEqual(first['fingerprint'], second['fingerprint'])
+        self.assertIn('plan', first)
+        self.assertNotIn('plan', second)
+        self.assertIn('posts/views.py', first['line'])
+        self.assertEqual(first['view'], 'posts:profile')
+
+    def test_view_behind_wsgi_and_shell_cache(self):
+        """За WSGI-слоем и кешем оболочки виден сам view главной."""
+        app = StaticFilesApp(WSGIHandler())
+        with self.settings(
+            SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG=self.log
+        ):
+            call_wsgi(
+                app, reverse('posts:index'),
+                SERVER_NAME='testserver', SERVER_PORT='80',
+                **{'wsgi.input': BytesIO(), 'wsgi.url_scheme': 'http'}
+            )
+        views = {entry['view'] for entry in self.entries()}
+        self.assertIn('posts:index', views)
+        self.assertFalse(any('core/' in str(view) for view in views))
+
+    def test_disabled_without_threshold(self):
+        """Без порога ничего не пишется."""
+        with self.settings(SLOW_QUERY_LOG=self.log):
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(os.path.exists(self.log))
+
+    def test_report_command_groups_by_fingerprint(self):
+        """Команда сводит записи по отпечаткам и показывает план."""
+        with self.settings(
+            SLOW_QUERY_THRESHOLD_MS=0, SLOW_QUERY_LOG=self.log
+        ):
+            self.client.get(reverse('posts:index'))
+        out = StringIO()
+        call_command('slow_queries', log=self.log, stdout=out)
+        self.assertIn(self.entries()[0]['fingerprint'], out.getvalue())
+        self.assertIn('план:', out.getvalue())
@@ -0,0 +1,14 @@
+from sorl.thumbnail.base import ThumbnailBackend
+
+from . import metrics
+
+
+class MetricsThumbnailBackend(ThumbnailBackend):
+    """Бэкенд sorl-thumbnail, считающий нарезанные превью."""
+
+    def _create_thumbnail(self, source_image, geometry_string, options,
+                          thumbnail):
+        super()._create_thumbnail(
+            source_image, geometry_string, options, thumbnail
+        )
+        metrics.THUMBNAILS_GENERATED.inc()
@@ -1,6 +1,22 @@
+import hmac
+import mimetypes
+import os
 from http import HTTPStatus
+from urllib.parse import quote
 
-from django.shortcuts import render
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    FileResponse, Http404, HttpResponse, StreamingHttpResponse
+)
+from django.shortcuts import redirect, render
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .media import RangeNotSatisfiable, iter_range, parse_range
+from . import metrics, rendering
+from .middleware import profiling
 
 
 def page_not_found(request, exception):
@@ -26,3 +42,143 @@ def server_error(request):
 
 def permission_denied(request, exception):
     return render(request, 'core/403.html', status=HTTPStatus.FORBIDDEN)
+
+
+def serve_media(request, path):
+    """Отдаёт файл из MEDIA_ROOT с Range, ETag и Last-Modified.
+
+    В режиме MEDIA_SENDFILE сам файл отдаёт фронтовой сервер,
+    а воркер только проверяет валидаторы и ставит заголовок.
+    """
+    full_path = safe_join(settings.MEDIA_ROOT, path)
+    if not os.path.isfile(full_path):
+        raise Http404
+    stat = os.stat(full_path)
+    etag = '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size)
+    last_modified = http_date(stat.st_mtime)
+
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(stat.st_mtime)
+    )
+    if response is None:
+        response = media_response(request, full_path, path, stat.st_size,
+                                  etag, last_modified)
+    response['ETag'] = etag
+    response['Last-Modified'] = last_modified
+    response['Cache-Control'] = (
+        f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}'
+    )
+    return response
+
+
+def media_response(request, full_path, path, size, etag, last_modified):
+    content_type, _ = mimetypes.guess_type(full_path)
+    content_type = content_type or 'application/octet-stream'
+
+    if settings.MEDIA_SENDFILE == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = full_path
+        return response
+    if settings.MEDIA_SENDFILE == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = (
+            settings.MEDIA_ACCEL_REDIRECT_PREFIX + quote(path)
+        )
+        return response
+
+    byte_range = None
+    if_range = request.META.get('HTTP_IF_RANGE')
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and if_range in (None, etag, last_modified):
+        try:
+            byte_range = parse_range(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(
+                status=HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE
+            )
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+
+    if byte_range is None:
+        response = FileResponse(
+            open(full_path, 'rb'), content_type=content_type
+        )
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_range(open(full_path, 'rb'), start, end),
+            status=HTTPStatus.PARTIAL_CONTENT,
+            content_type=content_type,
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+@staff_member_required
+def profiling_report(request):
+    """Самые дорогие функции по каждому профилированному представлению
+    и время рендера шаблонов."""
+    if request.method == 'POST':
+        profiling.reset()
+        rendering.reset()
+        return redirect('profiling')
+    sort = request.GET.get('sort', 'cumulative')
+    if sort not in ('cumulative', 'tottime', 'calls'):
+        sort = 'cumulative'
+    views = [
+        {
+            'name': name,
+            'requests': stats.requests,
+            'average': stats.seconds / stats.requests,
+            'functions': stats.top(settings.PROFILING_TOP, sort),
+        }
+        for name, stats in sorted(profiling.snapshot().items())
+    ]
+    requests, timings = rendering.snapshot()
+    templates = [
+        {
+            'name': name,
+            'calls': timing.calls / requests,
+            'total': timing.total / requests * 1000,
+            'own': timing.own / requests * 1000,
+            'queries': timing.queries / requests,
+        }
+        for name, timing in sorted(
+            timings.items(), key=lambda item: item[1].own, reverse=True
+        )
+    ]
+    return render(request, 'core/profiling.html', {
+        'views': views,
+        'templates': templates,
+        'render_requests': requests,
+        'sort': sort,
+        'sample_rate': settings.PROFILING_SAMPLE_RATE,
+    })
+
+
+def metrics_allowed(request):
+    token = settings.METRICS_TOKEN
+    authorization = request.META.get('HTTP_AUTHORIZATION', '')
+    if token and hmac.compare_digest(
+        authorization.encode(), f'Bearer {token}'.encode()
+    ):
+        return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """Метрики всех процессов в текстовом формате Prometheus.
+
+    Доступны сотрудникам и по токену METRICS_TOKEN в заголовке
+    Authorization: Bearer. Адреса из METRICS_ALLOWED_IPS пускаются
+    без токена — только если перед сайтом нет прокси: за ним
+    все клиенты приходят с его адреса.
+    """
+    if not request.user.is_staff and not metrics_allowed(request):
+        raise Http404
+    metrics.flush()
+    return HttpResponse(
+        metrics.render(), content_type='text/plain; version=0.0.4'
+    )
@@ -0,0 +1,222 @@
+import json
+import mimetypes
+import os
+from email.utils import formatdate
+
+from django.conf import settings
+from django.core.handlers.wsgi import get_path_info
+from django.http import parse_cookie
+from django.utils.http import parse_etags
+
+from .compression import ENCODING_SUFFIXES, negotiate
+
+BLOCK_SIZE = 64 * 1024
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE_CONTROL = 'public, max-age=60'
+
+
+class StaticFile:
+    """Собранный файл статики и его заранее сжатые варианты."""
+
+    def __init__(self, path, immutable):
+        self.path = path
+        self.immutable = immutable
+        stat = os.stat(path)
+        self.size = stat.st_size
+        self.last_modified = formatdate(stat.st_mtime, usegmt=True)
+        self.etag = '"{:x}-{:x}"'.format(int(stat.st_mtime), stat.st_size)
+        content_type, _ = mimetypes.guess_type(path)
+        self.content_type = content_type or 'application/octet-stream'
+        self.variants = {}
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            if os.path.isfile(path + suffix):
+                self.variants[encoding] = path + suffix
+
+    @property
+    def cache_control(self):
+        if self.immutable:
+            return IMMUTABLE_CACHE_CONTROL
+        return DEFAULT_CACHE_CONTROL
+
+    def etag_for(self, encoding):
+        """У каждого варианта свой сильный ETag: байты у них разные."""
+        if encoding not in self.variants:
+            return self.etag
+        return f'{self.etag[:-1]}-{encoding}"'
+
+    def headers(self, encoding):
+        path = self.variants.get(encoding, self.path)
+        headers = [
+            ('Content-Type', self.content_type),
+            ('Content-Length', str(os.path.getsize(path))),
+            ('Last-Modified', self.last_modified),
+            ('ETag', self.etag_for(encoding)),
+            ('Cache-Control', self.cache_control),
+        ]
+        if self.variants:
+            headers.append(('Vary', 'Accept-Encoding'))
+        if encoding in self.variants:
+            headers.append(('Content-Encoding', encoding))
+        return path, headers
+
+
+class StaticFilesApp:
+    """WSGI-слой, отдающий собранную статику до того, как запрос
+    попадёт в Django.
+
+    Файлы из ``STATIC_ROOT`` сканируются один раз при старте; имена
+    с хешем из манифеста отдаются с бессрочным кешированием.
+    """
+
+    def __init__(self, application, root=None, prefix=None):
+        self.application = application
+        self.root = root or settings.STATIC_ROOT
+        self.prefix = prefix or settings.STATIC_URL
+        self.files = self.scan()
+
+    def hashed_names(self):
+        manifest = os.path.join(self.root, 'staticfiles.json')
+        try:
+            with open(manifest) as manifest_file:
+                return set(json.load(manifest_file)['paths'].values())
+        except (OSError, ValueError, KeyError):
+            return set()
+
+    def scan(self):
+        files = {}
+        if not self.root or not os.path.isdir(self.root):
+            return files
+        hashed = self.hashed_names()
+        suffixes = tuple(ENCODING_SUFFIXES.values())
+        for directory, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                if filename.endswith(suffixes):
+                    continue
+                path = os.path.join(directory, filename)
+                name = os.path.relpath(path, self.root).replace(os.sep, '/')
+                files[self.prefix + name] = StaticFile(path, name in hashed)
+        return files
+
+    def __call__(self, environ, start_response):
+        static_file = self.files.get(environ.get('PATH_INFO', ''))
+        if static_file is None:
+            return self.application(environ, start_response)
+        return serve(static_file, environ, start_response)
+
+
+class SnapshotFile(StaticFile):
+    """HTML-снимок страницы: браузер каждый раз сверяет ETag."""
+    cache_control = 'no-cache'
+
+    def __init__(self, path):
+        super().__init__(path, immutable=False)
+        self.content_type = 'text/html; charset=utf-8'
+        # Снимок может смениться дважды за секунду.
+        stat = os.stat(path)
+        self.etag = '"{:x}-{:x}"'.format(stat.st_mtime_ns, stat.st_size)
+
+
+def snapshot_file(root, path):
+    """Файл снимка страницы ``path`` (уже раскодированного) или None.
+
+    Сегменты «.» и «..» не сворачиваются, а отвергаются: ``/profile/../``
+    — это профиль пользователя «..», а не главная.
+    """
+    if not path.startswith('/') or not path.endswith('/'):
+        return None
+    segments = path.split('/')[1:-1]
+    if any(segment in ('', '.', '..') or '\x00' in segment
+           for segment in segments):
+        return None
+    file_path = os.path.join(root, *segments, 'index.html')
+    if os.path.normpath(file_path) != file_path:
+        return None
+    if not file_path.startswith(root + os.sep):
+        return None
+    return file_path
+
+
+class SnapshotApp:
+    """WSGI-слой, отдающий анонимным посетителям готовые HTML-снимки
+    страниц из ``SNAPSHOTS_DIR`` до middleware Django.
+
+    Снимок страницы ``/group/slug/`` лежит в ``group/slug/index.html``.
+    Запросы с сессией или сообщениями, с параметрами и не GET/HEAD
+    идут в Django как обычно.
+    """
+    PERSONAL_COOKIES = ('messages',)
+
+    def __init__(self, application, root=None):
+        self.application = application
+        self.root = os.path.abspath(root or settings.SNAPSHOTS_DIR)
+
+    def find(self, environ):
+        if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return None
+        if environ.get('QUERY_STRING'):
+            return None
+        cookies = parse_cookie(environ.get('HTTP_COOKIE', ''))
+        personal = (settings.SESSION_COOKIE_NAME,) + self.PERSONAL_COOKIES
+        if any(name in cookies for name in personal):
+            return None
+        file_path = snapshot_file(self.root, get_path_info(environ))
+        if file_path is None:
+            return None
+        try:
+            return SnapshotFile(file_path)
+        except OSError:
+            return None
+
+    def __call__(self, environ, start_response):
+        snapshot = self.find(environ)
+        if snapshot is None:
+            return self.application(environ, start_response)
+        return serve(snapshot, environ, start_response)
+
+
+def etag_matches(header, etag):
+    """Слабое сравнение для If-None-Match: список, ``*`` и ``W/``."""
+    if not header:
+        return False
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return True
+
+    def opaque(tag):
+        return tag[2:] if tag.startswith('W/') else tag
+
+    return opaque(etag) in {opaque(tag) for tag in etags}
+
+
+def serve(static_file, environ, start_response):
+    if environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+        start_response('405 Method Not Allowed', [('Allow', 'GET, HEAD')])
+        return []
+    encoding = negotiate(
+        environ.get('HTTP_ACCEPT_ENCODING'), static_file.variants
+    )
+    etag = static_file.etag_for(encoding)
+    if etag_matches(environ.get('HTTP_IF_NONE_MATCH'), etag):
+        headers = [
+            ('ETag', etag),
+            ('Cache-Control', static_file.cache_control),
+        ]
+        if static_file.variants:
+            headers.append(('Vary', 'Accept-Encoding'))
+        start_response('304 Not Modified', headers)
+        return []
+    path, headers = static_file.headers(encoding)
+    start_response('200 OK', headers)
+    if environ['REQUEST_METHOD'] == 'HEAD':
+        return []
+    file_wrapper = environ.get('wsgi.file_wrapper', iter_file)
+    return file_wrapper(open(path, 'rb'), BLOCK_SIZE)
+
+
+def iter_file(file, block_size=BLOCK_SIZE):
+    with file:
+        while True:
+            block = file.read(block_size)
+            if not block:
+                return
+            yield block
@@ -0,0 +1,77 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection
+
+from jobs.queue import claim, heartbeat, release_stale, run
+
+
+def run_in_thread(job):
+    try:
+        return run(job)
+    finally:
+        connection.close()
+
+
+class Command(BaseCommand):
+    help = 'Выполняет задачи из очереди в пуле потоков.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=4,
+            help='Сколько задач выполнять одновременно.',
+        )
+        parser.add_argument(
+            '--poll', type=float, default=1.0,
+            help='Пауза в секундах, когда очередь пуста.',
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и выйти.',
+        )
+
+    def release_stale(self):
+        released = release_stale()
+        if released:
+            self.stdout.write(f'Возвращено в очередь задач: {released}')
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        self.release_stale()
+        beat_at = time.monotonic()
+        done = failed = 0
+        running = set()
+        job_ids = {}
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while True:
+                close_old_connections()
+                if time.monotonic() - beat_at >= settings.JOBS_HEARTBEAT:
+                    # Пока задачи выполняются, их блокировка продлевается;
+                    # брошенные упавшими воркерами возвращаются в очередь.
+                    heartbeat([job_ids[future] for future in running])
+                    self.release_stale()
+                    beat_at = time.monotonic()
+                free = workers - len(running)
+                jobs = claim(free) if free else []
+                for job in jobs:
+                    future = pool.submit(run_in_thread, job)
+                    job_ids[future] = job.pk
+                    running.add(future)
+                if not running:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll'])
+                    continue
+                finished, running = wait(
+                    running, timeout=options['poll'],
+                    return_when=FIRST_COMPLETED,
+                )
+                for future in finished:
+                    del job_ids[future]
+                    if future.result():
+                        done += 1
+                    else:
+                        failed += 1
+        self.stdout.write(f'Выполнено: {done}, с ошибкой: {failed}')
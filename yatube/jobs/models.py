@@ -0,0 +1,35 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (PENDING, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Функция', max_length=255)
+    payload = models.TextField('Аргументы', default='{}')
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=PENDING,
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Максимум попыток')
+    run_at = models.DateTimeField('Запустить после', default=timezone.now)
+    locked_at = models.DateTimeField('Взята в работу', blank=True, null=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+
+    class Meta:
+        ordering = ['run_at']
+        indexes = [models.Index(fields=['status', 'run_at'])]
+
+    def __str__(self):
+        return f'{self.name} ({self.status})'
@@ -0,0 +1,120 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+CLAIM_BATCH = 20
+
+
+def task(func=None, max_attempts=None):
+    """Делает функцию задачей очереди: ``func.delay(...)`` ставит вызов
+    в очередь, а сам ``func(...)`` по-прежнему выполняется сразу.
+
+    Аргументы задачи сохраняются в JSON, поэтому передавать нужно
+    id и строки, а не объекты моделей.
+    """
+    def decorator(func):
+        def delay(*args, **kwargs):
+            return enqueue(func, args, kwargs, max_attempts=max_attempts)
+        func.delay = delay
+        return func
+    if func is None:
+        return decorator
+    return decorator(func)
+
+
+def enqueue(func, args=(), kwargs=None, run_at=None, max_attempts=None):
+    name = f'{func.__module__}.{func.__qualname__}'
+    payload = json.dumps({'args': list(args), 'kwargs': kwargs or {}})
+    if settings.JOBS_EAGER:
+        func(*args, **(kwargs or {}))
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=payload,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
+
+
+def heartbeat(pks):
+    """Продлевает блокировку задач, которые воркер ещё выполняет."""
+    if not pks:
+        return 0
+    return Job.objects.filter(pk__in=pks, status=Job.RUNNING).update(
+        locked_at=timezone.now()
+    )
+
+
+def release_stale():
+    """Возвращает в очередь задачи упавших воркеров.
+
+    Живой воркер продлевает ``locked_at`` каждые ``JOBS_HEARTBEAT``
+    секунд, поэтому долгая задача не считается брошенной.
+    """
+    stale = timezone.now() - timedelta(seconds=settings.JOBS_LOCK_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=stale
+    ).update(status=Job.PENDING, locked_at=None)
+
+
+def claim(limit=1):
+    """Забирает до ``limit`` готовых задач.
+
+    Статус меняется условным UPDATE, так что одну задачу не возьмут
+    два воркера, даже если они работают в разных процессах.
+    """
+    now = timezone.now()
+    candidates = Job.objects.filter(
+        status=Job.PENDING, run_at__lte=now
+    ).values_list('pk', flat=True)[:max(limit, CLAIM_BATCH)]
+    claimed = []
+    for pk in candidates:
+        updated = Job.objects.filter(pk=pk, status=Job.PENDING).update(
+            status=Job.RUNNING, locked_at=now, attempts=F('attempts') + 1
+        )
+        if updated:
+            claimed.append(pk)
+            if len(claimed) == limit:
+                break
+    return list(Job.objects.filter(pk__in=claimed))
+
+
+def backoff(attempts):
+    delay = settings.JOBS_RETRY_BACKOFF * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, settings.JOBS_RETRY_BACKOFF_MAX))
+
+
+def run(job):
+    """Выполняет задачу; при ошибке откладывает повтор или помечает
+    задачу проваленной. Успешные задачи удаляются."""
+    try:
+        func = import_string(job.name)
+        payload = json.loads(job.payload)
+        func(*payload['args'], **payload['kwargs'])
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s failed: %s', job.pk, error)
+        if job.attempts < job.max_attempts:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.PENDING,
+                locked_at=None,
+                run_at=timezone.now() + backoff(job.attempts),
+                last_error=error,
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                status=Job.FAILED, locked_at=None, last_error=error
+            )
+        return False
+    Job.objects.filter(pk=job.pk).delete()
+    return True
@@ -0,0 +1,120 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import User
+from .models import Job
+from .queue import claim, enqueue, heartbeat, release_stale, run, task
+
+CALLS = []
+
+
+@task
+def remember(value):
+    CALLS.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+class QueueTests(TestCase):
+    """Постановка задач в очередь, повторы и отказ."""
+    def setUp(self):
+        CALLS.clear()
+
+    def test_delay_creates_job(self):
+        """delay() не выполняет функцию, а сохраняет задачу."""
+        job = remember.delay('hello')
+        self.assertEqual(CALLS, [])
+        self.assertEqual(job.name, 'jobs.tests.remember')
+        self.assertEqual(job.status, Job.PENDING)
+
+    def test_run_executes_and_deletes_job(self):
+        """Успешная задача выполняется и удаляется из очереди."""
+        remember.delay('hello')
+        job, = claim()
+        self.assertTrue(run(job))
+        self.assertEqual(CALLS, ['hello'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_claim_skips_taken_and_future_jobs(self):
+        """Взятые и отложенные задачи повторно не выдаются."""
+        remember.delay('now')
+        enqueue(remember, ('later',),
+                run_at=timezone.now() + timedelta(hours=1))
+        self.assertEqual(len(claim(10)), 1)
+        self.assertEqual(claim(10), [])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        """Упавшая задача откладывается, а после лимита попыток — failed."""
+        explode.delay()
+        job, = claim()
+        self.assertFalse(run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('boom', job.last_error)
+
+        Job.objects.update(run_at=timezone.now())
+        job, = claim()
+        run(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_heartbeat_keeps_long_job_locked(self):
+        """Задачу с продлённой блокировкой не отдают второму воркеру."""
+        remember.delay('long')
+        remember.delay('lost')
+        long_job, lost_job = claim(2)
+        Job.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+        heartbeat([long_job.pk])
+        self.assertEqual(release_stale(), 1)
+        long_job.refresh_from_db()
+        lost_job.refresh_from_db()
+        self.assertEqual(long_job.status, Job.RUNNING)
+        self.assertEqual(lost_job.status, Job.PENDING)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager_mode_runs_immediately(self):
+        """С JOBS_EAGER задача выполняется без очереди."""
+        remember.delay('eager')
+        self.assertEqual(CALLS, ['eager'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_password_reset_email_goes_through_queue(self):
+        """Письмо сброса пароля отправляется воркером, а не в запросе."""
+        User.objects.create_user(
+            username='leo', email='leo@example.com', password='secret-pass'
+        )
+        self.client.post(
+            reverse('users:password_reset_form'),
+            {'email': 'leo@example.com'},
+        )
+        self.assertEqual(len(mail.outbox), 0)
+        job, = claim()
+        self.assertEqual(job.name, 'users.tasks.send_email')
+        run(job)
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['leo@example.com'])
+
+
+class WorkerCommandTests(TransactionTestCase):
+    """Команда run_jobs разбирает очередь пулом потоков."""
+    def setUp(self):
+        CALLS.clear()
+
+    def test_worker_drains_queue(self):
+        for value in range(5):
+            remember.delay(value)
+        out = StringIO()
+        call_command('run_jobs', once=True, workers=2, poll=0.01, stdout=out)
+        self.assertEqual(sorted(CALLS), list(range(5)))
+        self.assertFalse(Job.objects.exists())
+        self.assertIn('Выполнено: 5', out.getvalue())
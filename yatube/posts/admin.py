@@ -1,8 +1,11 @@
 from django.contrib import admin
+
+from core.admin import BackgroundDeleteMixin
 from .models import Post, Group
+from .deletion import mark_posts_deleted
 
 
-class PostAdmin(admin.ModelAdmin):
+class PostAdmin(BackgroundDeleteMixin, admin.ModelAdmin):
     list_display = (
         'pk',
         'text',
@@ -14,6 +17,15 @@ class PostAdmin(admin.ModelAdmin):
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    actions = ('delete_in_background',)
+
+    def delete_in_background(self, request, queryset):
+        marked = mark_posts_deleted(queryset)
+        self.message_user(request, f'Помечено на удаление постов: {marked}')
+    delete_in_background.short_description = 'Удалить выбранные посты в фоне'
+
+    def delete_model(self, request, obj):
+        mark_posts_deleted(Post.objects.filter(pk=obj.pk))
 
 
 admin.site.register(Post, PostAdmin)
@@ -3,3 +3,45 @@ from django.apps import AppConfig
 
 class PostsConfig(AppConfig):
     name = 'posts'
+
+    def ready(self):
+        from django.contrib.auth import get_user_model
+        from django.db.models.signals import (
+            post_delete, post_save, pre_delete, pre_save
+        )
+
+        from core import holes, orm_cache
+        from . import cdn, deletion, feeds, likes, snapshots
+        from .models import Comment, Follow, Group, Post
+
+        holes.register('like', likes.render_holes)
+        holes.register(
+            'switcher', holes.template_renderer('includes/switcher.html')
+        )
+        orm_cache.register(Group, fields=('slug',))
+        orm_cache.register(
+            get_user_model(),
+            fields=('username',),
+            only=('first_name', 'last_name', 'is_active'),
+        )
+        post_save.connect(feeds.post_changed, sender=Post)
+        pre_save.connect(deletion.remember_image, sender=Post)
+        post_save.connect(deletion.release_replaced_image, sender=Post)
+        pre_save.connect(snapshots.remember_group, sender=Post)
+        post_save.connect(snapshots.post_changed, sender=Post)
+        post_delete.connect(snapshots.post_changed, sender=Post)
+        for model in (Group, get_user_model()):
+            pre_save.connect(snapshots.remember_owner, sender=model)
+            pre_delete.connect(snapshots.remember_owner, sender=model)
+            post_save.connect(snapshots.owner_changed, sender=model)
+            post_delete.connect(snapshots.owner_deleted, sender=model)
+        for model in (Post, Group):
+            pre_save.connect(cdn.remember_old, sender=model)
+        post_save.connect(cdn.post_changed, sender=Post)
+        post_delete.connect(cdn.post_changed, sender=Post)
+        post_save.connect(cdn.comment_changed, sender=Comment)
+        post_delete.connect(cdn.comment_changed, sender=Comment)
+        post_save.connect(cdn.group_changed, sender=Group)
+        post_delete.connect(cdn.group_changed, sender=Group)
+        post_save.connect(feeds.follow_changed, sender=Follow)
+        post_delete.connect(feeds.follow_changed, sender=Follow)
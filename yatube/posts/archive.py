@@ -0,0 +1,105 @@
+from django.db import transaction
+from django.http import Http404
+from django.utils.functional import cached_property
+
+from .likes import totals
+from .models import ArchivedComment, ArchivedPost, Comment, Post
+
+
+def archive_batch(older_than, batch_size):
+    """Переносит в архив одну пачку постов вместе с комментариями.
+
+    Каждая пачка — отдельная короткая транзакция, поэтому таблица
+    не блокируется на всё время архивации. Возвращает число постов.
+    """
+    with transaction.atomic():
+        posts = list(
+            Post.objects.filter(pub_date__lt=older_than).order_by('pk')[
+                :batch_size
+            ]
+        )
+        if not posts:
+            return 0
+        ids = [post.pk for post in posts]
+        like_counts = totals(ids)
+        ArchivedPost.objects.bulk_create([
+            ArchivedPost(
+                id=post.pk,
+                text=post.text,
+                pub_date=post.pub_date,
+                author_id=post.author_id,
+                group_id=post.group_id,
+                image=post.image.name,
+                view_count=post.view_count,
+                like_count=like_counts.get(post.pk, 0),
+            )
+            for post in posts
+        ])
+        comments = Comment.all_objects.filter(post_id__in=ids)
+        ArchivedComment.objects.bulk_create(
+            (
+                ArchivedComment(
+                    id=comment.pk,
+                    post_id=comment.post_id,
+                    author_id=comment.author_id,
+                    text=comment.text,
+                    created=comment.created,
+                    is_deleted=comment.is_deleted,
+                )
+                for comment in comments.iterator()
+            ),
+            batch_size=batch_size,
+        )
+        comments.delete()
+        Post.objects.filter(pk__in=ids).delete()
+    return len(posts)
+
+
+def get_post_or_404(post_id):
+    """Ищет пост сначала в горячей таблице, затем в архиве."""
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None:
+        post = ArchivedPost.objects.select_related('author', 'group').filter(
+            pk=post_id
+        ).first()
+    if post is None:
+        raise Http404
+    return post
+
+
+class ArchiveChain:
+    """Горячие и архивные посты одним списком для Paginator.
+
+    Архив строго старше горячих постов, поэтому порядок сохраняется,
+    а строки архива читаются, только если страница выходит за пределы
+    горячей таблицы.
+    """
+
+    def __init__(self, posts, archived_posts):
+        self.posts = posts
+        self.archived_posts = archived_posts
+
+    @cached_property
+    def hot_count(self):
+        return self.posts.count()
+
+    def count(self):
+        return self.hot_count + self.archived_posts.count()
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        items = []
+        if start < self.hot_count:
+            items.extend(self.posts[start:stop])
+        if stop is None or stop > self.hot_count:
+            archive_start = max(start - self.hot_count, 0)
+            archive_stop = None if stop is None else stop - self.hot_count
+            items.extend(self.archived_posts[archive_start:archive_stop])
+        return items
@@ -0,0 +1,114 @@
+from django.conf import settings
+
+from core import orm_cache, surrogate
+
+from .models import ArchivedComment, ArchivedPost, Comment, Group, Post, User
+
+INDEX_KEY = 'index'
+
+
+def group_key(slug):
+    return f'group-{slug}' if slug else None
+
+
+def author_key(username):
+    return f'author-{username}'
+
+
+def post_key(post_id):
+    return f'post-{post_id}'
+
+
+def post_keys(post):
+    """Ключи страниц, где виден пост: сам пост, его группа и автор."""
+    return [
+        post_key(post.pk),
+        author_key(post.author.username),
+        group_key(post.group.slug if post.group else None),
+    ]
+
+
+def tag_posts(request, posts, *keys):
+    """Помечает ответ ключами ленты и всех постов на ней."""
+    surrogate.tag(request, *keys)
+    for post in posts:
+        surrogate.tag(request, *post_keys(post))
+
+
+def remember_old(sender, instance, raw=False, **kwargs):
+    """Группа поста или slug группы до правки: старые страницы
+    тоже нужно очистить."""
+    if not settings.SURROGATE_PURGE_URL or raw or instance.pk is None:
+        return
+    if sender is Post:
+        instance._cdn_old_group_slug = Group.objects.filter(
+            posts__pk=instance.pk
+        ).values_list('slug', flat=True).first()
+    else:
+        instance._cdn_old_slug = Group.objects.filter(
+            pk=instance.pk
+        ).values_list('slug', flat=True).first()
+
+
+def post_changed(sender, instance, raw=False, **kwargs):
+    if not settings.SURROGATE_PURGE_URL or raw:
+        return
+    # Через кеш ORM: при удалении пачкой постов одного автора
+    # не нужен запрос на каждый пост.
+    author = orm_cache.get(User, pk=instance.author_id)
+    group = instance.group_id and orm_cache.get(Group, pk=instance.group_id)
+    surrogate.schedule([
+        INDEX_KEY,
+        post_key(instance.pk),
+        author_key(author.username) if author else None,
+        group_key(group.slug if group else None),
+        group_key(getattr(instance, '_cdn_old_group_slug', None)),
+    ])
+
+
+def comment_changed(sender, instance, raw=False, **kwargs):
+    if not settings.SURROGATE_PURGE_URL or raw:
+        return
+    surrogate.schedule([post_key(instance.post_id)])
+
+
+def group_changed(sender, instance, raw=False, **kwargs):
+    if not settings.SURROGATE_PURGE_URL or raw:
+        return
+    surrogate.schedule([
+        group_key(instance.slug),
+        group_key(getattr(instance, '_cdn_old_slug', None)),
+    ])
+
+
+def purge_posts(posts):
+    """Очистка страниц постов queryset, меняемых через update()."""
+    if not settings.SURROGATE_PURGE_URL:
+        return
+    rows = Post.all_objects.filter(pk__in=posts.values('pk')).values_list(
+        'pk', 'author__username', 'group__slug'
+    )
+    keys = [INDEX_KEY]
+    for pk, username, slug in rows:
+        keys += [post_key(pk), author_key(username), group_key(slug)]
+    surrogate.schedule(keys)
+
+
+def purge_user_content(user):
+    """Очистка страниц с архивными постами и комментариями пользователя,
+    которые скрываются через update()."""
+    if not settings.SURROGATE_PURGE_URL:
+        return
+    keys = [INDEX_KEY, author_key(user.username)]
+    rows = ArchivedPost.all_objects.filter(author=user).values_list(
+        'pk', 'group__slug'
+    )
+    for pk, slug in rows:
+        keys += [post_key(pk), group_key(slug)]
+    for model in (Comment, ArchivedComment):
+        keys += [
+            post_key(post_id) for post_id in model.all_objects.filter(
+                author=user
+            ).values_list('post_id', flat=True).distinct()
+        ]
+    surrogate.schedule(keys)
@@ -0,0 +1,146 @@
+import heapq
+import os
+import time
+
+from django.db import transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from core.models import StoredFile
+
+from .models import ArchivedPost, Post
+
+CHUNK_SIZE = 2000
+REFERENCED, ON_DISK = 0, 1
+
+
+def walk_sorted(root, prefix):
+    """Отдаёт (имя, размер, mtime) файлов каталога в порядке сортировки
+    полных имён, не собирая дерево в память.
+
+    Каталог сравнивается по имени со слешем на конце, как его файлы
+    в полном пути, поэтому «posts/ab.gif» идёт раньше «posts/ab/…».
+    """
+    path = os.path.join(root, prefix)
+    try:
+        entries = list(os.scandir(path))
+    except FileNotFoundError:
+        return
+    entries.sort(key=lambda entry: (
+        entry.name + '/' if entry.is_dir(follow_symlinks=False)
+        else entry.name
+    ))
+    for entry in entries:
+        name = f'{prefix}/{entry.name}'
+        if entry.is_dir(follow_symlinks=False):
+            yield from walk_sorted(root, name)
+        elif entry.is_file(follow_symlinks=False):
+            stat = entry.stat(follow_symlinks=False)
+            yield name, stat.st_size, stat.st_mtime
+
+
+def referenced_names():
+    """Имена картинок постов из базы в порядке сортировки.
+
+    Сливаются два отсортированных потока — живые и архивные посты.
+    Порядок строк совпадает с порядком Python при побайтовом сравнении
+    (SQLite, PostgreSQL с COLLATE "C").
+    """
+    streams = []
+    for manager in (Post.all_objects, ArchivedPost.all_objects):
+        streams.append(manager.exclude(image='').exclude(
+            image=None
+        ).order_by('image').values_list(
+            'image', flat=True
+        ).iterator(chunk_size=CHUNK_SIZE))
+    return heapq.merge(*streams)
+
+
+def find_orphans(root, prefix, older_than=None):
+    """Отдаёт (имя, размер) файлов, на которые не ссылается ни один пост.
+
+    Оба потока уже отсортированы, поэтому хватает одного прохода
+    слиянием: в памяти только текущие элементы, а не все имена.
+    Файлы новее ``older_than`` пропускаются — их пост мог ещё
+    не сохраниться.
+    """
+    merged = heapq.merge(
+        ((name, REFERENCED, 0, 0) for name in referenced_names()),
+        ((name, ON_DISK, size, mtime)
+         for name, size, mtime in walk_sorted(root, prefix)),
+    )
+    last_referenced = None
+    for name, kind, size, mtime in merged:
+        if kind == REFERENCED:
+            last_referenced = name
+        elif name != last_referenced:
+            if older_than is None or mtime < older_than:
+                yield name, size
+
+
+def thumbnails(image):
+    """Файлы превью картинки, записанные в хранилище ключей sorl."""
+    keys = default.kvstore._get(image.key, identity='thumbnails') or []
+    for key in keys:
+        thumbnail = default.kvstore._get(key)
+        if thumbnail is not None:
+            yield thumbnail
+
+
+def is_orphaned(storage, name, older_than=None):
+    """Ни живой, ни архивный пост не ссылается на файл.
+
+    Счётчик StoredFile не в счёт: пост, удалённый через
+    ``queryset.delete()``, ссылку не снимает. Файл новее ``older_than``
+    не трогается — дедупликация обновляет mtime файла, к которому
+    прикрепляет новый пост.
+    """
+    if older_than is not None:
+        try:
+            if os.path.getmtime(storage.path(name)) >= older_than:
+                return False
+        except FileNotFoundError:
+            return False
+    if Post.all_objects.filter(image=name).exists():
+        return False
+    return not ArchivedPost.all_objects.filter(image=name).exists()
+
+
+def purge_if_orphaned(storage, name, older_than=None):
+    """Удаляет файл и его строку StoredFile, если он всё ещё ничей.
+
+    Блокировка строки StoredFile дожидается дедупликации, которая
+    прямо сейчас прикрепляет файл к новому посту.
+    """
+    with transaction.atomic():
+        StoredFile.objects.select_for_update().filter(name=name).first()
+        if not is_orphaned(storage, name, older_than):
+            return False
+        storage.purge(name)
+    return True
+
+
+def collect(root, prefix, storage, grace_seconds=0, dry_run=False):
+    """Удаляет осиротевшие картинки с их превью.
+
+    Возвращает число файлов и освобождённые байты (с превью).
+    """
+    older_than = time.time() - grace_seconds
+    removed = reclaimed = 0
+    for name, size in find_orphans(root, prefix, older_than):
+        image = ImageFile(name, storage)
+        thumbnails_size = sum(
+            thumbnail.storage.size(thumbnail.name)
+            for thumbnail in thumbnails(image) if thumbnail.exists()
+        )
+        if dry_run:
+            if not is_orphaned(storage, name, older_than):
+                continue
+        elif purge_if_orphaned(storage, name, older_than):
+            default.kvstore.delete(image)
+        else:
+            continue
+        reclaimed += thumbnails_size
+        removed += 1
+        reclaimed += size
+    return removed, reclaimed
@@ -0,0 +1,14 @@
+from django.utils.functional import SimpleLazyObject
+
+from .notifications import unread_count
+
+
+def unread_notifications(request):
+    """Число непрочитанных уведомлений; запрос — только если шаблон
+    его выводит."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return {'unread_notifications': 0}
+    return {
+        'unread_notifications': SimpleLazyObject(lambda: unread_count(user))
+    }
@@ -0,0 +1,142 @@
+from django.conf import settings
+from django.db import transaction
+
+from jobs.queue import task
+
+from . import cdn, snapshots
+from .likes import remove_user_likes
+from .models import (
+    ArchivedComment, ArchivedPost, Comment, Follow, Like, LikeCounter,
+    Notification, Post, User
+)
+
+
+def release_images(queryset):
+    """Снимает ссылки пачки постов на их картинки в хранилище."""
+    storage = queryset.model._meta.get_field('image').storage
+    for name in queryset.exclude(image='').exclude(
+        image=None
+    ).values_list('image', flat=True):
+        storage.delete(name)
+
+
+def remember_image(sender, instance, raw=False, **kwargs):
+    """Картинка поста до правки: её ссылку нужно будет снять."""
+    if raw or instance.pk is None:
+        return
+    instance._old_image = Post.all_objects.filter(
+        pk=instance.pk
+    ).values_list('image', flat=True).first()
+
+
+def release_replaced_image(sender, instance, raw=False, **kwargs):
+    """Снимает ссылку на заменённую или убранную картинку после коммита,
+    иначе счётчик StoredFile не дойдёт до нуля и сборщик её не тронет."""
+    old = getattr(instance, '_old_image', None)
+    instance._old_image = None
+    if raw or not old or old == instance.image.name:
+        return
+    storage = sender._meta.get_field('image').storage
+    # Ссылки ведутся только для файлов, сохранённых по содержимому.
+    if not storage.is_content_name(old):
+        return
+    transaction.on_commit(lambda: storage.delete(old))
+
+
+def delete_in_batches(queryset, batch_size=None, with_images=False):
+    """Удаляет строки queryset пачками, каждая в своей транзакции.
+
+    Коллектор Django загружает в память только одну пачку, а запись
+    блокирует базу ненадолго. Возвращает число удалённых строк.
+    С ``with_images`` заодно отпускаются картинки удалённых постов.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    model = queryset.model
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        batch = model._base_manager.filter(pk__in=ids)
+        with transaction.atomic():
+            if with_images:
+                release_images(batch)
+            batch.delete()
+        deleted += len(ids)
+
+
+def mark_posts_deleted(queryset):
+    """Сразу скрывает посты; сами строки удалит фоновая задача."""
+    with transaction.atomic():
+        snapshots.schedule_for(queryset)
+        cdn.purge_posts(queryset)
+        marked = queryset.update(is_deleted=True)
+        purge_deleted_posts.delay()
+    return marked
+
+
+def mark_user_deleted(user):
+    """Сразу закрывает аккаунт и скрывает его посты, архив
+    и комментарии; связанные строки и сам пользователь удаляются в фоне."""
+    with transaction.atomic():
+        snapshots.schedule_for(Post.all_objects.filter(author=user))
+        cdn.purge_posts(Post.all_objects.filter(author=user))
+        cdn.purge_user_content(user)
+        # save, а не update(): сигналы сбрасывают кеши пользователя.
+        user.is_active = False
+        user.save(update_fields=['is_active'])
+        for model in (Post, ArchivedPost, Comment, ArchivedComment):
+            model.all_objects.filter(author=user).update(is_deleted=True)
+        purge_user.delay(user.pk)
+
+
+def delete_posts_in_batches(queryset, batch_size=None):
+    """Удаляет посты пачками, сначала пачками же — строки, ссылающиеся
+    на каждую пачку.
+
+    Иначе коллектор грузил бы все комментарии пачки (у них есть
+    сигналы) и удалял их вместе с лайками и уведомлениями в одной
+    долгой транзакции.
+    """
+    batch_size = batch_size or settings.DELETION_BATCH_SIZE
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        for model in (Comment, Like, LikeCounter, Notification):
+            delete_in_batches(
+                model._base_manager.filter(post_id__in=ids), batch_size
+            )
+        deleted += delete_in_batches(
+            Post.all_objects.filter(pk__in=ids), batch_size, with_images=True
+        )
+
+
+@task
+def purge_deleted_posts():
+    """Удаляет помеченные посты вместе с комментариями пачками."""
+    delete_posts_in_batches(Post.all_objects.filter(is_deleted=True))
+
+
+@task
+def purge_user(user_id, batch_size=None):
+    """Удаляет пользователя и всё, что на него ссылается, пачками."""
+    querysets = (
+        Follow.objects.filter(user_id=user_id),
+        Follow.objects.filter(author_id=user_id),
+        Comment.all_objects.filter(author_id=user_id),
+        ArchivedComment.all_objects.filter(author_id=user_id),
+        Notification.objects.filter(user_id=user_id),
+    )
+    for queryset in querysets:
+        delete_in_batches(queryset, batch_size)
+    remove_user_likes(user_id, batch_size or settings.DELETION_BATCH_SIZE)
+    delete_posts_in_batches(
+        Post.all_objects.filter(author_id=user_id), batch_size
+    )
+    delete_in_batches(
+        ArchivedPost.all_objects.filter(author_id=user_id), batch_size,
+        with_images=True,
+    )
+    User.objects.filter(pk=user_id).delete()
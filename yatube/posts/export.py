@@ -0,0 +1,125 @@
+import json
+import zipfile
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+from .models import ArchivedComment, ArchivedPost, Comment, Follow, Post
+
+BLOCK_SIZE = 64 * 1024
+CHUNK_SIZE = 500
+
+
+class StreamBuffer:
+    """Файлоподобный приёмник для zipfile без seek().
+
+    zipfile пишет в него архив, а генератор сразу забирает накопленное,
+    так что в памяти держится не больше одного блока.
+    """
+
+    def __init__(self):
+        self.chunks = []
+        self.size = 0
+        self.offset = 0
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.size += len(data)
+        self.offset += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.offset
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        self.size = 0
+        return data
+
+    def drain(self):
+        if self.size:
+            yield self.pop()
+
+
+def user_rows(user):
+    """Возвращает пары «имя файла в архиве — строки» для выгрузки."""
+    post_fields = ('id', 'text', 'pub_date', 'group__slug', 'image')
+    comment_fields = ('id', 'post_id', 'text', 'created')
+    return (
+        ('posts.jsonl', Post.objects.filter(author=user).values(
+            *post_fields
+        ).order_by('pk')),
+        ('archived_posts.jsonl', ArchivedPost.objects.filter(
+            author=user
+        ).values(*post_fields).order_by('pk')),
+        ('comments.jsonl', Comment.objects.filter(author=user).values(
+            *comment_fields
+        ).order_by('pk')),
+        ('archived_comments.jsonl', ArchivedComment.objects.filter(
+            author=user
+        ).values(*comment_fields).order_by('pk')),
+        ('following.jsonl', Follow.objects.filter(user=user).values(
+            'author__username'
+        ).order_by('pk')),
+        ('followers.jsonl', Follow.objects.filter(author=user).values(
+            'user__username'
+        ).order_by('pk')),
+    )
+
+
+def user_images(user):
+    for model in (Post, ArchivedPost):
+        images = model.objects.filter(author=user).exclude(
+            image=''
+        ).exclude(image=None).values_list('image', flat=True)
+        yield from images.iterator(chunk_size=CHUNK_SIZE)
+
+
+def iter_user_export(user):
+    """Отдаёт ZIP с данными пользователя по кускам.
+
+    Строки читаются из базы пачками, картинки — блоками, а архив
+    уходит клиенту по мере записи, поэтому потребление памяти
+    не зависит от числа постов и размера картинок.
+    """
+    storage = Post._meta.get_field('image').storage
+    buffer = StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        profile = {
+            'username': user.username,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'email': user.email,
+            'date_joined': user.date_joined,
+        }
+        archive.writestr(
+            'profile.json', json.dumps(profile, cls=DjangoJSONEncoder)
+        )
+        for name, rows in user_rows(user):
+            with archive.open(name, 'w', force_zip64=True) as entry:
+                for row in rows.iterator(chunk_size=CHUNK_SIZE):
+                    line = json.dumps(row, cls=DjangoJSONEncoder) + '\n'
+                    entry.write(line.encode())
+                    if buffer.size >= BLOCK_SIZE:
+                        yield buffer.pop()
+            yield from buffer.drain()
+        for image in user_images(user):
+            try:
+                source = storage.open(image, 'rb')
+            except OSError:
+                continue
+            info = zipfile.ZipInfo(
+                f'images/{image}', timezone.now().timetuple()[:6]
+            )
+            # Картинки уже сжаты, повторное сжатие только тратит CPU.
+            info.compress_type = zipfile.ZIP_STORED
+            with source, archive.open(info, 'w', force_zip64=True) as entry:
+                for block in iter(lambda: source.read(BLOCK_SIZE), b''):
+                    entry.write(block)
+                    yield from buffer.drain()
+            yield from buffer.drain()
+    yield from buffer.drain()
@@ -0,0 +1,161 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Max
+
+from .models import Follow, Post
+
+
+def latest_key(kind, pk=None):
+    if pk is None:
+        return f'feeds:latest:{kind}'
+    return f'feeds:latest:{kind}:{pk}'
+
+
+def following_key(user_id):
+    return f'feeds:following:{user_id}'
+
+
+def latest_id(kind, pk=None):
+    """id последнего поста ленты; база — только при пустом кеше."""
+    key = latest_key(kind, pk)
+    value = cache.get(key)
+    if value is None:
+        posts = Post.objects.all()
+        if kind == 'group':
+            posts = posts.filter(group_id=pk)
+        value = posts.aggregate(latest=Max('pk'))['latest'] or 0
+        cache.set(key, value, settings.LONG_POLL_CACHE_TIMEOUT)
+    return value
+
+
+def following(user_id):
+    """id авторов, на которых подписан пользователь, из кеша."""
+    key = following_key(user_id)
+    authors = cache.get(key)
+    if authors is None:
+        authors = list(Follow.objects.filter(
+            user_id=user_id
+        ).values_list('author_id', flat=True))
+        cache.set(key, authors, settings.LONG_POLL_CACHE_TIMEOUT)
+    return authors
+
+
+def latest_followed_id(user_id):
+    """id последнего поста подписок одним запросом на всех авторов."""
+    key = latest_key('follow', user_id)
+    value = cache.get(key)
+    if value is None:
+        authors = following(user_id)
+        value = 0
+        if authors:
+            value = Post.objects.filter(author_id__in=authors).aggregate(
+                latest=Max('pk')
+            )['latest'] or 0
+        cache.set(key, value, settings.LONG_POLL_CACHE_TIMEOUT)
+    return value
+
+
+class Feed:
+    """Лента для опроса: главная, группа или подписки пользователя."""
+
+    def __init__(self, kind, group=None, user=None):
+        self.kind = kind
+        self.group = group
+        self.user = user
+
+    def latest(self):
+        if self.kind == 'group':
+            return latest_id('group', self.group.pk)
+        if self.kind == 'follow':
+            return latest_followed_id(self.user.pk)
+        return latest_id('index')
+
+    def posts(self):
+        posts = Post.objects.select_related('author', 'group')
+        if self.kind == 'group':
+            return posts.filter(group=self.group)
+        if self.kind == 'follow':
+            return posts.filter(author_id__in=following(self.user.pk))
+        return posts
+
+
+waiting_lock = threading.Lock()
+waiting = 0
+
+
+@contextmanager
+def wait_slot():
+    """Место среди ждущих опросов процесса, не больше
+    LONG_POLL_MAX_WAITERS; отдаёт False, если мест нет."""
+    global waiting
+    with waiting_lock:
+        acquired = waiting < settings.LONG_POLL_MAX_WAITERS
+        if acquired:
+            waiting += 1
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with waiting_lock:
+                waiting -= 1
+
+
+def wait_for_posts(feed, after, limit, timeout=None, interval=None):
+    """Ждёт постов новее ``after`` не дольше ``timeout`` секунд.
+
+    Пока в ленте ничего нет, опрос смотрит только на id последнего
+    поста в кеше; в базу идёт один запрос, когда он вырос.
+    Ожидание держит поток воркера, поэтому ждать одновременно могут
+    не больше LONG_POLL_MAX_WAITERS опросов; остальным отвечают сразу
+    текущим курсором, и клиент повторит запрос.
+    Возвращает новые посты (старые вперёд) и новый курсор.
+    """
+    timeout = settings.LONG_POLL_TIMEOUT if timeout is None else timeout
+    interval = settings.LONG_POLL_INTERVAL if interval is None else interval
+    with wait_slot() as acquired:
+        deadline = time.monotonic() + (timeout if acquired else 0)
+        while True:
+            latest = feed.latest()
+            if latest > after:
+                posts = list(feed.posts().filter(pk__gt=after).order_by(
+                    'pk'
+                )[:limit])
+                if len(posts) == limit:
+                    return posts, posts[-1].pk
+                return posts, max(
+                    [latest, after] + [post.pk for post in posts]
+                )
+            if time.monotonic() >= deadline:
+                return [], after
+            time.sleep(interval)
+
+
+def forget_latest(post):
+    keys = [latest_key('index')]
+    if post.group_id:
+        keys.append(latest_key('group', post.group_id))
+    keys += [
+        latest_key('follow', user_id)
+        for user_id in Follow.objects.filter(
+            author_id=post.author_id
+        ).values_list('user_id', flat=True).iterator()
+    ]
+    cache.delete_many(keys)
+
+
+def post_changed(sender, instance, **kwargs):
+    # После коммита: иначе параллельный опрос успеет закешировать
+    # старый id, пока пост ещё не виден.
+    transaction.on_commit(lambda: forget_latest(instance))
+
+
+def follow_changed(sender, instance, **kwargs):
+    transaction.on_commit(lambda: cache.delete_many([
+        following_key(instance.user_id),
+        latest_key('follow', instance.user_id),
+    ]))
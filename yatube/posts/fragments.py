@@ -0,0 +1,47 @@
+from datetime import datetime
+
+from django.db.models import Q
+from django.utils import timezone
+
+CURSOR_FORMAT = '%Y%m%d%H%M%S%f'
+
+
+def encode_cursor(post):
+    """Курсор — дата публикации в UTC и id последнего показанного поста."""
+    pub_date = timezone.localtime(post.pub_date, timezone.utc)
+    return f'{pub_date.strftime(CURSOR_FORMAT)}-{post.pk}'
+
+
+def decode_cursor(value):
+    """(дата, id) из курсора; ValueError, если курсор испорчен."""
+    stamp, _, pk = value.partition('-')
+    pub_date = datetime.strptime(stamp, CURSOR_FORMAT)
+    return timezone.make_aware(pub_date, timezone.utc), int(pk)
+
+
+def older_than(queryset, cursor):
+    """Посты строго после курсора в порядке (-pub_date, -id)."""
+    queryset = queryset.order_by('-pub_date', '-pk')
+    if cursor is None:
+        return queryset
+    pub_date, pk = cursor
+    return queryset.filter(
+        Q(pub_date__lt=pub_date) | Q(pub_date=pub_date, pk__lt=pk)
+    )
+
+
+def next_batch(sources, cursor, limit):
+    """Следующие ``limit`` постов по курсору из нескольких таблиц.
+
+    Источники идут по убыванию даты (горячие посты, затем архив),
+    поэтому следующий читается, только если предыдущего не хватило.
+    Возвращает посты и курсор для продолжения (None — лента кончилась).
+    """
+    posts = []
+    for source in sources:
+        posts.extend(older_than(source, cursor)[:limit + 1 - len(posts)])
+        if len(posts) > limit:
+            break
+    has_more = len(posts) > limit
+    posts = posts[:limit]
+    return posts, encode_cursor(posts[-1]) if has_more else None
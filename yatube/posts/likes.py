@@ -0,0 +1,116 @@
+import random
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.template.loader import render_to_string
+
+from core import surrogate
+
+from . import snapshots
+from .cdn import post_key
+from .models import Like, LikeCounter
+
+
+def add(post_id, delta):
+    """Прибавляет ``delta`` к случайной части счётчика поста."""
+    shard = random.randrange(settings.LIKE_COUNTER_SHARDS)
+    counters = LikeCounter.objects.filter(post_id=post_id, shard=shard)
+    if counters.update(count=F('count') + delta):
+        return
+    try:
+        with transaction.atomic():
+            LikeCounter.objects.create(
+                post_id=post_id, shard=shard, count=delta
+            )
+    except IntegrityError:
+        counters.update(count=F('count') + delta)
+
+
+def like(user, post):
+    """Ставит лайк; повторный вызов ничего не меняет."""
+    with transaction.atomic():
+        _, created = Like.objects.get_or_create(user=user, post=post)
+        if created:
+            add(post.pk, 1)
+            surrogate.schedule([post_key(post.pk)])
+            snapshots.schedule_delayed(post)
+    return created
+
+
+def unlike(user, post):
+    """Снимает лайк; если его не было, ничего не меняет."""
+    with transaction.atomic():
+        deleted, _ = Like.objects.filter(user=user, post=post).delete()
+        if deleted:
+            add(post.pk, -1)
+            surrogate.schedule([post_key(post.pk)])
+            snapshots.schedule_delayed(post)
+    return bool(deleted)
+
+
+def totals(post_ids):
+    """Число лайков постов одним запросом."""
+    rows = LikeCounter.objects.filter(post_id__in=post_ids).values(
+        'post_id'
+    ).annotate(total=Sum('count'))
+    return {row['post_id']: row['total'] for row in rows}
+
+
+def annotate(posts, user):
+    """Проставляет постам like_count и liked двумя запросами на всех.
+
+    Архивные посты сохраняют свой like_count и не лайкаются.
+    """
+    posts = list(posts)
+    ids = [
+        post.pk for post in posts if not getattr(post, 'is_archived', False)
+    ]
+    counts = totals(ids) if ids else {}
+    liked = set()
+    if ids and user.is_authenticated:
+        liked = set(Like.objects.filter(
+            user=user, post_id__in=ids
+        ).values_list('post_id', flat=True))
+    for post in posts:
+        if getattr(post, 'is_archived', False):
+            post.liked = False
+            continue
+        post.like_count = counts.get(post.pk, 0)
+        post.liked = post.pk in liked
+    return posts
+
+
+def annotate_page(page_obj, user):
+    page_obj.object_list = annotate(page_obj.object_list, user)
+    return page_obj
+
+
+def render_holes(request, params):
+    """Кнопки лайков для оболочки страницы: все посты — двумя запросами."""
+    posts = annotate(
+        [SimpleNamespace(pk=values['post_id']) for values in params],
+        request.user,
+    )
+    return [
+        render_to_string('includes/like.html', {'post': post}, request)
+        for post in posts
+    ]
+
+
+def remove_user_likes(user_id, batch_size):
+    """Удаляет лайки пользователя пачками, уменьшая счётчики постов."""
+    queryset = Like.objects.filter(user_id=user_id)
+    deleted = 0
+    while True:
+        ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        batch = Like.objects.filter(pk__in=ids)
+        with transaction.atomic():
+            per_post = batch.values('post_id').annotate(total=Count('pk'))
+            for row in per_post:
+                add(row['post_id'], -row['total'])
+            batch.delete()
+        deleted += len(ids)
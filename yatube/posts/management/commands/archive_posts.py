@@ -0,0 +1,33 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from posts.archive import archive_batch
+
+
+class Command(BaseCommand):
+    help = 'Переносит старые посты с комментариями в архивные таблицы.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--days', type=int, default=settings.POSTS_ARCHIVE_AFTER_DAYS,
+            help='Архивировать посты старше стольких дней.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int,
+            default=settings.POSTS_ARCHIVE_BATCH_SIZE,
+            help='Сколько постов переносить за одну транзакцию.',
+        )
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - timedelta(days=options['days'])
+        total = 0
+        while True:
+            moved = archive_batch(older_than, options['batch_size'])
+            if not moved:
+                break
+            total += moved
+            self.stdout.write(f'Перенесено в архив: {total}')
+        self.stdout.write(self.style.SUCCESS(f'Готово, всего: {total}'))
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.snapshots import all_urls, refresh
+
+
+class Command(BaseCommand):
+    help = (
+        'Рисует HTML-снимки главной, всех групп и профилей с постами '
+        'в SNAPSHOTS_DIR. Дальше снимки обновляются сами.'
+    )
+
+    def handle(self, *args, **options):
+        if not settings.SNAPSHOTS_DIR:
+            raise CommandError('SNAPSHOTS_DIR не задан.')
+        urls = all_urls()
+        refresh(urls)
+        self.stdout.write(self.style.SUCCESS(f'Снимков: {len(urls)}'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.template.defaultfilters import filesizeformat
+
+from posts.cleanup import collect
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет картинки, на которые не ссылается ни один пост, '
+        'вместе с их превью.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать, сколько места освободится.',
+        )
+        parser.add_argument(
+            '--grace-hours', type=float, default=24,
+            help='Не трогать файлы моложе стольких часов.',
+        )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        removed, reclaimed = collect(
+            field.storage.location,
+            field.upload_to.strip('/'),
+            field.storage,
+            grace_seconds=options['grace_hours'] * 60 * 60,
+            dry_run=options['dry_run'],
+        )
+        verb = 'Будет удалено' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(
+            f'{verb} файлов: {removed}, '
+            f'освобождено: {filesizeformat(reclaimed)} ({reclaimed} байт)'
+        ))
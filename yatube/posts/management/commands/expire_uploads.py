@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from posts.uploads import expire
+
+
+class Command(BaseCommand):
+    help = 'Удаляет брошенные загрузки по частям вместе с их файлами.'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS(f'Удалено загрузок: {expire()}'))
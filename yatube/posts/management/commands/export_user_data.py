@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import iter_user_export
+from posts.models import User
+
+
+class Command(BaseCommand):
+    help = 'Сохраняет ZIP со всеми данными пользователя в файл.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('path', help='Куда записать архив.')
+
+    def handle(self, *args, **options):
+        user = User.objects.filter(username=options['username']).first()
+        if user is None:
+            raise CommandError(
+                f'Пользователь {options["username"]} не найден'
+            )
+        size = 0
+        with open(options['path'], 'wb') as archive:
+            for chunk in iter_user_export(user):
+                archive.write(chunk)
+                size += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'Архив {options["path"]} записан, {size} байт'
+        ))
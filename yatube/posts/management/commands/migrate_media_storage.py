@@ -0,0 +1,85 @@
+from django.core.management.base import BaseCommand
+
+from core.storage import content_storage
+from posts.models import ArchivedPost, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки постов из плоского каталога в хранилище '
+        'по содержимому.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько постов читать из базы за раз.',
+        )
+        parser.add_argument(
+            '--keep-old', action='store_true',
+            help='Не удалять старые файлы после переноса.',
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только посчитать файлы, ничего не меняя.',
+        )
+
+    def rows(self, model, batch_size):
+        """Посты с картинками пачками по возрастанию pk: строки
+        меняются по ходу обхода, поэтому курсор не держим открытым."""
+        queryset = model._base_manager.exclude(image='').exclude(
+            image=None
+        ).order_by('pk').values_list('pk', 'image')
+        last_pk = None
+        while True:
+            batch = queryset
+            if last_pk is not None:
+                batch = batch.filter(pk__gt=last_pk)
+            batch = list(batch[:batch_size])
+            if not batch:
+                return
+            yield from batch
+            last_pk = batch[-1][0]
+
+    def move(self, name, moved, dry_run):
+        """Возвращает новое имя файла, перенося его при первой встрече."""
+        new_name = moved.get(name)
+        if new_name is not None:
+            # Тот же файл у нескольких постов: копия уже есть,
+            # добавляем только ссылку.
+            if not dry_run:
+                content_storage.reference(new_name)
+            return new_name
+        if not content_storage.exists(name):
+            return None
+        if dry_run:
+            new_name = name
+        else:
+            with content_storage.open(name, 'rb') as source:
+                new_name = content_storage.save(name, source)
+        moved[name] = new_name
+        return new_name
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        moved = {}
+        missing = updated = 0
+        for model in (Post, ArchivedPost):
+            for pk, name in self.rows(model, options['batch_size']):
+                if content_storage.is_content_name(name):
+                    continue
+                new_name = self.move(name, moved, dry_run)
+                if new_name is None:
+                    missing += 1
+                    self.stderr.write(f'Нет файла {name} (пост {pk})')
+                    continue
+                if not dry_run:
+                    model._base_manager.filter(pk=pk).update(image=new_name)
+                updated += 1
+        if not dry_run and not options['keep_old']:
+            for name in moved:
+                content_storage.delete(name)
+        self.stdout.write(self.style.SUCCESS(
+            f'Файлов: {len(moved)}, постов: {updated}, '
+            f'не найдено: {missing}'
+        ))
@@ -0,0 +1,47 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from posts.warmup import warm
+
+
+class Command(BaseCommand):
+    help = (
+        'Рендерит первые страницы главной, популярные группы и профили '
+        'и нарезает превью, чтобы первые посетители не ждали.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages', type=int, default=settings.WARMUP_INDEX_PAGES,
+            help='Сколько страниц главной прогреть.',
+        )
+        parser.add_argument(
+            '--groups', type=int, default=settings.WARMUP_GROUPS,
+            help='Сколько самых наполненных групп прогреть.',
+        )
+        parser.add_argument(
+            '--profiles', type=int, default=settings.WARMUP_PROFILES,
+            help='Сколько самых активных авторов прогреть.',
+        )
+        parser.add_argument(
+            '--workers', type=int, default=settings.WARMUP_WORKERS,
+            help='Сколько страниц рендерить одновременно.',
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        total = failed = 0
+        for target, outcome, seconds in warm(
+            options['pages'], options['groups'],
+            options['profiles'], options['workers'],
+        ):
+            total += 1
+            if outcome not in ('ok', 200):
+                failed += 1
+            self.stdout.write(f'{target}: {outcome} ({seconds:.2f} с)')
+        self.stdout.write(self.style.SUCCESS(
+            f'Прогрето: {total - failed} из {total} '
+            f'за {time.monotonic() - started:.1f} с'
+        ))
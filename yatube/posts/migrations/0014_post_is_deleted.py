@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_archive'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Удалён'),
+        ),
+    ]
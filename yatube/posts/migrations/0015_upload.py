@@ -0,0 +1,29 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:02
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0014_post_is_deleted'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Upload',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255, verbose_name='Имя файла')),
+                ('size', models.BigIntegerField(verbose_name='Размер')),
+                ('sha256', models.CharField(max_length=64, verbose_name='SHA-256')),
+                ('received', models.BigIntegerField(default=0, verbose_name='Получено байт')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Начата')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='uploads', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:05
+
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_upload'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='archivedpost',
+            name='image',
+            field=models.ImageField(blank=True, null=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите сюда picture', null=True, storage=core.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Просмотры'),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='view_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Просмотры'),
+        ),
+    ]
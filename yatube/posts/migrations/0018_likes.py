@@ -0,0 +1,45 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:19
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0017_view_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedpost',
+            name='like_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Лайки'),
+        ),
+        migrations.CreateModel(
+            name='LikeCounter',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('count', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='like_counters', to='posts.Post')),
+            ],
+            options={
+                'unique_together': {('post', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Like',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='likes', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'post')},
+            },
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 2.2.16 on 2026-10-19 09:21
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('posts', '0018_likes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('is_read', models.BooleanField(default=False, verbose_name='Прочитано')),
+                ('created', models.DateTimeField(auto_now_add=True, db_index=True, verbose_name='Создано')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='posts.Post')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read'], name='posts_notif_user_id_1b13a9_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='notification',
+            unique_together={('user', 'post')},
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-19 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_notifications'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='archivedcomment',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Удалён'),
+        ),
+        migrations.AddField(
+            model_name='archivedpost',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Удалён'),
+        ),
+        migrations.AddField(
+            model_name='comment',
+            name='is_deleted',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Удалён'),
+        ),
+    ]
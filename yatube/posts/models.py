@@ -1,6 +1,9 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth import get_user_model
 from core.models import CreatedModel
+from core.storage import content_storage
 
 User = get_user_model()
 
@@ -14,6 +17,13 @@ class Group(models.Model):
         return self.title
 
 
+class VisibleManager(models.Manager):
+    """Скрывает строки, помеченные на удаление."""
+
+    def get_queryset(self):
+        return super().get_queryset().filter(is_deleted=False)
+
+
 class Post(CreatedModel):
     text = models.TextField(
         verbose_name='Текст',
@@ -36,10 +46,24 @@ class Post(CreatedModel):
     image = models.ImageField(
         verbose_name='Картинка',
         upload_to='posts/',
+        storage=content_storage,
         blank=True,
         help_text='Загрузите сюда picture',
         null=True,
     )
+    is_deleted = models.BooleanField(
+        verbose_name='Удалён',
+        default=False,
+        editable=False,
+    )
+    view_count = models.PositiveIntegerField(
+        verbose_name='Просмотры',
+        default=0,
+        editable=False,
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     class Meta:
         ordering = ['-pub_date']
@@ -47,6 +71,18 @@ class Post(CreatedModel):
     def __str__(self):
         return self.text[:30]
 
+    def save(self, *args, **kwargs):
+        # Просмотры меняет только view_counts.flush через F(): полное
+        # сохранение вернуло бы в базу число, прочитанное до них.
+        if not self._state.adding and not args and not kwargs.get(
+            'force_insert'
+        ) and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name != 'view_count'
+            ]
+        super().save(*args, **kwargs)
+
 
 class Comment(models.Model):
     post = models.ForeignKey(
@@ -69,6 +105,14 @@ class Comment(models.Model):
         'Дата публикации',
         auto_now_add=True
     )
+    is_deleted = models.BooleanField(
+        verbose_name='Удалён',
+        default=False,
+        editable=False,
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.text[:30]
@@ -85,3 +129,168 @@ class Follow(models.Model):
         on_delete=models.CASCADE,
         related_name="following"
     )
+
+
+class Like(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='likes'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='likes'
+    )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('user', 'post')
+
+
+class LikeCounter(models.Model):
+    """Часть счётчика лайков поста.
+
+    Лайк увеличивает случайную из LIKE_COUNTER_SHARDS строк, поэтому
+    одновременные лайки популярного поста не ждут одну и ту же строку.
+    Итог — сумма по всем частям.
+    """
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='like_counters'
+    )
+    shard = models.PositiveSmallIntegerField()
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = ('post', 'shard')
+
+
+class Notification(models.Model):
+    """Запись во входящих подписчика о новом посте автора."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='notifications'
+    )
+    is_read = models.BooleanField('Прочитано', default=False)
+    created = models.DateTimeField(
+        'Создано',
+        auto_now_add=True,
+        db_index=True
+    )
+
+    class Meta:
+        ordering = ['-created']
+        unique_together = ('user', 'post')
+        indexes = [models.Index(fields=['user', 'is_read'])]
+
+
+class ArchivedPost(models.Model):
+    """Пост, вынесенный из горячей таблицы командой archive_posts.
+
+    id совпадает с id исходного поста, поэтому ссылки продолжают работать.
+    """
+    is_archived = True
+
+    id = models.IntegerField(primary_key=True)
+    text = models.TextField(verbose_name='Текст')
+    pub_date = models.DateTimeField(
+        verbose_name='Дата создания',
+        db_index=True
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_posts'
+    )
+    group = models.ForeignKey(
+        Group,
+        verbose_name='Группа',
+        blank=True,
+        null=True,
+        on_delete=models.SET_NULL,
+        related_name='archived_posts',
+    )
+    image = models.ImageField(
+        verbose_name='Картинка',
+        upload_to='posts/',
+        storage=content_storage,
+        blank=True,
+        null=True,
+    )
+    view_count = models.PositiveIntegerField(
+        verbose_name='Просмотры',
+        default=0,
+    )
+    like_count = models.PositiveIntegerField(
+        verbose_name='Лайки',
+        default=0,
+    )
+    is_deleted = models.BooleanField(
+        verbose_name='Удалён',
+        default=False,
+        editable=False,
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    class Meta:
+        ordering = ['-pub_date']
+
+    def __str__(self):
+        return self.text[:30]
+
+
+class ArchivedComment(models.Model):
+    id = models.IntegerField(primary_key=True)
+    post = models.ForeignKey(
+        ArchivedPost,
+        on_delete=models.CASCADE,
+        related_name='comments',
+        verbose_name='Пост'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='archived_comments',
+        verbose_name='Автор'
+    )
+    text = models.TextField('Текст комментария')
+    created = models.DateTimeField('Дата публикации')
+    is_deleted = models.BooleanField(
+        verbose_name='Удалён',
+        default=False,
+        editable=False,
+    )
+
+    objects = VisibleManager()
+    all_objects = models.Manager()
+
+    def __str__(self):
+        return self.text[:30]
+
+
+class Upload(models.Model):
+    """Загрузка картинки по частям, которую можно продолжить."""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='uploads'
+    )
+    filename = models.CharField('Имя файла', max_length=255)
+    size = models.BigIntegerField('Размер')
+    sha256 = models.CharField('SHA-256', max_length=64)
+    received = models.BigIntegerField('Получено байт', default=0)
+    created = models.DateTimeField('Начата', auto_now_add=True)
+
+    def __str__(self):
+        return self.filename
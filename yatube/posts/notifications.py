@@ -0,0 +1,71 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from jobs.queue import task
+
+from .deletion import delete_in_batches
+from .models import Follow, Notification, Post
+
+
+def batches(iterator, size):
+    batch = []
+    for item in iterator:
+        batch.append(item)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@task
+def fan_out(post_id, batch_size=None):
+    """Рассылает подписчикам автора уведомления о новом посте.
+
+    Подписчики читаются потоком, строки вставляются пачками через
+    bulk_create. Повтор задачи после сбоя не создаёт дублей:
+    пара (пользователь, пост) уникальна. Заодно удаляются старые
+    уведомления.
+    """
+    post = Post.objects.filter(pk=post_id).only('author_id').first()
+    if post is None:
+        return 0
+    batch_size = batch_size or settings.NOTIFICATIONS_BATCH_SIZE
+    followers = Follow.objects.filter(author_id=post.author_id).exclude(
+        user_id=post.author_id
+    ).order_by('pk').values_list('user_id', flat=True).iterator()
+    sent = 0
+    for user_ids in batches(followers, batch_size):
+        Notification.objects.bulk_create(
+            [
+                Notification(user_id=user_id, post_id=post_id)
+                for user_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+        sent += len(user_ids)
+    prune()
+    return sent
+
+
+def unread_count(user):
+    """Число непрочитанных одним запросом по индексу (user, is_read)."""
+    return Notification.objects.filter(user=user, is_read=False).count()
+
+
+def mark_read(user, ids):
+    return Notification.objects.filter(
+        user=user, pk__in=ids, is_read=False
+    ).update(is_read=True)
+
+
+def prune(now=None):
+    """Удаляет уведомления старше NOTIFICATIONS_KEEP_DAYS."""
+    older_than = (now or timezone.now()) - timedelta(
+        days=settings.NOTIFICATIONS_KEEP_DAYS
+    )
+    return delete_in_batches(
+        Notification.objects.filter(created__lt=older_than)
+    )
@@ -0,0 +1,274 @@
+import inspect
+import os
+import tempfile
+from datetime import timedelta
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import transaction
+from django.http import Http404
+from django.urls import resolve, reverse
+from django.utils import timezone
+
+from core.compression import (
+    ENCODING_SUFFIXES, available_encodings, compress
+)
+from core.wsgi import snapshot_file
+from jobs.queue import enqueue, task
+
+from .models import Group, Post, User
+
+SNAPSHOT_VIEWS = ('posts:index', 'posts:group_list', 'posts:profile')
+
+
+def snapshot_path(url):
+    """Файл снимка по адресу из reverse() или None, если адрес нельзя
+    положить внутрь SNAPSHOTS_DIR.
+
+    SnapshotApp ищет файл по раскодированному пути, поэтому и здесь
+    путь раскодируется.
+    """
+    root = os.path.abspath(settings.SNAPSHOTS_DIR)
+    return snapshot_file(root, unquote(urlsplit(url).path))
+
+
+def render(url):
+    """HTML первой страницы для анонимного посетителя или None (404).
+
+    Представление вызывается без обёрток: кеш страницы не должен
+    подсунуть в снимок устаревшую копию.
+    """
+    # warmup импортирует views, а views — модули с сигналами снимков.
+    from .warmup import warmup_environ, warmup_host
+
+    request = WSGIRequest(warmup_environ(url, warmup_host()))
+    match = resolve(request.path_info)
+    if match.view_name not in SNAPSHOT_VIEWS:
+        raise ValueError(f'{url} не снимается')
+    request.user = AnonymousUser()
+    request.resolver_match = match
+    view = inspect.unwrap(match.func)
+    try:
+        response = view(request, *match.args, **match.kwargs)
+    except Http404:
+        return None
+    return response.content
+
+
+def write_file(path, content):
+    descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(path))
+    with os.fdopen(descriptor, 'wb') as target:
+        target.write(content)
+    os.chmod(temporary, 0o644)
+    os.replace(temporary, path)
+
+
+def remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def save(url, content):
+    """Атомарно кладёт снимок и его сжатые варианты."""
+    path = snapshot_path(url)
+    if path is None:
+        return
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    for encoding in available_encodings():
+        write_file(
+            path + ENCODING_SUFFIXES[encoding], compress(content, encoding)
+        )
+    write_file(path, content)
+
+
+def remove(url):
+    path = snapshot_path(url)
+    if path is None:
+        return
+    remove_file(path)
+    for suffix in ENCODING_SUFFIXES.values():
+        remove_file(path + suffix)
+
+
+@task
+def refresh(urls):
+    """Перерисовывает снимки; снимок пропавшей страницы удаляется."""
+    if not settings.SNAPSHOTS_DIR:
+        return 0
+    for url in urls:
+        if snapshot_path(url) is None:
+            continue
+        content = render(url)
+        if content is None:
+            remove(url)
+        else:
+            save(url, content)
+    return len(urls)
+
+
+def all_urls():
+    urls = [reverse('posts:index')]
+    urls += [
+        reverse('posts:group_list', args=(slug,))
+        for slug in Group.objects.values_list('slug', flat=True).iterator()
+    ]
+    urls += [
+        reverse('posts:profile', args=(username,))
+        for username in User.objects.filter(
+            is_active=True, posts__isnull=False
+        ).distinct().values_list('username', flat=True).iterator()
+    ]
+    return urls
+
+
+def affected_urls(group_ids, author_ids):
+    """Страницы, на первой странице которых могут быть посты."""
+    urls = [reverse('posts:index')]
+    urls += [
+        reverse('posts:group_list', args=(slug,))
+        for slug in Group.objects.filter(pk__in=group_ids).values_list(
+            'slug', flat=True
+        )
+    ]
+    urls += [
+        reverse('posts:profile', args=(username,))
+        for username in User.objects.filter(pk__in=author_ids).values_list(
+            'username', flat=True
+        )
+    ]
+    return urls
+
+
+def schedule_urls(urls):
+    """Ставит перерисовку после коммита, когда изменения уже видны."""
+    urls = list(dict.fromkeys(urls))
+    transaction.on_commit(lambda: refresh.delay(urls))
+
+
+def schedule(group_ids, author_ids):
+    if not settings.SNAPSHOTS_DIR:
+        return
+    schedule_urls(affected_urls(
+        {pk for pk in group_ids if pk is not None}, set(author_ids)
+    ))
+
+
+def schedule_delayed(post):
+    """Перерисовка страниц поста через SNAPSHOTS_LIKE_DELAY секунд.
+
+    Лайки идут часто, поэтому на пост ставится одна задача на окно:
+    она нарисует счётчики, набежавшие к её запуску.
+    """
+    if not settings.SNAPSHOTS_DIR:
+        return
+    delay = settings.SNAPSHOTS_LIKE_DELAY
+    if not cache.add(f'snapshots:delayed:{post.pk}', True, delay):
+        return
+    urls = affected_urls(
+        {post.group_id} - {None}, {post.author_id}
+    )
+    run_at = timezone.now() + timedelta(seconds=delay)
+    transaction.on_commit(
+        lambda: enqueue(refresh, (urls,), run_at=run_at)
+    )
+
+
+def schedule_for(posts):
+    """Перерисовка страниц с постами queryset (до их изменения)."""
+    if not settings.SNAPSHOTS_DIR:
+        return
+    rows = list(Post.all_objects.filter(
+        pk__in=posts.values('pk')
+    ).values_list('group_id', 'author_id').distinct())
+    schedule(
+        [group_id for group_id, _ in rows],
+        [author_id for _, author_id in rows],
+    )
+
+
+def remember_group(sender, instance, raw=False, **kwargs):
+    """Группа до правки: пост мог уйти с её страницы."""
+    if not settings.SNAPSHOTS_DIR or raw or instance.pk is None:
+        return
+    instance._snapshot_old_group_id = Post.all_objects.filter(
+        pk=instance.pk
+    ).values_list('group_id', flat=True).first()
+
+
+def post_changed(sender, instance, raw=False, **kwargs):
+    if not settings.SNAPSHOTS_DIR or raw:
+        return
+    old_group_id = getattr(instance, '_snapshot_old_group_id', None)
+    schedule([instance.group_id, old_group_id], [instance.author_id])
+
+
+# Поля группы и пользователя, которые видны на снимках.
+SHOWN_FIELDS = {
+    Group: ('slug', 'title'),
+    User: ('username', 'first_name', 'last_name', 'is_active'),
+}
+
+
+def owner_urls(instance):
+    """Страница группы или профиля и страницы с их постами."""
+    if isinstance(instance, Group):
+        url = reverse('posts:group_list', args=(instance.slug,))
+        posts = Post.all_objects.filter(group_id=instance.pk)
+    else:
+        url = reverse('posts:profile', args=(instance.username,))
+        posts = Post.all_objects.filter(author_id=instance.pk)
+    rows = list(posts.values_list('group_id', 'author_id').distinct())
+    return [url] + affected_urls(
+        {group_id for group_id, _ in rows if group_id is not None},
+        {author_id for _, author_id in rows},
+    )
+
+
+def shown(instance):
+    return tuple(
+        getattr(instance, field) for field in SHOWN_FIELDS[type(instance)]
+    )
+
+
+def remember_owner(sender, instance, raw=False, update_fields=None,
+                   **kwargs):
+    """Страницы группы или пользователя до правки или удаления.
+
+    Старый адрес (прежний слаг или имя) после правки отдаёт 404,
+    и refresh удалит его снимок. При удалении группы посты отвязываются
+    массовым UPDATE без сигналов, поэтому их страницы собираются здесь.
+    """
+    if not settings.SNAPSHOTS_DIR or raw or instance.pk is None:
+        return
+    fields = SHOWN_FIELDS[sender]
+    if update_fields is not None and not set(update_fields) & set(fields):
+        return
+    old = sender._default_manager.filter(pk=instance.pk).first()
+    if old is not None:
+        instance._snapshot_old = (shown(old), owner_urls(old))
+
+
+def owner_changed(sender, instance, raw=False, **kwargs):
+    """Перерисовка после правки группы или пользователя."""
+    old = getattr(instance, '_snapshot_old', None)
+    if raw or old is None:
+        return
+    del instance._snapshot_old
+    old_shown, old_urls = old
+    if old_shown != shown(instance):
+        schedule_urls(old_urls + owner_urls(instance))
+
+
+def owner_deleted(sender, instance, **kwargs):
+    """После удаления группы или пользователя их снимок удаляется,
+    а страницы с их бывшими постами перерисовываются."""
+    old = getattr(instance, '_snapshot_old', None)
+    if old is None:
+        return
+    _, old_urls = old
+    schedule_urls(old_urls)
@@ -0,0 +1,25 @@
+from sorl.thumbnail import get_thumbnail
+
+from jobs.queue import task
+
+from . import uploads
+from .models import Post
+
+# Должно совпадать с параметрами тега thumbnail в шаблонах.
+THUMBNAIL_GEOMETRY = '960x339'
+THUMBNAIL_OPTIONS = {'crop': 'center', 'upscale': True}
+
+
+@task
+def make_thumbnails(post_id):
+    """Заранее нарезает превью картинки поста."""
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    get_thumbnail(post.image, THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS)
+
+
+@task
+def expire_uploads():
+    """Удаляет брошенные загрузки по частям."""
+    return uploads.expire()
@@ -0,0 +1,98 @@
+from datetime import timedelta
+from http import HTTPStatus
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from ..models import ArchivedComment, ArchivedPost, Comment, Group, Post, User
+
+
+class ArchiveTests(TestCase):
+    """Перенос старых постов в архив и чтение из него."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, group=cls.group, text=f'Пост {index}')
+            for index in range(19)
+        )
+        cls.old_posts = list(Post.objects.order_by('pk')[:7])
+        Post.objects.filter(
+            pk__in=[post.pk for post in cls.old_posts]
+        ).update(pub_date=timezone.now() - timedelta(days=400))
+        cls.old_post = cls.old_posts[0]
+        Comment.objects.create(
+            post=cls.old_post, author=cls.user, text='Старый коммент'
+        )
+
+    def setUp(self):
+        cache.clear()
+        call_command('archive_posts', batch_size=3, stdout=StringIO())
+
+    def test_old_posts_are_moved_with_comments(self):
+        """Старые посты и их комментарии переезжают в архив."""
+        self.assertEqual(Post.objects.count(), 12)
+        self.assertEqual(ArchivedPost.objects.count(), 7)
+        self.assertFalse(Comment.objects.exists())
+        comment = ArchivedComment.objects.get()
+        self.assertEqual(comment.post_id, self.old_post.pk)
+        archived = ArchivedPost.objects.get(pk=self.old_post.pk)
+        self.assertLess(
+            archived.pub_date, timezone.now() - timedelta(days=365)
+        )
+
+    def test_post_detail_falls_through_to_archive(self):
+        """Страница архивного поста открывается по старому адресу."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.old_post.pk,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertEqual(response.context['post'].text, self.old_post.text)
+        self.assertContains(response, 'Старый коммент')
+
+    def test_profile_pages_continue_into_archive(self):
+        """Пагинация профиля продолжается архивными постами."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        first = self.client.get(url)
+        second = self.client.get(url, {'page': 2})
+        self.assertEqual(first.context['page_obj'].paginator.count, 19)
+        self.assertFalse(any(
+            getattr(post, 'is_archived', False)
+            for post in first.context['page_obj']
+        ))
+        self.assertEqual(
+            [getattr(post, 'is_archived', False)
+             for post in second.context['page_obj']],
+            [False, False] + [True] * 7
+        )
+
+    def test_group_pages_continue_into_archive(self):
+        """Пагинация группы продолжается архивными постами."""
+        url = reverse('posts:group_list', args=(self.group.slug,))
+        response = self.client.get(url, {'page': 2})
+        self.assertEqual(len(response.context['page_obj']), 9)
+
+    def test_first_page_does_not_read_archive_rows(self):
+        """Если горячих постов хватает на страницу, архив только
+        считается, но не читается."""
+        url = reverse('posts:profile', args=(self.user.username,))
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url, {'page': 1})
+        archive_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'posts_archivedpost' in query['sql']
+        ]
+        self.assertEqual(len(archive_queries), 1)
+        self.assertIn('COUNT', archive_queries[0])
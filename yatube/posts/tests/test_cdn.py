@@ -0,0 +1,196 @@
+import threading
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from core import surrogate
+from jobs.models import Job
+from .. import likes
+from ..deletion import mark_posts_deleted
+from ..models import Comment, Group, Post, User
+
+
+class PurgeServer(HTTPServer):
+    """Прокси-заглушка: запоминает ключи из запросов очистки."""
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), PurgeHandler)
+        self.requests = []
+        self.status = HTTPStatus.OK
+
+    @property
+    def url(self):
+        host, port = self.server_address
+        return f'http://{host}:{port}/purge'
+
+    def purged(self):
+        return {
+            key
+            for _, headers in self.requests
+            for key in headers['Surrogate-Key'].split()
+        }
+
+
+class PurgeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.server.requests.append((self.path, dict(self.headers)))
+        self.send_response(self.server.status)
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class SurrogateKeyHeaderTests(TestCase):
+    """Ключи для CDN в ответах posts.views."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Группа', slug='cats', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+
+    def keys(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return set(response['Surrogate-Key'].split())
+
+    def test_pages_are_tagged(self):
+        """Ленты и страница поста помечены своими ключами."""
+        post_keys = {f'post-{self.post.pk}', 'author-leo', 'group-cats'}
+        for url, expected in (
+            (reverse('posts:index'), post_keys | {'index'}),
+            (reverse('posts:group_list', args=('cats',)), post_keys),
+            (reverse('posts:profile', args=('leo',)), post_keys),
+            (reverse('posts:post_detail', args=(self.post.pk,)), post_keys),
+            (reverse('posts:index_cards'), post_keys | {'index'}),
+        ):
+            with self.subTest(url=url):
+                self.assertEqual(self.keys(url), expected)
+
+    def test_shell_cache_hit_keeps_keys(self):
+        """Ответ из кеша оболочки несёт те же ключи."""
+        url = reverse('posts:index')
+        self.assertEqual(self.keys(url), self.keys(url))
+
+    @override_settings(SURROGATE_MAX_AGE=3600)
+    def test_surrogate_control(self):
+        """С SURROGATE_MAX_AGE прокси может держать ответ долго."""
+        response = self.client.get(reverse('posts:index'))
+        self.assertEqual(response['Surrogate-Control'], 'max-age=3600')
+
+    @override_settings(SURROGATE_MAX_AGE=3600)
+    def test_personal_pages_are_private(self):
+        """Страницы для вошедшего не уходят в общий кеш прокси."""
+        self.client.force_login(self.author)
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+            reverse('posts:profile', args=('leo',)),
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertNotIn('Surrogate-Control', response)
+                self.assertIn('private', response['Cache-Control'])
+
+
+@override_settings(JOBS_EAGER=True)
+class PurgeDispatchTests(TransactionTestCase):
+    """Очистка CDN по ключам после изменений.
+
+    Очистка ставится после коммита, поэтому без общей транзакции.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.server = PurgeServer()
+        thread = threading.Thread(target=self.server.serve_forever)
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings = override_settings(SURROGATE_PURGE_URL=self.server.url)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.author = User.objects.create_user(username='leo')
+        self.group = Group.objects.create(
+            title='Группа', slug='cats', description='Описание'
+        )
+        self.server.requests.clear()
+
+    def test_post_change_purges_its_pages(self):
+        """Новый пост и смена группы чистят ленты, пост и обе группы."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        self.assertEqual(self.server.purged(), {
+            'index', f'post-{post.pk}', 'author-leo', 'group-cats',
+        })
+        self.assertEqual(self.server.requests[0][0], '/purge')
+        dogs = Group.objects.create(
+            title='Собаки', slug='dogs', description='Описание'
+        )
+        self.server.requests.clear()
+        post.group = dogs
+        post.save()
+        self.assertTrue(
+            {'group-cats', 'group-dogs'} <= self.server.purged()
+        )
+
+    def test_comment_and_group_changes(self):
+        """Комментарий чистит пост, переименование — старый и новый slug."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.server.requests.clear()
+        Comment.objects.create(post=post, author=self.author, text='Ок')
+        self.assertEqual(self.server.purged(), {f'post-{post.pk}'})
+        self.server.requests.clear()
+        self.group.slug = 'kittens'
+        self.group.save()
+        self.assertEqual(self.server.purged(), {'group-cats', 'group-kittens'})
+
+    def test_like_purges_post(self):
+        """Лайк и его снятие чистят страницы с постом."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        self.server.requests.clear()
+        likes.like(self.author, post)
+        self.assertEqual(self.server.purged(), {f'post-{post.pk}'})
+        self.server.requests.clear()
+        likes.unlike(self.author, post)
+        self.assertEqual(self.server.purged(), {f'post-{post.pk}'})
+
+    def test_background_deletion_purges(self):
+        """Пометка на удаление через update() тоже чистит страницы."""
+        post = Post.objects.create(
+            author=self.author, group=self.group, text='Пост'
+        )
+        self.server.requests.clear()
+        mark_posts_deleted(Post.objects.filter(pk=post.pk))
+        self.assertIn(f'post-{post.pk}', self.server.purged())
+
+    def test_batches_and_retry(self):
+        """Ключи уходят пачками, ошибка прокси оставляет задачу."""
+        with self.settings(SURROGATE_PURGE_BATCH=2):
+            surrogate.purge(['a', 'b', 'c'])
+        self.assertEqual(
+            [headers['Surrogate-Key'] for _, headers in self.server.requests],
+            ['a b', 'c'],
+        )
+        self.server.status = HTTPStatus.SERVICE_UNAVAILABLE
+        with self.settings(JOBS_EAGER=False):
+            surrogate.schedule(['index'])
+            job = Job.objects.get(name='core.surrogate.purge')
+        from jobs.queue import run
+        self.assertFalse(run(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.PENDING)
+        self.assertIn('503', job.last_error)
@@ -0,0 +1,195 @@
+from http import HTTPStatus
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from jobs.models import Job
+from jobs.queue import claim, run
+from ..deletion import delete_in_batches, mark_posts_deleted, mark_user_deleted
+from ..likes import like, totals
+from ..archive import archive_batch
+from ..models import ArchivedPost, Comment, Follow, Group, Like, Post
+
+User = get_user_model()
+
+
+def run_jobs():
+    while True:
+        jobs = claim(10)
+        if not jobs:
+            return
+        for job in jobs:
+            run(job)
+
+
+class BackgroundDeletionTests(TestCase):
+    """Пометка на удаление и фоновое удаление пачками."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа',
+            slug='group',
+            description='Описание',
+        )
+
+    def setUp(self):
+        cache.clear()
+        Post.objects.bulk_create(
+            Post(author=self.author, group=self.group, text=f'Пост {index}')
+            for index in range(5)
+        )
+        self.post = Post.objects.first()
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        Comment.objects.create(
+            post=Post.objects.create(author=self.reader, text='Чужой пост'),
+            author=self.author,
+            text='Комментарий автора',
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+
+    def test_marked_posts_are_hidden_immediately(self):
+        """Помеченный пост сразу пропадает со страниц."""
+        mark_posts_deleted(Post.objects.filter(pk=self.post.pk))
+        self.assertFalse(Post.objects.filter(pk=self.post.pk).exists())
+        self.assertTrue(Post.all_objects.filter(pk=self.post.pk).exists())
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+
+    def test_marked_posts_are_purged_by_job(self):
+        """Фоновая задача удаляет помеченные посты и их комментарии."""
+        mark_posts_deleted(Post.objects.filter(author=self.author))
+        self.assertTrue(Job.objects.filter(
+            name='posts.deletion.purge_deleted_posts'
+        ).exists())
+        run_jobs()
+        self.assertFalse(Post.all_objects.filter(author=self.author).exists())
+        self.assertFalse(Comment.objects.filter(post=self.post).exists())
+
+    def test_delete_in_batches(self):
+        """Удаление пачками удаляет всё и возвращает число строк."""
+        deleted = delete_in_batches(
+            Post.all_objects.filter(author=self.author), batch_size=2
+        )
+        self.assertEqual(deleted, 5)
+        self.assertFalse(Post.all_objects.filter(author=self.author).exists())
+
+    def test_user_deletion(self):
+        """Аккаунт сразу закрывается, а данные удаляются в фоне."""
+        mark_user_deleted(self.author)
+        self.author.refresh_from_db()
+        self.assertFalse(self.author.is_active)
+        self.assertFalse(Post.objects.filter(author=self.author).exists())
+
+        run_jobs()
+        self.assertFalse(User.objects.filter(pk=self.author.pk).exists())
+        self.assertFalse(Post.all_objects.filter(author=self.author).exists())
+        self.assertFalse(Comment.all_objects.filter(
+            author=self.author
+        ).exists())
+        self.assertFalse(Follow.objects.exists())
+        self.assertTrue(Post.objects.filter(author=self.reader).exists())
+
+    def test_user_archive_and_comments_are_hidden_immediately(self):
+        """Архив и комментарии удалённого пользователя пропадают сразу."""
+        old_post = Post.objects.filter(author=self.author).last()
+        archive_batch(
+            older_than=old_post.pub_date.replace(year=3000), batch_size=100
+        )
+        other = ArchivedPost.objects.get(author=self.reader)
+        mark_user_deleted(self.author)
+        self.assertFalse(ArchivedPost.objects.filter(
+            author=self.author
+        ).exists())
+        self.assertFalse(other.comments.filter(author=self.author).exists())
+        response = self.client.get(
+            reverse('posts:post_detail', args=(old_post.pk,))
+        )
+        self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
+        response = self.client.get(
+            reverse('posts:post_detail', args=(other.pk,))
+        )
+        self.assertNotContains(response, 'Комментарий автора')
+
+        run_jobs()
+        self.assertFalse(ArchivedPost.all_objects.filter(
+            author=self.author
+        ).exists())
+
+    @override_settings(DELETION_BATCH_SIZE=2)
+    def test_post_comments_are_deleted_in_batches(self):
+        """Комментарии удаляемых постов удаляются своими пачками."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.reader, text=f'К {index}')
+            for index in range(4)
+        )
+        mark_posts_deleted(Post.objects.filter(pk=self.post.pk))
+        with CaptureQueriesContext(connection) as queries:
+            run_jobs()
+        deletes = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('DELETE FROM "posts_comment"')
+        ]
+        self.assertEqual(len(deletes), 3)
+        self.assertFalse(Post.all_objects.filter(pk=self.post.pk).exists())
+        self.assertFalse(Comment.all_objects.filter(post=self.post).exists())
+
+    def test_purged_user_likes_leave_counters_consistent(self):
+        """Лайки удалённого пользователя вычитаются из счётчиков."""
+        other = Post.objects.get(author=self.reader)
+        like(self.author, other)
+        like(self.reader, other)
+        mark_user_deleted(self.author)
+        run_jobs()
+        self.assertEqual(Like.objects.filter(post=other).count(), 1)
+        self.assertEqual(totals([other.pk]), {other.pk: 1})
+
+    def test_admin_action_marks_posts(self):
+        """Действие админки помечает посты и ставит задачу."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        response = client.post(
+            reverse('admin:posts_post_changelist'),
+            {
+                'action': 'delete_in_background',
+                '_selected_action': [self.post.pk],
+            },
+        )
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertTrue(Post.all_objects.get(pk=self.post.pk).is_deleted)
+        self.assertTrue(Job.objects.exists())
+
+    def test_admin_delete_page_does_not_collect_related(self):
+        """Подтверждение удаления не грузит связанные строки автора."""
+        admin = User.objects.create_superuser(
+            'admin', 'admin@example.com', 'password'
+        )
+        client = Client()
+        client.force_login(admin)
+        url = reverse('admin:auth_user_delete', args=(self.author.pk,))
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {index}')
+            for index in range(30)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        self.assertContains(response, 'связанные записи удалятся в фоне')
+        self.assertFalse(any(
+            'posts_post' in query['sql'] for query in queries.captured_queries
+        ))
+        response = client.post(url, {'post': 'yes'})
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertFalse(User.objects.get(pk=self.author.pk).is_active)
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from http import HTTPStatus
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Comment, Follow, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ExportTests(TestCase):
+    """Потоковая выгрузка данных пользователя."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.other = User.objects.create_user(username='sofia')
+        cls.post = Post.objects.create(
+            author=cls.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(
+                'small.gif', SMALL_GIF, content_type='image/gif'
+            ),
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Пост {index}')
+            for index in range(30)
+        )
+        Post.objects.create(author=cls.other, text='Чужой пост')
+        Comment.objects.create(post=cls.post, author=cls.user, text='Мой')
+        Follow.objects.create(user=cls.user, author=cls.other)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def check_archive(self, content):
+        archive = zipfile.ZipFile(BytesIO(content))
+        posts = archive.read('posts.jsonl').decode().splitlines()
+        self.assertEqual(len(posts), 31)
+        self.assertEqual(json.loads(posts[0])['text'], 'Пост с картинкой')
+        comments = archive.read('comments.jsonl').decode().splitlines()
+        self.assertEqual(json.loads(comments[0])['text'], 'Мой')
+        following = archive.read('following.jsonl').decode()
+        self.assertIn('sofia', following)
+        self.assertEqual(
+            archive.read(f'images/{self.post.image.name}'), SMALL_GIF
+        )
+        self.assertEqual(
+            json.loads(archive.read('profile.json'))['username'], 'leo'
+        )
+
+    def test_export_view_streams_zip(self):
+        """Страница выгрузки отдаёт ZIP потоком."""
+        client = Client()
+        client.force_login(self.user)
+        response = client.get(reverse('posts:export_data'))
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.check_archive(b''.join(response.streaming_content))
+
+    def test_export_requires_login(self):
+        """Аноним выгрузку не получит."""
+        response = self.client.get(reverse('posts:export_data'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+
+    def test_export_command_writes_file(self):
+        """Команда пишет тот же архив на диск."""
+        path = os.path.join(TEMP_MEDIA_ROOT, 'export.zip')
+        call_command('export_user_data', 'leo', path, stdout=StringIO())
+        with open(path, 'rb') as archive:
+            self.check_archive(archive.read())
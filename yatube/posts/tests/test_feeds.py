@@ -0,0 +1,137 @@
+import threading
+import time
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+
+from .. import feeds
+from ..models import Follow, Group, Post, User
+
+
+@override_settings(LONG_POLL_TIMEOUT=0, LONG_POLL_INTERVAL=0.01)
+class NewPostsPollTests(TransactionTestCase):
+    """Долгий опрос новых постов.
+
+    Кеш сбрасывается после коммита, поэтому тест без общей транзакции.
+    """
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='leo')
+        self.reader = User.objects.create_user(username='reader')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        self.first = Post.objects.create(author=self.author, text='Первый')
+        self.url = reverse('posts:new_posts')
+
+    def poll(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        return response.json()
+
+    def test_cursor_without_after(self):
+        """Без курсора отдаётся текущий курсор ленты."""
+        self.assertEqual(
+            self.poll(), {'posts': [], 'cursor': self.first.pk}
+        )
+
+    def test_returns_only_newer_posts(self):
+        """Отдаются только посты новее курсора, по возрастанию."""
+        second = Post.objects.create(
+            author=self.author, group=self.group, text='Второй'
+        )
+        third = Post.objects.create(author=self.author, text='Третий')
+        data = self.poll(after=self.first.pk)
+        self.assertEqual(
+            [post['id'] for post in data['posts']], [second.pk, third.pk]
+        )
+        self.assertEqual(data['posts'][0]['group'], 'group')
+        self.assertEqual(data['cursor'], third.pk)
+        group_data = self.poll(feed='group', slug='group', after=0)
+        self.assertEqual(
+            [post['id'] for post in group_data['posts']], [second.pk]
+        )
+
+    def test_idle_poll_does_not_query_database(self):
+        """Пустой опрос после прогрева кеша не ходит в базу."""
+        self.poll(after=self.first.pk)
+        with self.assertNumQueries(0):
+            feeds.wait_for_posts(
+                feeds.Feed('index'), self.first.pk, 10, timeout=0.05
+            )
+
+    def test_follow_feed(self):
+        """Лента подписок видит только авторов из подписок."""
+        self.client.force_login(self.reader)
+        self.assertEqual(self.poll(feed='follow', after=0)['posts'], [])
+        Follow.objects.create(user=self.reader, author=self.author)
+        Post.objects.create(author=self.reader, text='Свой')
+        data = self.poll(feed='follow', after=0)
+        self.assertEqual(
+            [post['id'] for post in data['posts']], [self.first.pk]
+        )
+        self.client.logout()
+        response = self.client.get(self.url, {'feed': 'follow', 'after': 0})
+        self.assertEqual(response.status_code, HTTPStatus.UNAUTHORIZED)
+
+    def test_follow_latest_is_one_query_for_all_authors(self):
+        """Курсор подписок — один запрос на всех авторов, затем кеш."""
+        for index in range(5):
+            author = User.objects.create_user(username=f'author{index}')
+            Follow.objects.create(user=self.reader, author=author)
+        Follow.objects.create(user=self.reader, author=self.author)
+        with self.assertNumQueries(2):
+            latest = feeds.latest_followed_id(self.reader.pk)
+        self.assertEqual(latest, self.first.pk)
+        with self.assertNumQueries(0):
+            feeds.latest_followed_id(self.reader.pk)
+        second = Post.objects.create(author=self.author, text='Второй')
+        self.assertEqual(feeds.latest_followed_id(self.reader.pk), second.pk)
+
+    def test_bad_requests(self):
+        """Неизвестная лента и неверный курсор — 400, группа — 404."""
+        for params, status in (
+            ({'feed': 'other'}, HTTPStatus.BAD_REQUEST),
+            ({'after': 'abc'}, HTTPStatus.BAD_REQUEST),
+            ({'feed': 'group', 'slug': 'missing'}, HTTPStatus.NOT_FOUND),
+        ):
+            with self.subTest(params=params):
+                response = self.client.get(self.url, params)
+                self.assertEqual(response.status_code, status)
+
+    def test_waits_until_post_arrives(self):
+        """Опрос держит запрос и возвращается с пришедшим постом."""
+        feeds.latest_id('index')
+
+        def publish():
+            time.sleep(0.1)
+            Post.objects.create(author=self.author, text='Пришёл')
+            connection.close()
+
+        thread = threading.Thread(target=publish)
+        thread.start()
+        posts, cursor = feeds.wait_for_posts(
+            feeds.Feed('index'), self.first.pk, 10,
+            timeout=5, interval=0.02,
+        )
+        thread.join()
+        self.assertEqual([post.text for post in posts], ['Пришёл'])
+        self.assertEqual(cursor, posts[0].pk)
+
+    def test_busy_process_answers_at_once(self):
+        """Когда все места заняты, опрос не ждёт, а отдаёт курсор."""
+        with self.settings(LONG_POLL_MAX_WAITERS=1):
+            with feeds.wait_slot() as acquired:
+                self.assertTrue(acquired)
+                started = time.monotonic()
+                posts, cursor = feeds.wait_for_posts(
+                    feeds.Feed('index'), self.first.pk, 10, timeout=5,
+                )
+                self.assertLess(time.monotonic() - started, 1)
+            self.assertEqual((posts, cursor), ([], self.first.pk))
+            with feeds.wait_slot() as acquired:
+                self.assertTrue(acquired)
@@ -7,6 +7,7 @@ from django.urls import reverse
 import shutil
 import tempfile
 from django.conf import settings
+from jobs.models import Job
 
 
 User = get_user_model()
@@ -81,7 +82,13 @@ class PostFormTests(TestCase):
         )
         self.assertEqual(post.text, form_data['text'])
         self.assertEqual(post.author, PostFormTests.user)
-        self.assertEqual(post.image, 'posts/small.gif')
+        self.assertRegex(
+            post.image.name, r'^posts/([0-9a-f]{2}/){2}[0-9a-f]{64}\.gif$'
+        )
+        self.assertTrue(Job.objects.filter(
+            name='posts.tasks.make_thumbnails',
+            payload__contains=f'"args": [{post.pk}]'
+        ).exists())
 
     def test_edit_post(self):
         """Валидная форма редактирует запись в Post."""
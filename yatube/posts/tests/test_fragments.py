@@ -0,0 +1,110 @@
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from ..archive import archive_batch
+from ..models import Follow, Group, Post, User
+
+
+class PostCardsTests(TestCase):
+    """Пачки карточек постов для бесконечной ленты."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        now = timezone.now()
+        for index in range(15):
+            post = Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {index}'
+            )
+            # Две пары постов с одинаковой датой проверяют id в курсоре.
+            Post.objects.filter(pk=post.pk).update(
+                pub_date=now - timedelta(days=400 + index // 2)
+                if index < 5 else now - timedelta(minutes=index // 2)
+            )
+        archive_batch(now - timedelta(days=365), batch_size=100)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def scroll(self, url):
+        """Все карточки ленты, пачка за пачкой."""
+        texts, cursor, requests = [], None, 0
+        while True:
+            response = self.client.get(
+                url, {'before': cursor} if cursor else {}
+            )
+            self.assertEqual(response.status_code, HTTPStatus.OK)
+            self.assertNotContains(response, '<header>')
+            requests += 1
+            texts.extend(post.text for post in response.context['posts'])
+            cursor = response.get('X-Next-Cursor')
+            if cursor is None:
+                return texts, requests
+
+    def expected(self, archived=True):
+        posts = Post.objects.order_by('-pub_date', '-pk')
+        texts = [post.text for post in posts]
+        if archived:
+            texts += [
+                post.text for post in
+                self.author.archived_posts.order_by('-pub_date', '-pk')
+            ]
+        return texts
+
+    def test_feeds_scroll_without_gaps(self):
+        """Лента листается до конца без пропусков и повторов."""
+        for url, archived in (
+            (reverse('posts:index_cards'), False),
+            (reverse('posts:group_cards', args=('group',)), True),
+            (reverse('posts:profile_cards', args=('leo',)), True),
+            (reverse('posts:follow_cards'), False),
+        ):
+            with self.subTest(url=url):
+                texts, requests = self.scroll(url)
+                self.assertEqual(texts, self.expected(archived))
+                self.assertEqual(requests, 2 if archived else 1)
+
+    def test_cards_reuse_post_template(self):
+        """Карточки рендерятся тем же шаблоном, что и лента подписок."""
+        response = self.client.get(reverse('posts:index_cards'))
+        self.assertTemplateUsed(response, 'includes/post_list.html')
+        self.assertTemplateNotUsed(response, 'base.html')
+
+    def test_like_returns_to_feed_page(self):
+        """Форма лайка во фрагменте ведёт обратно на страницу ленты."""
+        for url, page in (
+            (reverse('posts:index_cards'), reverse('posts:index')),
+            (
+                reverse('posts:group_cards', args=('group',)),
+                reverse('posts:group_list', args=('group',)),
+            ),
+            (reverse('posts:follow_cards'), reverse('posts:follow_index')),
+        ):
+            with self.subTest(url=url):
+                content = self.client.get(url).content.decode()
+                self.assertNotIn(f'name="next" value="{url}"', content)
+                self.assertIn(f'name="next" value="{page}"', content)
+
+    def test_bad_cursor(self):
+        """Испорченный курсор — 400."""
+        response = self.client.get(
+            reverse('posts:index_cards'), {'before': 'abc-1'}
+        )
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_follow_cards_need_login(self):
+        """Лента подписок — только для вошедших."""
+        self.client.logout()
+        response = self.client.get(reverse('posts:follow_cards'))
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
@@ -0,0 +1,121 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import likes
+from ..archive import archive_batch
+from ..models import ArchivedPost, Group, Like, LikeCounter, Post, User
+
+
+@override_settings(LIKE_COUNTER_SHARDS=4)
+class LikeTests(TestCase):
+    """Лайки с разделённым счётчиком."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.readers = [
+            User.objects.create_user(username=f'reader{index}')
+            for index in range(10)
+        ]
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.readers[0])
+        self.like_url = reverse('posts:post_like', args=(self.post.pk,))
+        self.unlike_url = reverse('posts:post_unlike', args=(self.post.pk,))
+
+    def test_toggles_are_idempotent(self):
+        """Повторный лайк и повторная отмена ничего не меняют."""
+        self.client.post(self.like_url)
+        self.client.post(self.like_url)
+        self.assertEqual(Like.objects.count(), 1)
+        self.assertEqual(likes.totals([self.post.pk]), {self.post.pk: 1})
+        self.client.post(self.unlike_url)
+        self.client.post(self.unlike_url)
+        self.assertFalse(Like.objects.exists())
+        self.assertEqual(likes.totals([self.post.pk]), {self.post.pk: 0})
+
+    def test_counter_is_spread_over_shards(self):
+        """Лайки расходятся по частям счётчика, сумма точная."""
+        for reader in self.readers:
+            likes.like(reader, self.post)
+        self.assertLessEqual(LikeCounter.objects.count(), 4)
+        self.assertGreater(LikeCounter.objects.count(), 1)
+        self.assertEqual(likes.totals([self.post.pk]), {self.post.pk: 10})
+
+    def test_only_post_allowed(self):
+        """GET не ставит лайк, аноним уходит на вход."""
+        response = self.client.get(self.like_url)
+        self.assertEqual(response.status_code, HTTPStatus.METHOD_NOT_ALLOWED)
+        self.client.logout()
+        response = self.client.post(self.like_url)
+        self.assertEqual(response.status_code, HTTPStatus.FOUND)
+        self.assertFalse(Like.objects.exists())
+
+    def test_redirects_back_only_to_own_site(self):
+        """Возврат на страницу списка, но не на чужой сайт."""
+        index = reverse('posts:index')
+        response = self.client.post(self.like_url, {'next': index})
+        self.assertRedirects(response, index)
+        response = self.client.post(
+            self.unlike_url, {'next': 'https://example.com/'}
+        )
+        self.assertRedirects(
+            response,
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+
+    def test_page_flags_in_constant_queries(self):
+        """Флаги «мне нравится» для страницы — одним запросом."""
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {index}')
+            for index in range(5)
+        ]
+        likes.like(self.readers[0], posts[1])
+        likes.like(self.readers[1], posts[1])
+        with self.assertNumQueries(2):
+            annotated = likes.annotate(posts, self.readers[0])
+        by_pk = {post.pk: post for post in annotated}
+        self.assertTrue(by_pk[posts[1].pk].liked)
+        self.assertEqual(by_pk[posts[1].pk].like_count, 2)
+        self.assertFalse(by_pk[posts[0].pk].liked)
+        self.assertEqual(by_pk[posts[0].pk].like_count, 0)
+
+    def test_list_pages_show_likes(self):
+        """Списки и страница поста показывают лайки и кнопку."""
+        likes.like(self.readers[0], self.post)
+        pages = (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=(self.group.slug,)),
+            reverse('posts:profile', args=(self.author.username,)),
+            reverse('posts:post_detail', args=(self.post.pk,)),
+        )
+        for url in pages:
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertContains(response, 'Нравится: 1')
+                self.assertContains(response, self.unlike_url)
+
+    def test_archived_post_keeps_like_count(self):
+        """В архив переносится итог счётчика."""
+        likes.like(self.readers[0], self.post)
+        likes.like(self.readers[1], self.post)
+        archive_batch(
+            older_than=self.post.pub_date.replace(year=3000), batch_size=10
+        )
+        self.assertEqual(ArchivedPost.objects.get().like_count, 2)
+        self.assertFalse(LikeCounter.objects.exists())
+        response = self.client.get(
+            reverse('posts:post_detail', args=(self.post.pk,))
+        )
+        self.assertContains(response, 'Нравится: 2')
+        self.assertNotContains(response, self.like_url)
@@ -0,0 +1,144 @@
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from sorl.thumbnail import get_thumbnail
+
+from core.models import StoredFile
+from ..cleanup import purge_if_orphaned, walk_sorted
+from ..models import ArchivedPost, Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def png(color):
+    buffer = BytesIO()
+    Image.new('RGB', (40, 40), color).save(buffer, 'png')
+    return SimpleUploadedFile('image.png', buffer.getvalue(), 'image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaGarbageCollectionTests(TestCase):
+    """Удаление картинок, на которые не ссылаются посты."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(self.path('posts'), True)
+        self.kept = Post.objects.create(
+            author=self.user, text='Пост', image=png('red')
+        )
+        self.archived = ArchivedPost.objects.create(
+            id=1000, author=self.user, text='Архив', pub_date=timezone.now()
+        )
+        self.archived.image.save('image.png', png('green'))
+        cleared = Post.objects.create(
+            author=self.user, text='Без картинки', image=png('blue')
+        )
+        self.orphan = cleared.image.name
+        self.thumbnail = get_thumbnail(cleared.image, '20x20').name
+        # Файл без ссылок, как после сбоя между записью файла и поста.
+        Post.objects.filter(pk=cleared.pk).update(image=None)
+        StoredFile.objects.filter(name=self.orphan).delete()
+
+    def path(self, name):
+        return os.path.join(TEMP_MEDIA_ROOT, name)
+
+    def collect(self, *args):
+        out = StringIO()
+        call_command('collect_media_garbage', *args, stdout=out)
+        return out.getvalue()
+
+    def test_walk_matches_string_order(self):
+        """Обход диска идёт в порядке сортировки полных имён."""
+        open(self.path('posts/ab.png'), 'wb').close()
+        names = [name for name, _, _ in walk_sorted(TEMP_MEDIA_ROOT, 'posts')]
+        self.assertEqual(names, sorted(names))
+        self.assertIn('posts/ab.png', names)
+
+    def test_dry_run_only_reports(self):
+        """Пробный запуск считает байты и ничего не удаляет."""
+        output = self.collect('--dry-run', '--grace-hours=0')
+        self.assertIn('Будет удалено файлов: 1', output)
+        size = (
+            os.path.getsize(self.path(self.orphan))
+            + os.path.getsize(self.path(self.thumbnail))
+        )
+        self.assertIn(f'({size} байт)', output)
+        self.assertTrue(os.path.exists(self.path(self.orphan)))
+
+    def test_orphans_and_thumbnails_removed(self):
+        """Сирота и её превью удаляются, используемые файлы остаются."""
+        self.collect('--grace-hours=0')
+        self.assertFalse(os.path.exists(self.path(self.orphan)))
+        self.assertFalse(os.path.exists(self.path(self.thumbnail)))
+        self.assertFalse(StoredFile.objects.filter(name=self.orphan).exists())
+        self.assertTrue(os.path.exists(self.path(self.kept.image.name)))
+        self.assertTrue(os.path.exists(self.path(self.archived.image.name)))
+
+    def test_file_referenced_during_scan_is_kept(self):
+        """Файл, который дедупликация успела прикрепить, не удаляется."""
+        content_storage = Post._meta.get_field('image').storage
+        started = time.time() - 1
+        os.utime(self.path(self.orphan), (started - 60, started - 60))
+        content_storage.reference(self.orphan)
+        self.assertFalse(
+            purge_if_orphaned(content_storage, self.orphan, started)
+        )
+        Post.objects.create(author=self.user, text='Новый', image=self.orphan)
+        self.assertFalse(purge_if_orphaned(content_storage, self.orphan))
+        self.assertTrue(os.path.exists(self.path(self.orphan)))
+
+    def test_stale_reference_count_does_not_keep_file(self):
+        """Пост, удалённый через queryset, не держит картинку навсегда."""
+        deleted = Post.objects.create(
+            author=self.user, text='Удалённый', image=png('white')
+        )
+        name = deleted.image.name
+        Post.objects.filter(pk=deleted.pk).delete()
+        self.assertEqual(StoredFile.objects.get(name=name).references, 1)
+        dry_run = self.collect('--dry-run', '--grace-hours=0')
+        self.assertIn('Будет удалено файлов: 2', dry_run)
+        self.assertIn('Удалено файлов: 2', self.collect('--grace-hours=0'))
+        self.assertFalse(os.path.exists(self.path(name)))
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+
+    def test_recent_files_are_kept(self):
+        """Свежие файлы не трогаются: их пост мог ещё не сохраниться."""
+        self.collect()
+        self.assertTrue(os.path.exists(self.path(self.orphan)))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ReplacedImageTests(TransactionTestCase):
+    """Снятие ссылки на заменённую картинку после коммита."""
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_replaced_image_is_released(self):
+        """Убранная из поста картинка удаляется с последней ссылкой."""
+        user = User.objects.create_user(username='leo')
+        post = Post.objects.create(author=user, text='Пост', image=png('red'))
+        name = post.image.name
+        post.image = None
+        post.save()
+        self.assertFalse(StoredFile.objects.filter(name=name).exists())
+        self.assertFalse(os.path.exists(os.path.join(TEMP_MEDIA_ROOT, name)))
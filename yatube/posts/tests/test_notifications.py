@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from jobs.models import Job
+from .. import notifications
+from ..models import Follow, Notification, Post, User
+from .test_deletion import run_jobs
+
+
+class NotificationTests(TestCase):
+    """Уведомления подписчикам о новых постах."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.followers = [
+            User.objects.create_user(username=f'reader{index}')
+            for index in range(7)
+        ]
+        Follow.objects.bulk_create(
+            Follow(user=user, author=cls.author) for user in cls.followers
+        )
+        cls.stranger = User.objects.create_user(username='stranger')
+
+    def setUp(self):
+        cache.clear()
+        self.reader = self.followers[0]
+        self.client.force_login(self.reader)
+
+    def test_new_post_is_fanned_out_in_background(self):
+        """Новый пост ставит задачу, она рассылает всем подписчикам."""
+        self.client.force_login(self.author)
+        self.client.post(reverse('posts:post_create'), {'text': 'Новый'})
+        post = Post.objects.get(text='Новый')
+        self.assertFalse(Notification.objects.exists())
+        self.assertTrue(Job.objects.filter(
+            name='posts.notifications.fan_out'
+        ).exists())
+        run_jobs()
+        self.assertEqual(
+            set(Notification.objects.values_list('user_id', flat=True)),
+            {user.pk for user in self.followers},
+        )
+        self.assertTrue(all(
+            item.post_id == post.pk for item in Notification.objects.all()
+        ))
+
+    def test_fan_out_is_batched_and_idempotent(self):
+        """Вставка пачками, повтор задачи не создаёт дублей."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        with self.assertNumQueries(6):
+            # пост, подписчики, три пачки по 3, очистка старых
+            self.assertEqual(notifications.fan_out(post.pk, batch_size=3), 7)
+        notifications.fan_out(post.pk, batch_size=3)
+        self.assertEqual(Notification.objects.count(), 7)
+
+    def test_unread_count_is_one_query(self):
+        """Счётчик непрочитанных — один запрос, виден в шапке."""
+        for index in range(3):
+            notifications.fan_out(
+                Post.objects.create(author=self.author, text=str(index)).pk
+            )
+        with self.assertNumQueries(1):
+            self.assertEqual(notifications.unread_count(self.reader), 3)
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, 'Уведомления (3)')
+
+    def test_inbox_marks_shown_as_read(self):
+        """Открытые уведомления становятся прочитанными."""
+        post = Post.objects.create(author=self.author, text='Свежий пост')
+        notifications.fan_out(post.pk)
+        response = self.client.get(reverse('posts:notification_list'))
+        self.assertContains(response, 'Свежий пост')
+        self.assertContains(response, 'Новое:')
+        self.assertEqual(notifications.unread_count(self.reader), 0)
+        response = self.client.get(reverse('posts:notification_list'))
+        self.assertNotContains(response, 'Новое:')
+        self.client.force_login(self.stranger)
+        response = self.client.get(reverse('posts:notification_list'))
+        self.assertNotContains(response, 'Свежий пост')
+
+    def test_old_notifications_are_pruned(self):
+        """Уведомления старше срока хранения удаляются."""
+        old = Post.objects.create(author=self.author, text='Старый')
+        notifications.fan_out(old.pk)
+        Notification.objects.update(
+            created=timezone.now() - timedelta(days=31)
+        )
+        with self.settings(NOTIFICATIONS_KEEP_DAYS=30):
+            notifications.fan_out(
+                Post.objects.create(author=self.author, text='Новый').pk
+            )
+        self.assertFalse(Notification.objects.filter(post=old).exists())
+        self.assertEqual(Notification.objects.count(), 7)
@@ -0,0 +1,95 @@
+from http import HTTPStatus
+
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+
+from core import orm_cache
+from ..deletion import mark_user_deleted
+from ..models import Group, Post, User
+
+
+class ReadThroughCacheTests(TestCase):
+    """Кеш групп и пользователей с инвалидацией сигналами."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Post.objects.create(author=cls.author, group=cls.group, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_second_lookup_is_served_from_cache(self):
+        """Повторный поиск по slug и username не ходит в базу."""
+        orm_cache.get(Group, slug='group')
+        orm_cache.get(User, username='leo')
+        with self.assertNumQueries(0):
+            self.assertEqual(orm_cache.get(Group, slug='group'), self.group)
+            self.assertEqual(orm_cache.get(User, username='leo'), self.author)
+
+    def test_save_invalidates_cache(self):
+        """Изменение группы сразу видно на её странице."""
+        url = reverse('posts:group_list', args=('group',))
+        self.client.get(url)
+        group = Group.objects.get(pk=self.group.pk)
+        group.title = 'Новое название'
+        group.save()
+        self.assertContains(self.client.get(url), 'Новое название')
+
+    def test_renamed_slug(self):
+        """Старый slug перестаёт находиться, новый находится."""
+        orm_cache.get(Group, slug='group')
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed'
+        group.save()
+        self.assertIsNone(orm_cache.get(Group, slug='group'))
+        self.assertEqual(orm_cache.get(Group, slug='renamed'), group)
+
+    def test_missing_row_is_cached_until_created(self):
+        """Отсутствие кешируется, но новая запись находится сразу."""
+        url = reverse('posts:profile', args=('sofia',))
+        self.assertEqual(
+            self.client.get(url).status_code, HTTPStatus.NOT_FOUND
+        )
+        with self.assertNumQueries(0):
+            self.assertIsNone(orm_cache.get(User, username='sofia'))
+        User.objects.create_user(username='sofia')
+        self.assertEqual(self.client.get(url).status_code, HTTPStatus.OK)
+
+    def test_password_hash_is_not_cached(self):
+        """В кеше только нужные столбцы, без хеша пароля."""
+        orm_cache.get(User, username='leo')
+        generation = cache.get(orm_cache.generation_key(User), 0)
+        cached = cache.get(f'orm:auth.user:username:leo:{generation}')
+        self.assertIn('password', cached.get_deferred_fields())
+        self.assertNotIn('username', cached.get_deferred_fields())
+
+    def test_login_keeps_cache(self):
+        """Вход (запись last_login) не сбрасывает кеш пользователей."""
+        self.author.set_password('secret')
+        self.author.save()
+        orm_cache.get(User, username='leo')
+        self.client.login(username='leo', password='secret')
+        with self.assertNumQueries(0):
+            orm_cache.get(User, username='leo')
+
+    def test_update_paths_invalidate(self):
+        """Закрытие аккаунта через update() тоже сбрасывает кеш."""
+        user = User.objects.create_user(username='sofia')
+        self.assertTrue(orm_cache.get(User, username='sofia').is_active)
+        mark_user_deleted(user)
+        self.assertFalse(orm_cache.get(User, username='sofia').is_active)
+
+    def test_identity_map_returns_same_row_within_request(self):
+        """В пределах запроса строка читается один раз по любому полю."""
+        orm_cache.local.identity_map = orm_cache.IdentityMap()
+        self.addCleanup(setattr, orm_cache.local, 'identity_map', None)
+        author = orm_cache.get(User, username='leo')
+        cache.clear()
+        with self.assertNumQueries(0):
+            self.assertIs(orm_cache.get(User, pk=self.author.pk), author)
+            self.assertIs(orm_cache.get(User, username='leo'), author)
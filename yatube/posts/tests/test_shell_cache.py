@@ -0,0 +1,109 @@
+from django.core.cache import cache
+from django.db import connection
+from django.http import HttpResponse
+from django.middleware.csrf import get_token
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core import holes
+from core.cache import cache_shell, shell_key
+from .. import likes
+from ..models import Post, User
+
+
+class ShellCacheTests(TestCase):
+    """Общая оболочка главной с дырками для каждого пользователя."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.leo = User.objects.create_user(username='leo')
+        cls.sofia = User.objects.create_user(username='sofia')
+        cls.post = Post.objects.create(author=cls.leo, text='Общий пост')
+        likes.like(cls.sofia, cls.post)
+
+    def setUp(self):
+        cache.clear()
+        self.url = reverse('posts:index')
+
+    def get(self, user=None):
+        if user is None:
+            self.client.logout()
+        else:
+            self.client.force_login(user)
+        return self.client.get(self.url)
+
+    def test_users_share_shell_with_own_holes(self):
+        """Оболочка одна на всех, шапка и лайки — свои."""
+        first = self.get(self.leo)
+        self.assertIn('page_obj', first.context)
+        self.assertContains(first, 'Пользователь: leo')
+        self.assertContains(
+            first, reverse('posts:post_like', args=(self.post.pk,))
+        )
+        second = self.get(self.sofia)
+        self.assertNotIn('page_obj', second.context)
+        self.assertContains(second, 'Пользователь: sofia')
+        self.assertNotContains(second, 'Пользователь: leo')
+        self.assertContains(
+            second, reverse('posts:post_unlike', args=(self.post.pk,))
+        )
+        self.assertContains(second, 'Нравится: 1')
+        anonymous = self.get()
+        self.assertContains(anonymous, 'Войти')
+        self.assertNotContains(anonymous, 'csrfmiddlewaretoken')
+        self.assertIn('Cookie', anonymous['Vary'])
+
+    def test_tabs_follow_viewer_not_shell(self):
+        """Вкладки ленты видит только вошедший, кто бы ни прогрел кеш."""
+        follow_url = reverse('posts:follow_index')
+        for first, second in ((None, self.leo), (self.leo, None)):
+            with self.subTest(first=first, second=second):
+                cache.clear()
+                self.get(first)
+                response = self.get(second)
+                if second is None:
+                    self.assertNotContains(response, follow_url)
+                else:
+                    self.assertContains(response, follow_url)
+
+    def test_hit_renders_only_holes(self):
+        """Попадание не читает посты, только данные дырок."""
+        self.get(self.leo)
+        with CaptureQueriesContext(connection) as context:
+            self.get(self.sofia)
+        tables = ' '.join(query['sql'] for query in context.captured_queries)
+        self.assertNotIn('FROM "posts_post"', tables)
+        self.assertIn('FROM "posts_like"', tables)
+
+    def test_markers_do_not_leak(self):
+        """В ответ не попадают метки дырок, даже из текста поста."""
+        Post.objects.create(
+            author=self.leo, text=holes.marker('header', {})
+        )
+        self.get(self.leo)
+        response = self.get(self.sofia)
+        self.assertNotContains(response, '<!--hole:')
+        self.assertEqual(response.content.decode().count('<header>'), 1)
+
+    def test_like_forms_are_per_user(self):
+        """Кнопки лайков и CSRF-токен в них — того, кто смотрит."""
+        self.get(self.sofia)
+        token = self.client.cookies['csrftoken'].value
+        self.client.cookies.pop('csrftoken')
+        response = self.get(self.leo)
+        self.assertNotContains(
+            response, reverse('posts:post_unlike', args=(self.post.pk,))
+        )
+        self.assertNotContains(response, token)
+        self.assertContains(response, 'csrfmiddlewaretoken')
+
+    def test_token_outside_hole_is_not_cached(self):
+        """Оболочку с CSRF-токеном вне дырки нельзя отдавать другим."""
+        @cache_shell(20, key_prefix='personal')
+        def view(request):
+            return HttpResponse(get_token(request))
+
+        request = RequestFactory().get('/personal/')
+        self.assertEqual(view(request).status_code, 200)
+        self.assertIsNone(cache.get(shell_key(request, 'personal')))
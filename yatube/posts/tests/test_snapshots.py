@@ -0,0 +1,165 @@
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TransactionTestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core.wsgi import SnapshotApp
+from jobs.models import Job
+from jobs.queue import run
+from .. import likes
+from ..deletion import mark_posts_deleted
+from ..models import Group, Post, User
+from ..snapshots import refresh, snapshot_path
+from ..warmup import warmup_environ
+
+SNAPSHOTS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(SNAPSHOTS_DIR=SNAPSHOTS_DIR, JOBS_EAGER=True)
+class SnapshotTests(TransactionTestCase):
+    """HTML-снимки публичных страниц.
+
+    Снимки перерисовываются после коммита, поэтому без общей
+    транзакции; задачи выполняются сразу.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(SNAPSHOTS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        shutil.rmtree(SNAPSHOTS_DIR, ignore_errors=True)
+        self.author = User.objects.create_user(username='leo')
+        self.cats = Group.objects.create(
+            title='Кошки', slug='cats', description='Описание'
+        )
+        self.dogs = Group.objects.create(
+            title='Собаки', slug='dogs', description='Описание'
+        )
+
+    def read(self, url):
+        with open(snapshot_path(url), encoding='utf-8') as snapshot:
+            return snapshot.read()
+
+    def test_new_post_regenerates_affected_pages(self):
+        """Новый пост попадает в снимки главной, группы и профиля."""
+        Post.objects.create(author=self.author, group=self.cats, text='Мяу')
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=('cats',)),
+            reverse('posts:profile', args=('leo',)),
+        ):
+            with self.subTest(url=url):
+                self.assertIn('Мяу', self.read(url))
+                self.assertNotIn('Выйти', self.read(url))
+                self.assertTrue(os.path.isfile(snapshot_path(url) + '.gz'))
+        self.assertFalse(os.path.exists(
+            snapshot_path(reverse('posts:group_list', args=('dogs',)))
+        ))
+
+    def test_likes_refresh_snapshots_once_per_window(self):
+        """Лайки обновляют счётчик в снимке одной отложенной задачей."""
+        post = Post.objects.create(author=self.author, text='Лайкни')
+        reader = User.objects.create_user(username='reader')
+        with self.settings(JOBS_EAGER=False):
+            likes.like(self.author, post)
+            likes.like(reader, post)
+        job = Job.objects.get(name='posts.snapshots.refresh')
+        self.assertGreater(job.run_at, timezone.now())
+        self.assertIn('Нравится: 0', self.read(reverse('posts:index')))
+        run(job)
+        self.assertIn('Нравится: 2', self.read(reverse('posts:index')))
+
+    def test_snapshot_bypasses_page_cache(self):
+        """Снимок рисуется мимо cache_page и не бывает устаревшим."""
+        self.client.get(reverse('posts:index'))
+        Post.objects.create(author=self.author, text='Свежий')
+        self.assertIn('Свежий', self.read(reverse('posts:index')))
+
+    def test_moved_and_deleted_posts(self):
+        """Смена группы обновляет обе группы, удаление — все страницы."""
+        post = Post.objects.create(
+            author=self.author, group=self.cats, text='Переезд'
+        )
+        post.group = self.dogs
+        post.save()
+        self.assertNotIn(
+            'Переезд', self.read(reverse('posts:group_list', args=('cats',)))
+        )
+        self.assertIn(
+            'Переезд', self.read(reverse('posts:group_list', args=('dogs',)))
+        )
+        mark_posts_deleted(Post.objects.filter(pk=post.pk))
+        self.assertNotIn('Переезд', self.read(reverse('posts:index')))
+        self.assertNotIn(
+            'Переезд', self.read(reverse('posts:group_list', args=('dogs',)))
+        )
+
+    def test_missing_page_snapshot_is_removed(self):
+        """Снимок пропавшей группы удаляется."""
+        Post.objects.create(author=self.author, group=self.cats, text='Мяу')
+        url = reverse('posts:group_list', args=('cats',))
+        self.assertTrue(os.path.isfile(snapshot_path(url)))
+        self.cats.delete()
+        self.assertFalse(os.path.exists(snapshot_path(url)))
+
+    def test_renamed_group_and_user(self):
+        """Старый адрес после смены слага или имени теряет снимок."""
+        Post.objects.create(author=self.author, group=self.cats, text='Мяу')
+        old_group = reverse('posts:group_list', args=('cats',))
+        old_profile = reverse('posts:profile', args=('leo',))
+        self.cats.slug = 'kittens'
+        self.cats.save()
+        self.author.username = 'leon'
+        self.author.save()
+        self.assertFalse(os.path.exists(snapshot_path(old_group)))
+        self.assertFalse(os.path.exists(snapshot_path(old_profile)))
+        self.assertIn('Мяу', self.read(
+            reverse('posts:group_list', args=('kittens',))
+        ))
+        self.assertIn('Мяу', self.read(
+            reverse('posts:profile', args=('leon',))
+        ))
+
+    def test_dot_username_cannot_replace_index(self):
+        """Профиль «..» не пишет снимок поверх главной."""
+        dots = User.objects.create_user(username='..')
+        Post.objects.create(author=self.author, text='Главная')
+        Post.objects.create(author=dots, text='Точки')
+        url = reverse('posts:profile', args=('..',))
+        self.assertIsNone(snapshot_path(url))
+        refresh([url])
+        index = self.read(reverse('posts:index'))
+        self.assertIn('Главная', index)
+        self.assertIn('Последние обновления', index)
+
+    def test_cyrillic_profile_is_served(self):
+        """Снимок профиля с кириллицей находится по пути из запроса."""
+        author = User.objects.create_user(username='лев')
+        Post.objects.create(author=author, text='Рык')
+        url = reverse('posts:profile', args=('лев',))
+        self.assertIn('Рык', self.read(url))
+        found = SnapshotApp(None).find(warmup_environ(url, 'testserver'))
+        self.assertEqual(found.path, snapshot_path(url))
+
+    def test_build_command(self):
+        """Команда рисует главную, группы и профили с постами."""
+        Post.objects.create(author=self.author, group=self.dogs, text='Гав')
+        shutil.rmtree(SNAPSHOTS_DIR)
+        call_command('build_snapshots', stdout=open(os.devnull, 'w'))
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group_list', args=('cats',)),
+            reverse('posts:group_list', args=('dogs',)),
+            reverse('posts:profile', args=('leo',)),
+        ):
+            with self.subTest(url=url):
+                self.assertTrue(os.path.isfile(snapshot_path(url)))
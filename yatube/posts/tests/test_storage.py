@@ -0,0 +1,106 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from core.models import StoredFile
+from core.storage import content_storage
+from ..deletion import mark_posts_deleted, purge_deleted_posts
+from ..models import Post, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+DIGEST = hashlib.sha256(SMALL_GIF).hexdigest()
+CONTENT_NAME = f'posts/{DIGEST[:2]}/{DIGEST[2:4]}/{DIGEST}.gif'
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    """Хранение картинок по хешу содержимого."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(os.path.join(TEMP_MEDIA_ROOT, 'posts'), True)
+
+    def create_post(self, name='small.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост',
+            image=SimpleUploadedFile(name, SMALL_GIF, 'image/gif'),
+        )
+
+    def test_file_is_named_by_content_and_sharded(self):
+        """Имя файла — хеш содержимого во вложенных каталогах."""
+        post = self.create_post()
+        self.assertEqual(post.image.name, CONTENT_NAME)
+        self.assertTrue(os.path.exists(
+            os.path.join(TEMP_MEDIA_ROOT, CONTENT_NAME)
+        ))
+
+    def test_duplicates_are_stored_once(self):
+        """Одинаковые загрузки хранятся одним файлом с числом ссылок."""
+        first = self.create_post('first.gif')
+        second = self.create_post('second.GIF')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(StoredFile.objects.get().references, 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(
+            os.path.join(TEMP_MEDIA_ROOT, CONTENT_NAME)
+        ))), 1)
+
+    def test_file_is_removed_with_last_reference(self):
+        """Файл удаляется только вместе с последней ссылкой."""
+        path = os.path.join(TEMP_MEDIA_ROOT, CONTENT_NAME)
+        first = self.create_post()
+        self.create_post()
+        mark_posts_deleted(Post.objects.filter(pk=first.pk))
+        purge_deleted_posts()
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(StoredFile.objects.get().references, 1)
+        mark_posts_deleted(Post.objects.all())
+        purge_deleted_posts()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_migrate_command_moves_flat_files(self):
+        """Команда переносит старые файлы и схлопывает дубликаты."""
+        content_storage._save('posts/old.gif', ContentFile(SMALL_GIF))
+        content_storage._save('posts/copy.gif', ContentFile(SMALL_GIF))
+        Post.objects.bulk_create([
+            Post(author=self.user, text='Старый', image='posts/old.gif'),
+            Post(author=self.user, text='Ещё', image='posts/old.gif'),
+            Post(author=self.user, text='Копия', image='posts/copy.gif'),
+            Post(author=self.user, text='Пропал', image='posts/lost.gif'),
+        ])
+        call_command(
+            'migrate_media_storage', stdout=StringIO(), stderr=StringIO()
+        )
+        self.assertEqual(
+            Post.objects.filter(image=CONTENT_NAME).count(), 3
+        )
+        self.assertEqual(StoredFile.objects.get().references, 3)
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(TEMP_MEDIA_ROOT, 'posts'))),
+            [DIGEST[:2]],
+        )
@@ -0,0 +1,174 @@
+import hashlib
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from datetime import timedelta
+from http import HTTPStatus
+
+from django.conf import settings
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .. import uploads
+from ..models import Post, Upload, User
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_PARTS_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+def png_chunk(kind, data=b''):
+    chunk = kind + data
+    return (
+        struct.pack('>I', len(data)) + chunk
+        + struct.pack('>I', zlib.crc32(chunk))
+    )
+
+
+def png_header(width, height):
+    """Заголовок PNG с указанным разрешением и без пикселей."""
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', ihdr) + png_chunk(b'IEND')
+
+
+@override_settings(
+    MEDIA_ROOT=TEMP_MEDIA_ROOT, UPLOAD_PARTS_DIR=TEMP_PARTS_DIR
+)
+class ChunkedUploadTests(TestCase):
+    """Загрузка картинки по частям с продолжением."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='leo')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_PARTS_DIR, ignore_errors=True)
+
+    def setUp(self):
+        shutil.rmtree(TEMP_PARTS_DIR, ignore_errors=True)
+        self.client = Client()
+        self.client.force_login(self.user)
+
+    def start(self, content, sha256=None):
+        response = self.client.post(reverse('posts:upload_create'), {
+            'filename': 'small.gif',
+            'size': len(content),
+            'sha256': sha256 or hashlib.sha256(content).hexdigest(),
+        })
+        self.assertEqual(response.status_code, HTTPStatus.CREATED)
+        return reverse('posts:upload_detail', args=(response.json()['id'],))
+
+    def put(self, url, content, start, size):
+        end = start + len(content) - 1
+        return self.client.put(
+            url, content, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{end}/{size}',
+        )
+
+    def complete(self, url):
+        return self.client.post(url + 'complete/', {'post_id': self.post.pk})
+
+    def test_upload_in_chunks_and_attach(self):
+        """Файл собирается из частей и становится картинкой поста."""
+        url = self.start(SMALL_GIF)
+        self.assertEqual(self.put(url, SMALL_GIF[:20], 0, 43).json(), {
+            'id': url.split('/')[-2], 'size': 43, 'received': 20,
+        })
+        self.put(url, SMALL_GIF[20:], 20, 43)
+        response = self.complete(url)
+        self.assertEqual(response.status_code, HTTPStatus.OK)
+        self.post.refresh_from_db()
+        with self.post.image.open('rb') as image:
+            self.assertEqual(image.read(), SMALL_GIF)
+        self.assertFalse(Upload.objects.exists())
+
+    def test_resume_reports_received_offset(self):
+        """После обрыва клиент узнаёт, с какого байта продолжать."""
+        url = self.start(SMALL_GIF)
+        self.put(url, SMALL_GIF[:20], 0, 43)
+        self.assertEqual(self.client.get(url).json()['received'], 20)
+        response = self.put(url, SMALL_GIF[10:], 10, 43)
+        self.assertEqual(response.status_code, HTTPStatus.CONFLICT)
+        self.assertEqual(response.json()['received'], 20)
+
+    def test_checksum_mismatch_is_rejected(self):
+        """Файл с неверной контрольной суммой не прикрепляется."""
+        url = self.start(SMALL_GIF, sha256='0' * 64)
+        self.put(url, SMALL_GIF, 0, 43)
+        response = self.complete(url)
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.post.refresh_from_db()
+        self.assertFalse(self.post.image)
+
+    def test_incomplete_upload_cannot_be_attached(self):
+        """Недокачанный файл прикрепить нельзя."""
+        url = self.start(SMALL_GIF)
+        self.put(url, SMALL_GIF[:20], 0, 43)
+        self.assertEqual(
+            self.complete(url).status_code, HTTPStatus.BAD_REQUEST
+        )
+
+    def test_decompression_bomb_rejected_by_header(self):
+        """Огромное разрешение отклоняется по первой части файла."""
+        header = png_header(100000, 100000)
+        content = header + b'\x00' * 100
+        url = self.start(content)
+        response = self.put(url, header, 0, len(content))
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        self.assertFalse(Upload.objects.exists())
+        self.assertFalse(os.listdir(TEMP_PARTS_DIR))
+
+    def test_foreign_upload_is_not_found(self):
+        """Чужую загрузку продолжить нельзя."""
+        url = self.start(SMALL_GIF)
+        other = Client()
+        other.force_login(User.objects.create_user(username='sofia'))
+        self.assertEqual(other.get(url).status_code, HTTPStatus.NOT_FOUND)
+
+    def test_parts_are_not_under_media_root(self):
+        """Недокачанный файл не лежит в раздаваемом MEDIA_ROOT."""
+        url = self.start(SMALL_GIF)
+        self.put(url, SMALL_GIF[:20], 0, 43)
+        self.assertEqual(len(os.listdir(TEMP_PARTS_DIR)), 1)
+        self.assertFalse(
+            os.path.exists(os.path.join(TEMP_MEDIA_ROOT, 'uploads'))
+        )
+
+    def test_bad_input_is_rejected(self):
+        """Не hex в sha256 и нечисловой post_id — ошибка 400, а не 500."""
+        response = self.client.post(reverse('posts:upload_create'), {
+            'filename': 'small.gif', 'size': 43, 'sha256': 'z' * 64,
+        })
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+        url = self.start(SMALL_GIF)
+        self.put(url, SMALL_GIF, 0, 43)
+        response = self.client.post(url + 'complete/', {'post_id': 'abc'})
+        self.assertEqual(response.status_code, HTTPStatus.BAD_REQUEST)
+
+    def test_abandoned_uploads_expire(self):
+        """Брошенные загрузки удаляются вместе с частями на диске."""
+        url = self.start(SMALL_GIF)
+        self.put(url, SMALL_GIF[:20], 0, 43)
+        fresh = self.start(SMALL_GIF)
+        Upload.objects.filter(pk=url.split('/')[-2]).update(
+            created=timezone.now() - timedelta(
+                hours=settings.UPLOAD_EXPIRE_HOURS + 1
+            )
+        )
+        self.assertEqual(uploads.expire(), 1)
+        self.assertEqual(str(Upload.objects.get().pk), fresh.split('/')[-2])
+        self.assertFalse(os.listdir(TEMP_PARTS_DIR))
@@ -0,0 +1,116 @@
+from unittest import mock
+
+from django.core.cache import cache
+from django.db import DatabaseError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .. import view_counts
+from ..archive import archive_batch
+from ..models import ArchivedPost, Post, User
+
+
+@override_settings(VIEW_COUNT_FLUSH_INTERVAL=3600, VIEW_COUNT_MAX_PENDING=100)
+class ViewCountTests(TestCase):
+    """Отложенная запись просмотров постов."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='leo')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        cls.other = Post.objects.create(author=cls.author, text='Другой')
+
+    def setUp(self):
+        cache.clear()
+        view_counts.reset()
+        self.addCleanup(view_counts.reset)
+        self.url = reverse('posts:post_detail', args=(self.post.pk,))
+
+    def stored(self, post):
+        return Post.objects.values_list('view_count', flat=True).get(
+            pk=post.pk
+        )
+
+    def test_views_are_buffered_and_shown(self):
+        """Просмотр не пишет в базу, но сразу виден на странице."""
+        self.client.get(self.url)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['view_count'], 2)
+        self.assertEqual(self.stored(self.post), 0)
+
+    def test_flush_writes_all_posts_in_one_update(self):
+        """Пачка просмотров разных постов уходит одним UPDATE."""
+        for post_id in (self.post.pk, self.post.pk, self.other.pk):
+            view_counts.record(post_id)
+        with self.assertNumQueries(1):
+            self.assertEqual(view_counts.flush(), 3)
+        self.assertEqual(self.stored(self.post), 2)
+        self.assertEqual(self.stored(self.other), 1)
+        self.post.refresh_from_db()
+        self.assertEqual(view_counts.count(self.post), 2)
+        with self.assertNumQueries(0):
+            self.assertEqual(view_counts.flush(), 0)
+
+    def test_flush_when_buffer_is_full(self):
+        """Переполненный буфер сбрасывается сразу."""
+        with self.settings(VIEW_COUNT_MAX_PENDING=3):
+            for _ in range(3):
+                view_counts.record(self.post.pk)
+        self.assertEqual(self.stored(self.post), 3)
+        self.assertEqual(view_counts.pending, {})
+
+    def test_flush_after_interval(self):
+        """По истечении интервала просмотры пишутся в базу."""
+        with self.settings(VIEW_COUNT_FLUSH_INTERVAL=0):
+            self.client.get(self.url)
+        self.assertEqual(self.stored(self.post), 1)
+
+    def test_failed_flush_keeps_views(self):
+        """Если UPDATE не удался, просмотры остаются в буфере."""
+        view_counts.record(self.post.pk)
+        with mock.patch.object(
+            Post.all_objects, 'filter', side_effect=DatabaseError
+        ):
+            with self.assertRaises(DatabaseError):
+                view_counts.flush()
+        self.assertEqual(view_counts.pending, {self.post.pk: 1})
+
+    def test_save_keeps_flushed_views(self):
+        """Сохранение поста не затирает просмотры, записанные после чтения."""
+        post = Post.objects.get(pk=self.post.pk)
+        view_counts.record(self.post.pk)
+        view_counts.flush()
+        post.text = 'Правка'
+        post.save()
+        self.assertEqual(self.stored(self.post), 1)
+
+    def test_idle_buffer_is_flushed_by_timer(self):
+        """Таймер сбрасывает буфер и без новых просмотров."""
+        view_counts.record(self.post.pk)
+        self.assertEqual(view_counts.flush_if_due(), 0)
+        with self.settings(VIEW_COUNT_FLUSH_INTERVAL=0):
+            self.assertEqual(view_counts.flush_if_due(), 1)
+        self.assertEqual(self.stored(self.post), 1)
+
+    def test_views_of_archived_post_go_to_archive(self):
+        """Просмотры поста, ушедшего в архив до сброса, не теряются."""
+        view_counts.record(self.post.pk)
+        view_counts.record(self.other.pk)
+        archive_batch(older_than=self.post.pub_date.replace(year=3000),
+                      batch_size=10)
+        view_counts.flush()
+        self.assertEqual(
+            ArchivedPost.objects.get(pk=self.post.pk).view_count, 1
+        )
+
+    def test_archived_post_keeps_count(self):
+        """Архив сохраняет просмотры и больше их не считает."""
+        view_counts.record(self.post.pk)
+        view_counts.flush()
+        Post.objects.exclude(pk=self.post.pk).delete()
+        archive_batch(older_than=self.post.pub_date.replace(year=3000),
+                      batch_size=10)
+        self.assertEqual(ArchivedPost.objects.get().view_count, 1)
+        response = self.client.get(self.url)
+        self.assertEqual(response.context['view_count'], 1)
+        self.assertEqual(view_counts.pending, {})
@@ -1,3 +1,4 @@
+import re
 from http import HTTPStatus
 
 from django.contrib.auth import get_user_model
@@ -10,12 +11,14 @@ import tempfile
 from django.conf import settings
 from django.core.cache import cache
 
-from ..models import Post, Group, Follow
+from core.testing import QueryBudgetMixin
+from ..models import Comment, Post, Group, Follow
 
 
 User = get_user_model()
 
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+csrf_re = re.compile(r'name="csrfmiddlewaretoken" value="[^"]*"')
 
 
 @override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
@@ -76,7 +79,9 @@ class PostPagesTests(TestCase):
         self.assertEqual(post_text, self.post.text)
         self.assertEqual(post_author, self.post.author)
         self.assertEqual(post_data, self.post.pub_date)
-        self.assertEqual(post_image, 'posts/small.gif')
+        self.assertRegex(
+            post_image.name, r'^posts/([0-9a-f]{2}/){2}[0-9a-f]{64}\.gif$'
+        )
 
     def test_post_create_show_correct_context(self):
         """Шаблон post_create сформирован с правильным контекстом."""
@@ -185,10 +190,15 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(reverse('posts:index'))
         self.post.delete()
         new_response = self.authorized_client.get(reverse('posts:index'))
-        self.assertEqual(response.content, new_response.content)
+        # CSRF-токен в кнопках лайков свой у каждого ответа.
+        self.assertEqual(
+            csrf_re.sub('', response.content.decode()),
+            csrf_re.sub('', new_response.content.decode()),
+        )
+        self.assertContains(new_response, self.post.text)
         cache.clear()
         last_response = self.authorized_client.get(reverse('posts:index'))
-        self.assertNotEqual(response.content, last_response.content)
+        self.assertNotContains(last_response, self.post.text)
 
     def test_user_can_unfollow(self):
         """Авторизованный пользователь может отписываться."""
@@ -219,3 +229,92 @@ class PostPagesTests(TestCase):
         response = self.authorized_client.get(reverse('posts:follow_index'))
         self.assertEqual(response.context['page_obj'][0], post)
         self.assertNotIn(self.post, response.context['page_obj'])
+
+
+class QueryBudgetTests(QueryBudgetMixin, TestCase):
+    """Число запросов страниц не растёт с числом постов,
+    комментариев и подписок."""
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(
+            username='author', first_name='Лев', last_name='Толстой'
+        )
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+
+    def new_users(self, prefix, count):
+        """Создаёт пользователей пачкой: у каждой строки свой автор,
+        чтобы N+1 по автору был заметен."""
+        start = User.objects.count()
+        User.objects.bulk_create(
+            User(username=f'{prefix}{start + index}')
+            for index in range(count)
+        )
+        return User.objects.filter(
+            username__startswith=prefix
+        ).order_by('-pk')[:count]
+
+    def grow_posts(self, size):
+        missing = size - Post.objects.count()
+        Post.objects.bulk_create(
+            Post(author=author, group=self.group, text='Ещё пост')
+            for author in self.new_users('writer', missing)
+        )
+
+    def grow_follows(self, size):
+        self.grow_posts(size)
+        Follow.objects.bulk_create(
+            Follow(user=self.reader, author=author)
+            for author in User.objects.exclude(pk=self.reader.pk).exclude(
+                following__user=self.reader
+            )[:size - Follow.objects.filter(user=self.reader).count()]
+        )
+
+    def grow_comments(self, size):
+        missing = size - self.post.comments.count()
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=author, text='Комментарий')
+            for author in self.new_users('commenter', missing)
+        )
+
+    def get(self, name, *args):
+        url = reverse(name, args=args)
+        return lambda: self.client.get(url)
+
+    def test_index(self):
+        self.assertConstantQueries(self.get('posts:index'), self.grow_posts)
+
+    def test_group_list(self):
+        self.assertConstantQueries(
+            self.get('posts:group_list', self.group.slug), self.grow_posts
+        )
+
+    def test_profile(self):
+        def grow(size):
+            Post.objects.bulk_create(
+                Post(author=self.author, group=self.group, text='Пост')
+                for _ in range(size - self.author.posts.count())
+            )
+
+        self.assertConstantQueries(
+            self.get('posts:profile', self.author.username), grow
+        )
+
+    def test_post_detail_comments(self):
+        self.assertConstantQueries(
+            self.get('posts:post_detail', self.post.pk), self.grow_comments
+        )
+
+    def test_follow_index(self):
+        self.assertConstantQueries(
+            self.get('posts:follow_index'), self.grow_follows
+        )
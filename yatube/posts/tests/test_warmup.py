@@ -0,0 +1,81 @@
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import Client, TransactionTestCase, override_settings
+from django.urls import reverse
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+from ..models import Group, Post, User
+from ..warmup import warmup_urls
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, WARMUP_HOST='localhost')
+class CacheWarmupTests(TransactionTestCase):
+    """Прогрев кеша страниц и превью.
+
+    Страницы рендерятся в потоках со своими соединениями с базой,
+    поэтому данные должны быть закоммичены.
+    """
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='leo')
+        quiet = User.objects.create_user(username='quiet')
+        self.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        Group.objects.create(title='Пустая', slug='empty', description='')
+        self.post = Post.objects.create(
+            author=self.author,
+            group=self.group,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile('small.gif', SMALL_GIF, 'image/gif'),
+        )
+        Post.objects.create(author=quiet, text='Единственный пост')
+        Post.objects.create(author=self.author, text='Второй пост')
+
+    def test_urls_start_with_index_and_skip_empty(self):
+        """Сначала главная, затем группы и авторы по числу постов."""
+        self.assertEqual(warmup_urls(2, 5, 1), [
+            reverse('posts:index'),
+            reverse('posts:index') + '?page=2',
+            reverse('posts:group_list', args=('group',)),
+            reverse('posts:profile', args=('leo',)),
+        ])
+
+    def test_command_fills_page_cache_and_thumbnails(self):
+        """После прогрева главная отдаётся из кеша, превью готовы."""
+        out = StringIO()
+        call_command('warm_cache', pages=1, workers=2, stdout=out)
+        self.assertIn(f'{reverse("posts:index")}: 200', out.getvalue())
+        self.assertIn('Прогрето: 5 из 5', out.getvalue())
+
+        image = ImageFile(
+            self.post.image.name, Post._meta.get_field('image').storage
+        )
+        self.assertIsNotNone(default.kvstore.get(image))
+
+        Post.objects.create(author=self.author, text='Пост после прогрева')
+        response = Client(HTTP_HOST='localhost').get(reverse('posts:index'))
+        self.assertNotContains(response, 'Пост после прогрева')
@@ -0,0 +1,141 @@
+import hashlib
+import os
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.utils import timezone
+from PIL import Image
+
+from .models import Upload
+
+BLOCK_SIZE = 64 * 1024
+# Размеры картинки лежат в заголовке, его хватает для проверки.
+HEADER_SIZE = 64 * 1024
+
+content_range_re = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+sha256_re = re.compile(r'^[0-9a-fA-F]{64}$')
+
+
+class UploadError(Exception):
+    pass
+
+
+class PartFile(File):
+    """Готовый файл загрузки: хранилище переместит его, а не скопирует."""
+
+    def temporary_file_path(self):
+        return self.file.name
+
+
+def part_path(upload):
+    # Не в MEDIA_ROOT: медиа раздаётся всем, а недокачанный файл
+    # не проверен.
+    return os.path.join(settings.UPLOAD_PARTS_DIR, f'{upload.pk}.part')
+
+
+def parse_content_range(header, size):
+    """Возвращает (start, length) из заголовка Content-Range."""
+    match = content_range_re.match(header or '')
+    if match is None:
+        raise UploadError('Нужен заголовок Content-Range: bytes a-b/size')
+    start, end, total = map(int, match.groups())
+    if total != size or end < start or end >= size:
+        raise UploadError('Content-Range не совпадает с размером файла')
+    return start, end - start + 1
+
+
+def check_image_header(path, header_complete):
+    """Отклоняет не картинки и декомпрессионные бомбы по заголовку,
+    не распаковывая сами пиксели.
+
+    Пока заголовок получен не целиком, нераспознанный файл
+    ещё не считается ошибкой.
+    """
+    try:
+        with Image.open(path) as image:
+            width, height = image.size
+    except Image.DecompressionBombError:
+        raise UploadError('Слишком большое разрешение картинки')
+    except (OSError, SyntaxError):
+        if header_complete:
+            raise UploadError('Файл не является картинкой')
+        return
+    if width * height > settings.UPLOAD_MAX_PIXELS:
+        raise UploadError('Слишком большое разрешение картинки')
+
+
+def write_chunk(upload, start, length, stream):
+    """Дописывает часть файла прямо на диск, блоками из потока запроса.
+
+    Писать можно только с того места, где закончилась предыдущая
+    часть, — клиент узнаёт его GET-запросом и продолжает загрузку.
+    """
+    if start != upload.received:
+        raise UploadError(f'Ожидалась часть с байта {upload.received}')
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'ab') as part:
+        part.truncate(start)
+        remaining = length
+        while remaining > 0:
+            block = stream.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            part.write(block)
+            remaining -= len(block)
+    previous, upload.received = upload.received, start + length - remaining
+    upload.save(update_fields=['received'])
+    if remaining:
+        raise UploadError('Соединение оборвалось, продолжите загрузку')
+    header_size = min(upload.size, HEADER_SIZE)
+    if previous < header_size:
+        try:
+            check_image_header(path, upload.received >= header_size)
+        except UploadError:
+            discard(upload)
+            raise
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as part:
+        for block in iter(lambda: part.read(BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def attach(upload, post):
+    """Проверяет контрольную сумму и делает файл картинкой поста."""
+    if upload.received != upload.size:
+        raise UploadError('Файл загружен не полностью')
+    path = part_path(upload)
+    if file_sha256(path) != upload.sha256.lower():
+        discard(upload)
+        raise UploadError('Контрольная сумма не совпала')
+    with open(path, 'rb') as part:
+        post.image.save(upload.filename, PartFile(part), save=True)
+    upload.delete()
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def discard(upload):
+    path = part_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
+    upload.delete()
+
+
+def expire(now=None):
+    """Удаляет загрузки, брошенные дольше UPLOAD_EXPIRE_HOURS назад,
+    вместе с их частями на диске."""
+    older_than = (now or timezone.now()) - timedelta(
+        hours=settings.UPLOAD_EXPIRE_HOURS
+    )
+    expired = 0
+    for upload in Upload.objects.filter(created__lt=older_than).iterator():
+        discard(upload)
+        expired += 1
+    return expired
@@ -8,6 +8,7 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_list'),
     path('profile/<str:username>/', views.profile, name='profile'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
+    path('posts/new/', views.new_posts, name='new_posts'),
     path('create/', views.post_create, name='post_create'),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path(
@@ -15,11 +16,46 @@ urlpatterns = [
         views.add_comment,
         name="add_comment"
     ),
+    path('posts/<int:post_id>/like/', views.post_like, name='post_like'),
+    path(
+        'posts/<int:post_id>/unlike/',
+        views.post_unlike,
+        name='post_unlike'
+    ),
     path(
         'posts/comments/<int:comment_id>/delete/',
         views.comment_delete, name='delete_comment'
     ),
     path('follow/', views.follow_index, name='follow_index'),
+    path('cards/', views.index_cards, name='index_cards'),
+    path(
+        'cards/group/<slug:slug>/',
+        views.group_cards,
+        name='group_cards'
+    ),
+    path(
+        'cards/profile/<str:username>/',
+        views.profile_cards,
+        name='profile_cards'
+    ),
+    path('cards/follow/', views.follow_cards, name='follow_cards'),
+    path(
+        'notifications/',
+        views.notification_list,
+        name='notification_list'
+    ),
+    path('export/', views.export_data, name='export_data'),
+    path('uploads/', views.upload_create, name='upload_create'),
+    path(
+        'uploads/<uuid:upload_id>/',
+        views.upload_detail,
+        name='upload_detail'
+    ),
+    path(
+        'uploads/<uuid:upload_id>/complete/',
+        views.upload_complete,
+        name='upload_complete'
+    ),
     path(
         'profile/<str:username>/follow/',
         views.profile_follow,
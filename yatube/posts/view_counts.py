@@ -0,0 +1,115 @@
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, connection, models
+
+from .models import ArchivedPost, Post
+
+pending_lock = threading.Lock()
+pending = {}
+last_flush = time.monotonic()
+
+
+def record(post_id):
+    """Учитывает просмотр в памяти процесса.
+
+    В базу просмотры уходят пачкой раз в VIEW_COUNT_FLUSH_INTERVAL
+    секунд или когда накопится VIEW_COUNT_MAX_PENDING просмотров.
+    """
+    with pending_lock:
+        pending[post_id] = pending.get(post_id, 0) + 1
+        total = sum(pending.values())
+    if (
+        total >= settings.VIEW_COUNT_MAX_PENDING
+        or time.monotonic() - last_flush >= settings.VIEW_COUNT_FLUSH_INTERVAL
+    ):
+        try:
+            flush()
+        except DatabaseError:
+            pass
+
+
+def count(post):
+    """Просмотры из базы вместе с ещё не записанными в этом процессе."""
+    with pending_lock:
+        delta = pending.get(post.pk, 0)
+    return getattr(post, 'view_count', 0) + delta
+
+
+def add_views(queryset, batch):
+    return queryset.filter(pk__in=batch).update(
+        view_count=models.F('view_count') + models.Case(
+            *(
+                models.When(pk=post_id, then=models.Value(delta))
+                for post_id, delta in batch.items()
+            ),
+            output_field=models.PositiveIntegerField(),
+        )
+    )
+
+
+def flush():
+    """Записывает накопленные просмотры одним UPDATE.
+
+    Просмотры постов, ушедших тем временем в архив, дописываются
+    в архив вторым запросом. Если запись не удалась, просмотры
+    возвращаются в буфер и уйдут со следующей попыткой.
+    """
+    global last_flush
+    with pending_lock:
+        batch = dict(pending)
+        pending.clear()
+        last_flush = time.monotonic()
+    if not batch:
+        return 0
+    try:
+        if add_views(Post.all_objects, batch) < len(batch):
+            hot = set(Post.all_objects.filter(pk__in=batch).values_list(
+                'pk', flat=True
+            ))
+            add_views(ArchivedPost.all_objects, {
+                post_id: delta for post_id, delta in batch.items()
+                if post_id not in hot
+            })
+    except DatabaseError:
+        with pending_lock:
+            for post_id, delta in batch.items():
+                pending[post_id] = pending.get(post_id, 0) + delta
+        raise
+    return sum(batch.values())
+
+
+def flush_if_due():
+    """Сброс по таймеру: без новых просмотров буфер иначе не уйдёт."""
+    if not pending:
+        return 0
+    if time.monotonic() - last_flush < settings.VIEW_COUNT_FLUSH_INTERVAL:
+        return 0
+    try:
+        return flush()
+    except DatabaseError:
+        return 0
+
+
+def flush_in_background():
+    """Поток, сбрасывающий буфер раз в VIEW_COUNT_FLUSH_INTERVAL
+    секунд, даже если процесс простаивает. Запускается из wsgi.py."""
+    def loop():
+        while True:
+            time.sleep(settings.VIEW_COUNT_FLUSH_INTERVAL)
+            try:
+                flush_if_due()
+            finally:
+                connection.close()
+
+    thread = threading.Thread(
+        target=loop, name='view-count-flush', daemon=True
+    )
+    thread.start()
+    return thread
+
+
+def reset():
+    with pending_lock:
+        pending.clear()
@@ -1,10 +1,31 @@
+from http import HTTPStatus
+
 from django.core.paginator import Paginator
 from django.shortcuts import render, get_object_or_404
-from . models import Post, Group, User, Comment, Follow
+from . models import (
+    Post, Group, User, Comment, Follow, Notification, Upload
+)
 from . forms import PostForm, CommentForm
 from django.shortcuts import redirect
+from django.urls import reverse
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.conf import settings
+from django.http import (
+    HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+)
+from django.utils.http import is_safe_url
+from django.views.decorators.http import require_http_methods, require_POST
+
+from core import metrics
+from core.orm_cache import get_or_404
+from core.cache import cache_shell
+from .archive import ArchiveChain, get_post_or_404
+from .export import iter_user_export
+from .tasks import expire_uploads, make_thumbnails
+from .uploads import (
+    UploadError, attach, parse_content_range, sha256_re, write_chunk
+)
+from . import cdn, feeds, fragments, likes, notifications, view_counts
 
 
 LIMIT_CONSTANT = 10
@@ -17,37 +38,49 @@ def paginate_page(request, posts):
     return page_obj
 
 
-@cache_page(20, key_prefix='index_page')
+@cache_shell(20, key_prefix='index_page')
 def index(request):
     template = 'posts/index.html'
     posts = Post.objects.select_related('author', 'group')
+    page_obj = likes.annotate_page(paginate_page(request, posts), request.user)
+    cdn.tag_posts(request, page_obj, cdn.INDEX_KEY)
     context = {
-        'page_obj': paginate_page(request, posts),
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
 def group_posts(request, slug):
     template = 'posts/group_list.html'
-    group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related('author', 'group')
+    group = get_or_404(Group, slug=slug)
+    posts = ArchiveChain(
+        group.posts.select_related('author', 'group'),
+        group.archived_posts.select_related('author', 'group'),
+    )
+    page_obj = likes.annotate_page(paginate_page(request, posts), request.user)
+    cdn.tag_posts(request, page_obj, cdn.group_key(group.slug))
     context = {
         'group': group,
-        'page_obj': paginate_page(request, posts),
+        'page_obj': page_obj,
     }
     return render(request, template, context)
 
 
 def profile(request, username):
     template = 'posts/profile.html'
-    author = get_object_or_404(User, username=username)
+    author = get_or_404(User, username=username)
     following = request.user.is_authenticated and request.user.follower.filter(
         author=author
     ).exists()
-    posts = author.posts.select_related('author', 'group')
+    posts = ArchiveChain(
+        author.posts.select_related('author', 'group'),
+        author.archived_posts.select_related('author', 'group'),
+    )
+    page_obj = likes.annotate_page(paginate_page(request, posts), request.user)
+    cdn.tag_posts(request, page_obj, cdn.author_key(author.username))
     context = {
         'author': author,
-        'page_obj': paginate_page(request, posts),
+        'page_obj': page_obj,
         'following': following
     }
     return render(request, template, context)
@@ -55,13 +88,18 @@ def profile(request, username):
 
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
-    comments = post.comments.all()
-    form = CommentForm()
+    post = get_post_or_404(post_id)
+    comments = post.comments.select_related('author')
+    form = None if getattr(post, 'is_archived', False) else CommentForm()
+    if form is not None:
+        view_counts.record(post.pk)
+    likes.annotate([post], request.user)
+    cdn.tag_posts(request, [post])
     context = {
         'post': post,
         'comments': comments,
-        'form': form
+        'form': form,
+        'view_count': view_counts.count(post),
     }
     return render(request, template, context)
 
@@ -77,6 +115,10 @@ def post_create(request):
         temp_form = form.save(commit=False)
         temp_form.author = request.user
         temp_form.save()
+        notifications.fan_out.delay(temp_form.pk)
+        if temp_form.image:
+            metrics.UPLOAD_BYTES.observe(temp_form.image.size, source='form')
+            make_thumbnails.delay(temp_form.pk)
         return redirect(
             'posts:profile', temp_form.author
         )
@@ -97,7 +139,10 @@ def post_edit(request, post_id):
         instance=post
     )
     if form.is_valid() and request.method == 'POST':
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data and post.image:
+            metrics.UPLOAD_BYTES.observe(post.image.size, source='form')
+            make_thumbnails.delay(post.pk)
         return redirect(
             'posts:post_detail', post_id
         )
@@ -119,19 +164,21 @@ def add_comment(request, post_id):
 
 @login_required
 def follow_index(request):
-    posts = Post.objects.filter(author__following__user=request.user)
+    posts = Post.objects.filter(
+        author__following__user=request.user
+    ).select_related('author', 'group')
     paginator = Paginator(posts, LIMIT_CONSTANT)
     page_number = request.GET.get("page")
     page_obj = paginator.get_page(page_number)
     context = {
-        "page_obj": page_obj,
+        "page_obj": likes.annotate_page(page_obj, request.user),
     }
     return render(request, "posts/follow.html", context)
 
 
 @login_required
 def profile_follow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_or_404(User, username=username)
     if author != request.user and not Follow.objects.filter(
         user=request.user, author=author
     ).exists():
@@ -141,11 +188,179 @@ def profile_follow(request, username):
 
 @login_required
 def profile_unfollow(request, username):
-    author = get_object_or_404(User, username=username)
+    author = get_or_404(User, username=username)
     Follow.objects.filter(user=request.user, author=author).delete()
     return redirect("posts:follow_index")
 
 
+def post_cards(request, sources, page_url, keys=()):
+    """Следующая пачка карточек постов без base.html.
+
+    Курсор ``before`` берётся из заголовка X-Next-Cursor предыдущего
+    ответа; без него отдаётся начало ленты. После лайка пользователь
+    возвращается на страницу ленты ``page_url``, а не во фрагмент.
+    """
+    before = request.GET.get('before')
+    try:
+        cursor = fragments.decode_cursor(before) if before else None
+    except ValueError:
+        return HttpResponseBadRequest('Неверный курсор')
+    posts, next_cursor = fragments.next_batch(
+        sources, cursor, LIMIT_CONSTANT
+    )
+    cdn.tag_posts(request, posts, *keys)
+    response = render(request, 'includes/post_cards.html', {
+        'posts': likes.annotate(posts, request.user),
+        'next_cursor': next_cursor,
+        'like_next': page_url,
+    })
+    if next_cursor:
+        response['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def index_cards(request):
+    return post_cards(
+        request,
+        [Post.objects.select_related('author', 'group')],
+        reverse('posts:index'),
+        [cdn.INDEX_KEY],
+    )
+
+
+def group_cards(request, slug):
+    group = get_or_404(Group, slug=slug)
+    return post_cards(
+        request,
+        [
+            group.posts.select_related('author', 'group'),
+            group.archived_posts.select_related('author', 'group'),
+        ],
+        reverse('posts:group_list', args=(group.slug,)),
+        [cdn.group_key(group.slug)],
+    )
+
+
+def profile_cards(request, username):
+    author = get_or_404(User, username=username)
+    return post_cards(
+        request,
+        [
+            author.posts.select_related('author', 'group'),
+            author.archived_posts.select_related('author', 'group'),
+        ],
+        reverse('posts:profile', args=(author.username,)),
+        [cdn.author_key(author.username)],
+    )
+
+
+@login_required
+def follow_cards(request):
+    return post_cards(
+        request,
+        [Post.objects.filter(
+            author__following__user=request.user
+        ).select_related('author', 'group')],
+        reverse('posts:follow_index'),
+    )
+
+
+def post_json(post):
+    return {
+        'id': post.pk,
+        'text': post.text,
+        'author': post.author.username,
+        'group': post.group.slug if post.group else None,
+        'pub_date': post.pub_date.isoformat(),
+        'url': reverse('posts:post_detail', args=(post.pk,)),
+    }
+
+
+def new_posts(request):
+    """Долгий опрос: посты ленты новее курсора ``after``.
+
+    Лента — ``feed=index`` (по умолчанию), ``feed=group&slug=...`` или
+    ``feed=follow``. Без курсора сразу возвращается текущий курсор.
+    """
+    kind = request.GET.get('feed', 'index')
+    if kind == 'group':
+        feed = feeds.Feed('group', group=get_or_404(
+            Group, slug=request.GET.get('slug', '')
+        ))
+    elif kind == 'follow':
+        if not request.user.is_authenticated:
+            return JsonResponse(
+                {'error': 'Нужно войти'}, status=HTTPStatus.UNAUTHORIZED
+            )
+        feed = feeds.Feed('follow', user=request.user)
+    elif kind == 'index':
+        feed = feeds.Feed('index')
+    else:
+        return JsonResponse(
+            {'error': 'Неизвестная лента'}, status=HTTPStatus.BAD_REQUEST
+        )
+    after = request.GET.get('after')
+    if after is None:
+        return JsonResponse({'posts': [], 'cursor': feed.latest()})
+    if not after.isdigit():
+        return JsonResponse(
+            {'error': 'Неверный курсор'}, status=HTTPStatus.BAD_REQUEST
+        )
+    posts, cursor = feeds.wait_for_posts(feed, int(after), LIMIT_CONSTANT)
+    return JsonResponse({
+        'posts': [post_json(post) for post in posts],
+        'cursor': cursor,
+    })
+
+
+@login_required
+def notification_list(request):
+    """Входящие: новые посты авторов, на которых подписан пользователь.
+
+    Показанные уведомления отмечаются прочитанными.
+    """
+    items = Notification.objects.filter(
+        user=request.user, post__is_deleted=False
+    ).select_related('post__author', 'post__group')
+    page_obj = paginate_page(request, items)
+    page_obj.object_list = list(page_obj.object_list)
+    unread = [item.pk for item in page_obj if not item.is_read]
+    notifications.mark_read(request.user, unread)
+    context = {
+        'page_obj': page_obj,
+        'unread': set(unread),
+    }
+    return render(request, 'posts/notifications.html', context)
+
+
+def redirect_back(request, post):
+    next_url = request.POST.get('next')
+    if next_url and is_safe_url(
+        next_url, allowed_hosts={request.get_host()},
+        require_https=request.is_secure(),
+    ):
+        return redirect(next_url)
+    return redirect('posts:post_detail', post.pk)
+
+
+@login_required
+@require_POST
+def post_like(request, post_id):
+    """Лайк поста; повторный запрос ничего не меняет."""
+    post = get_object_or_404(Post, pk=post_id)
+    likes.like(request.user, post)
+    return redirect_back(request, post)
+
+
+@login_required
+@require_POST
+def post_unlike(request, post_id):
+    """Снятие лайка; повторный запрос ничего не меняет."""
+    post = get_object_or_404(Post, pk=post_id)
+    likes.unlike(request.user, post)
+    return redirect_back(request, post)
+
+
 @login_required
 def comment_delete(request, comment_id):
     """Удаление коммента."""
@@ -154,3 +369,95 @@ def comment_delete(request, comment_id):
         return redirect('posts:post_detail', comment.post.pk)
     comment.delete()
     return redirect('posts:post_detail', comment.post.pk)
+
+
+@login_required
+def export_data(request):
+    """Выгрузка всех данных пользователя одним ZIP-архивом."""
+    response = StreamingHttpResponse(
+        iter_user_export(request.user), content_type='application/zip'
+    )
+    response['Content-Disposition'] = (
+        f'attachment; filename="yatube-{request.user.username}.zip"'
+    )
+    return response
+
+
+def upload_state(upload, status=HTTPStatus.OK):
+    return JsonResponse(
+        {
+            'id': str(upload.pk),
+            'size': upload.size,
+            'received': upload.received,
+        },
+        status=status,
+    )
+
+
+@login_required
+@require_POST
+def upload_create(request):
+    """Начинает загрузку: клиент сообщает имя, размер и SHA-256 файла."""
+    try:
+        size = int(request.POST.get('size', ''))
+    except ValueError:
+        size = 0
+    filename = request.POST.get('filename', '')
+    sha256 = request.POST.get('sha256', '')
+    if not filename or not sha256_re.match(sha256) or not (
+        0 < size <= settings.UPLOAD_MAX_SIZE
+    ):
+        return JsonResponse(
+            {'error': 'Нужны filename, size и sha256'},
+            status=HTTPStatus.BAD_REQUEST,
+        )
+    upload = Upload.objects.create(
+        user=request.user, filename=filename, size=size, sha256=sha256
+    )
+    expire_uploads.delay()
+    return upload_state(upload, HTTPStatus.CREATED)
+
+
+@login_required
+@require_http_methods(['GET', 'PUT'])
+def upload_detail(request, upload_id):
+    """GET — сколько байт уже получено, PUT — очередная часть файла."""
+    upload = get_object_or_404(Upload, pk=upload_id, user=request.user)
+    if request.method == 'GET':
+        return upload_state(upload)
+    try:
+        start, length = parse_content_range(
+            request.META.get('HTTP_CONTENT_RANGE'), upload.size
+        )
+        write_chunk(upload, start, length, request)
+    except UploadError as error:
+        status = HTTPStatus.CONFLICT
+        if not Upload.objects.filter(pk=upload_id).exists():
+            status = HTTPStatus.BAD_REQUEST
+        return JsonResponse(
+            {'error': str(error), 'received': upload.received},
+            status=status,
+        )
+    return upload_state(upload)
+
+
+@login_required
+@require_POST
+def upload_complete(request, upload_id):
+    """Проверяет файл и прикрепляет его к посту автора."""
+    upload = get_object_or_404(Upload, pk=upload_id, user=request.user)
+    post_id = request.POST.get('post_id', '')
+    if not post_id.isdigit():
+        return JsonResponse(
+            {'error': 'Нужен post_id'}, status=HTTPStatus.BAD_REQUEST
+        )
+    post = get_object_or_404(Post, pk=post_id, author=request.user)
+    try:
+        attach(upload, post)
+    except UploadError as error:
+        return JsonResponse(
+            {'error': str(error)}, status=HTTPStatus.BAD_REQUEST
+        )
+    metrics.UPLOAD_BYTES.observe(upload.size, source='chunked')
+    make_thumbnails.delay(post.pk)
+    return JsonResponse({'post_id': post.pk, 'image': post.image.url})
@@ -0,0 +1,158 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO, StringIO
+from urllib.parse import unquote
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.models import Count
+from django.urls import reverse
+from sorl.thumbnail import get_thumbnail
+from sorl.thumbnail.images import ImageFile
+
+from .models import Group, Post, User
+from .tasks import THUMBNAIL_GEOMETRY, THUMBNAIL_OPTIONS
+from .views import LIMIT_CONSTANT
+
+
+def warmup_host():
+    if settings.WARMUP_HOST:
+        return settings.WARMUP_HOST
+    hosts = [host for host in settings.ALLOWED_HOSTS if '*' not in host]
+    return hosts[0].lstrip('.') if hosts else 'localhost'
+
+
+def busiest_groups(limit):
+    return list(Group.objects.annotate(
+        posts_count=Count('posts')
+    ).filter(posts_count__gt=0).order_by('-posts_count').values_list(
+        'slug', flat=True
+    )[:limit])
+
+
+def top_profiles(limit):
+    return list(User.objects.filter(is_active=True).annotate(
+        posts_count=Count('posts')
+    ).filter(posts_count__gt=0).order_by('-posts_count').values_list(
+        'username', flat=True
+    )[:limit])
+
+
+def warmup_urls(pages, groups, profiles):
+    """Адреса самых посещаемых страниц, самые важные — первыми."""
+    index = reverse('posts:index')
+    urls = [index] + [f'{index}?page={page}' for page in range(2, pages + 1)]
+    urls += [
+        reverse('posts:group_list', args=(slug,))
+        for slug in busiest_groups(groups)
+    ]
+    urls += [
+        reverse('posts:profile', args=(username,))
+        for username in top_profiles(profiles)
+    ]
+    return urls
+
+
+def warmup_images(pages):
+    """Картинки постов, которые попадут на прогреваемые страницы
+    главной (группы и профили рисуют часть из них же)."""
+    return Post.objects.exclude(image='').exclude(image=None).order_by(
+        '-pub_date'
+    ).values_list('image', flat=True)[:pages * LIMIT_CONSTANT]
+
+
+def warmup_environ(url, host):
+    path, _, query = url.partition('?')
+    # Как у настоящего сервера: PATH_INFO раскодирован, а байты UTF-8
+    # переданы строкой latin-1.
+    path = unquote(path).encode().decode('iso-8859-1')
+    https = settings.WARMUP_SCHEME == 'https'
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'SCRIPT_NAME': '',
+        'HTTP_HOST': host,
+        'SERVER_NAME': host,
+        'SERVER_PORT': '443' if https else '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.url_scheme': settings.WARMUP_SCHEME,
+        'wsgi.input': BytesIO(),
+        'wsgi.errors': StringIO(),
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+        'wsgi.version': (1, 0),
+    }
+
+
+def fetch(handler, url, host):
+    """Рендерит страницу анонимным запросом, как первый посетитель.
+
+    Запрос проходит через WSGI-обработчик со всеми middleware, а ключ
+    кеша страницы строится по полному адресу, поэтому хост и схема —
+    как у сайта. Возвращает (адрес, код ответа или ошибка, секунды).
+    """
+    started = time.monotonic()
+    status = []
+    try:
+        response = handler(
+            warmup_environ(url, host),
+            lambda line, headers, exc_info=None: status.append(line),
+        )
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        outcome = int(status[0].split()[0])
+    except Exception as error:
+        outcome = error
+    finally:
+        connection.close()
+    return url, outcome, time.monotonic() - started
+
+
+def make_thumbnail(name):
+    """Нарезает превью с теми же параметрами, что и шаблоны."""
+    storage = Post._meta.get_field('image').storage
+    started = time.monotonic()
+    try:
+        get_thumbnail(
+            ImageFile(name, storage), THUMBNAIL_GEOMETRY, **THUMBNAIL_OPTIONS
+        )
+        outcome = 'ok'
+    except Exception as error:
+        outcome = error
+    finally:
+        connection.close()
+    return name, outcome, time.monotonic() - started
+
+
+def warm(pages=None, groups=None, profiles=None, workers=None):
+    """Нарезает превью и рендерит страницы не больше чем в ``workers``
+    потоков. Отдаёт результаты по мере готовности."""
+    pages = settings.WARMUP_INDEX_PAGES if pages is None else pages
+    groups = settings.WARMUP_GROUPS if groups is None else groups
+    profiles = settings.WARMUP_PROFILES if profiles is None else profiles
+    workers = workers or settings.WARMUP_WORKERS
+    host = warmup_host()
+    handler = WSGIHandler()
+    images = list(warmup_images(pages))
+    urls = warmup_urls(pages, groups, profiles)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # Превью первыми: иначе рендер страниц резал бы их сам.
+        yield from pool.map(make_thumbnail, images)
+        yield from pool.map(lambda url: fetch(handler, url, host), urls)
+
+
+def warm_in_background():
+    """Прогревает кеш в фоне, не задерживая старт процесса."""
+    thread = threading.Thread(
+        target=lambda: list(warm()), name='cache-warmup', daemon=True
+    )
+    thread.start()
+    return thread
@@ -0,0 +1,29 @@
+from django.contrib import admin
+from django.contrib.auth import get_user_model
+from django.contrib.auth.admin import UserAdmin
+
+from core.admin import BackgroundDeleteMixin
+from posts.deletion import mark_user_deleted
+
+User = get_user_model()
+
+
+class YatubeUserAdmin(BackgroundDeleteMixin, UserAdmin):
+    actions = ('delete_in_background',)
+
+    def delete_in_background(self, request, queryset):
+        for user in queryset:
+            mark_user_deleted(user)
+        self.message_user(
+            request, f'Аккаунтов помечено на удаление: {len(queryset)}'
+        )
+    delete_in_background.short_description = (
+        'Удалить выбранные аккаунты в фоне'
+    )
+
+    def delete_model(self, request, obj):
+        mark_user_deleted(obj)
+
+
+admin.site.unregister(User)
+admin.site.register(User, YatubeUserAdmin)
@@ -47,17 +47,25 @@ INSTALLED_APPS = [
     'users',
     'core',
     'about',
+    'jobs',
     'sorl.thumbnail',
 ]
 
 MIDDLEWARE = [
+    'core.middleware.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.compression.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.identity_map.IdentityMapMiddleware',
+    'core.middleware.slow_queries.SlowQueryViewMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.middleware.surrogate.SurrogateKeyMiddleware',
+    'core.middleware.render_timing.RenderTimingMiddleware',
+    'core.middleware.profiling.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'yatube.urls'
@@ -76,6 +84,7 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
                 'core.context_processors.year.year',
+                'posts.context_processors.unread_notifications',
             ],
         },
     },
@@ -138,13 +147,156 @@ CACHES = {
 }
 
 STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'collected_static')
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
 
+# Уровни сжатия ответов на лету, см. manage.py benchmark_compression.
+COMPRESSION_LEVELS = {
+    'br': 5,
+    'gzip': 6,
+}
+
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+MEDIA_CACHE_MAX_AGE = 60 * 60 * 24 * 30
+# None — файлы отдаёт Django, 'x-sendfile' — Apache/lighttpd,
+# 'x-accel-redirect' — nginx с internal-локацией на MEDIA_ROOT.
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Загрузка картинок по частям. Недокачанные файлы лежат
+# в UPLOAD_PARTS_DIR вне MEDIA_ROOT; брошенные дольше
+# UPLOAD_EXPIRE_HOURS удаляет задача posts.tasks.expire_uploads
+# или manage.py expire_uploads.
+UPLOAD_MAX_SIZE = 50 * 1024 * 1024
+UPLOAD_MAX_PIXELS = 40 * 1000 * 1000
+UPLOAD_PARTS_DIR = os.path.join(BASE_DIR, 'upload_parts')
+UPLOAD_EXPIRE_HOURS = 24
+
+# Посты старше POSTS_ARCHIVE_AFTER_DAYS переносит в архив
+# manage.py archive_posts.
+POSTS_ARCHIVE_AFTER_DAYS = 365
+POSTS_ARCHIVE_BATCH_SIZE = 500
+
+# Профилирование запросов, отчёт на /profiling/ для сотрудников.
+# PROFILING_SAMPLE_RATE — доля профилируемых запросов (0 — выключено);
+# сотрудник может запросить профиль заголовком X-Profile.
+PROFILING_SAMPLE_RATE = 0
+PROFILING_HEADER = 'HTTP_X_PROFILE'
+PROFILING_DIR = None
+PROFILING_TOP = 30
+# Замер рендера шаблонов и тега thumbnail (заголовок Server-Timing).
+RENDER_TIMING = False
+
+# Сколько секунд держать в кеше группы и пользователей, найденные
+# по slug, username или pk; изменения сбрасывают кеш сигналами.
+# Сброс виден только тем процессам, что делят кеш ORM_CACHE_ALIAS:
+# с LocMemCache другие воркеры отдают старую строку до
+# ORM_CACHE_TIMEOUT секунд, поэтому при нескольких процессах нужен
+# общий кеш (Memcached, Redis).
+ORM_CACHE_ALIAS = 'default'
+ORM_CACHE_TIMEOUT = 60 * 5
+
+# Просмотры постов копятся в памяти процесса и пишутся в базу
+# пачкой раз в VIEW_COUNT_FLUSH_INTERVAL секунд или по достижении
+# VIEW_COUNT_MAX_PENDING; при падении процесса теряется не больше этого.
+VIEW_COUNT_FLUSH_INTERVAL = 10
+VIEW_COUNT_MAX_PENDING = 1000
+
+# Уведомления подписчикам о новых постах: рассылка пачками
+# по NOTIFICATIONS_BATCH_SIZE строк, хранятся NOTIFICATIONS_KEEP_DAYS дней.
+NOTIFICATIONS_BATCH_SIZE = 500
+NOTIFICATIONS_KEEP_DAYS = 30
+
+# Каталог HTML-снимков главной, групп и профилей для анонимов.
+# Снимки отдаёт core.wsgi.SnapshotApp до middleware Django и
+# перерисовывает фоновая задача при изменении постов; первый раз —
+# manage.py build_snapshots. None — выключено. Лайки перерисовывают
+# страницы поста не чаще раза в SNAPSHOTS_LIKE_DELAY секунд.
+SNAPSHOTS_DIR = None
+SNAPSHOTS_LIKE_DELAY = 30
+
+# Кеширующий прокси (CDN) перед сайтом. Ответы posts.views помечены
+# ключами в SURROGATE_KEY_HEADER: index, post-<id>, group-<slug>,
+# author-<username>. Изменения постов, комментариев и групп очищают
+# их запросом SURROGATE_PURGE_METHOD на SURROGATE_PURGE_URL через
+# очередь задач; None — очистка выключена. SURROGATE_MAX_AGE задаёт
+# Surrogate-Control для прокси; страницы вошедших и всё с токеном
+# CSRF получают Cache-Control: private.
+SURROGATE_KEY_HEADER = 'Surrogate-Key'
+SURROGATE_MAX_AGE = None
+SURROGATE_PURGE_URL = None
+SURROGATE_PURGE_METHOD = 'POST'
+SURROGATE_PURGE_TOKEN = None
+SURROGATE_PURGE_BATCH = 256
+SURROGATE_PURGE_TIMEOUT = 5
+
+# Долгий опрос /posts/new/: сколько секунд держать запрос
+# и как часто сверять id последнего поста в кеше. Новый пост
+# сбрасывает кеш сразу; LONG_POLL_CACHE_TIMEOUT ограничивает
+# отставание других процессов, если кеш не общий (LocMemCache).
+# Ждущий опрос занимает поток воркера, поэтому нужны потоковые
+# воркеры (gunicorn --worker-class gthread --threads N), а
+# LONG_POLL_MAX_WAITERS должен быть заметно меньше N: остальные
+# потоки обслуживают обычные страницы. Сверх лимита опрос сразу
+# отвечает текущим курсором.
+LONG_POLL_TIMEOUT = 25
+LONG_POLL_INTERVAL = 1
+LONG_POLL_CACHE_TIMEOUT = 10
+LONG_POLL_MAX_WAITERS = 8
+
+# На сколько строк делится счётчик лайков одного поста.
+LIKE_COUNTER_SHARDS = 8
+
+# Запросы дольше SLOW_QUERY_THRESHOLD_MS пишутся в SLOW_QUERY_LOG
+# (JSON по строке на запрос) вместе с планом; None — выключено.
+# Сводка: manage.py slow_queries.
+SLOW_QUERY_THRESHOLD_MS = None
+SLOW_QUERY_LOG = os.path.join(BASE_DIR, 'slow_queries.jsonl')
+
+# Метрики на /metrics/. Каждый процесс раз в METRICS_FLUSH_INTERVAL
+# секунд пишет свои значения в METRICS_DIR, эндпоинт их складывает.
+# Файлы завершившихся процессов складываются в METRICS_DIR/retired.json.
+# Без METRICS_DIR видны только метрики отвечающего процесса.
+# Доступ: сотрудники или Authorization: Bearer <METRICS_TOKEN>.
+# METRICS_ALLOWED_IPS пускает адреса без токена; не включайте его
+# за обратным прокси — там все запросы приходят с 127.0.0.1.
+METRICS_DIR = None
+METRICS_FLUSH_INTERVAL = 10
+METRICS_TOKEN = None
+METRICS_ALLOWED_IPS = []
+THUMBNAIL_BACKEND = 'core.thumbnails.MetricsThumbnailBackend'
+
+# Прогрев кеша: manage.py warm_cache или WARMUP_ON_START в wsgi.py.
+# LocMemCache живёт внутри процесса, поэтому с ним прогревать нужно
+# при старте каждого воркера; общий кеш достаточно прогреть командой.
+# WARMUP_HOST и WARMUP_SCHEME должны совпадать с адресом сайта:
+# по ним строится ключ кеша страницы.
+WARMUP_ON_START = False
+WARMUP_HOST = None
+WARMUP_SCHEME = 'http'
+WARMUP_INDEX_PAGES = 3
+WARMUP_GROUPS = 10
+WARMUP_PROFILES = 10
+WARMUP_WORKERS = 4
+
+# Сколько строк удалять за одну транзакцию при фоновом удалении.
+DELETION_BATCH_SIZE = 200
+
+# Очередь фоновых задач, см. manage.py run_jobs.
+# JOBS_EAGER = True выполняет задачи сразу, без очереди.
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_BACKOFF = 10
+JOBS_RETRY_BACKOFF_MAX = 60 * 60
+# Воркер продлевает блокировку своих задач каждые JOBS_HEARTBEAT секунд;
+# задача без продления дольше JOBS_LOCK_TIMEOUT считается брошенной.
+JOBS_HEARTBEAT = 30
+JOBS_LOCK_TIMEOUT = 60 * 2
 
 EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
@@ -1,22 +1,27 @@
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf import settings
-from django.conf.urls.static import static
+
+from core.views import metrics_view, profiling_report, serve_media
 
 
 urlpatterns = [
     path('', include('posts.urls', namespace='posts')),
+    path('profiling/', profiling_report, name='profiling'),
+    path('metrics/', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('auth/', include('users.urls', namespace='users')),
     path('auth/', include('django.contrib.auth.urls')),
     path('about/', include('about.urls', namespace='about')),
+    re_path(
+        r'^{}(?P<path>.+)$'.format(re.escape(settings.MEDIA_URL.lstrip('/'))),
+        serve_media,
+        name='media'
+    ),
 ]
 
 handler404 = 'core.views.page_not_found'
 handler500 = 'core.views.server_error'
 handler403 = 'core.views.permission_denied'
-
-if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT
-    )
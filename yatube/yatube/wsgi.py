@@ -7,10 +7,27 @@ For more information on this file, see
 https://docs.djangoproject.com/en/2.2/howto/deployment/wsgi/
 """
 
+import atexit
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
+from core.wsgi import SnapshotApp, StaticFilesApp
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
-application = get_wsgi_application()
+application = StaticFilesApp(get_wsgi_application())
+
+if settings.SNAPSHOTS_DIR:
+    application = SnapshotApp(application)
+
+from posts import view_counts  # noqa: E402
+
+atexit.register(view_counts.flush)
+view_counts.flush_in_background()
+
+if settings.WARMUP_ON_START:
+    from posts.warmup import warm_in_background
+
+    warm_in_background()